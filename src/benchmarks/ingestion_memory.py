@@ -0,0 +1,73 @@
+# Peak memory and time of turning an uploaded image into a model ready frame.
+# Run from src/ (the .env file must be there): python -m benchmarks.ingestion_memory
+from controllers import ImageController
+import numpy as np
+import tracemalloc
+import argparse
+import tempfile
+import time
+import os
+import cv2
+
+
+def make_upload(width: int, height: int):
+    # a smooth gradient with noise compresses like a camera photo
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    image = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    image = np.clip(image + rng.normal(0, 8, image.shape), 0, 255).astype(np.uint8)
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def authenticate_before(data: bytes, image_path: str):
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def register_before(data: bytes, image_path: str):
+    # the upload went to disk in chunks and proccess_client_image decoded it again from there
+    with open(image_path, "wb") as f:
+        f.write(data)
+    return cv2.imread(image_path)
+
+
+def after(image_controller: ImageController):
+    def ingest(data: bytes, image_path: str):
+        with open(image_path, "wb") as f:
+            f.write(data)
+        return image_controller.decode_image(data)
+    return ingest
+
+
+def measure(function, data: bytes, image_path: str):
+    tracemalloc.start()
+    start = time.perf_counter()
+    image = function(data, image_path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed, image.shape
+
+
+def main(width: int, height: int):
+    data = make_upload(width, height)
+    image_controller = ImageController()
+    print(f"upload {width}x{height}, {len(data) / 1e6:.2f} MB jpeg, "
+          f"IMAGE_DECODE_MAX_SIDE={image_controller.app_settings.IMAGE_DECODE_MAX_SIDE}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        image_path = os.path.join(directory, "upload.jpg")
+        for name, function in [("authenticate before", authenticate_before),
+                               ("register before", register_before),
+                               ("single decode after", after(image_controller))]:
+            peak, elapsed, shape = measure(function, data, image_path)
+            print(f"{name:<22} peak {peak / 1e6:8.2f} MB   {elapsed * 1000:8.2f} ms   frame {shape}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upload ingestion peak memory")
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    args = parser.parse_args()
+    main(width=args.width, height=args.height)
@@ -0,0 +1,305 @@
+# Load test of /api/v1/client/enroll and /api/v1/authenticate/authenticate against the app running in-process.
+# main.py's lifespan builds the app as configured, with mongomock, the fake Firebase, a stub embedding model
+# with a configurable latency and the configured vector db provider (Qdrant in local mode unless --qdrant-url).
+# Faces are synthetic unless --fixtures points at a bulk enrollment layout, one directory of images per identity.
+# Run from src/ (the .env file must be there, needs mongomock-motor):
+#   python -m benchmarks.load_test --clients 200 --requests 5000 --concurrency 64 --output results.json
+#   python -m benchmarks.load_test ... --baseline results_of_the_previous_commit.json
+from benchmarks.standins import stand_ins, make_face, encode_jpeg, load_fixtures, percentiles
+from helpers.config import get_settings
+from models.enums.ResponseSignal import ResponseSignal
+from collections import defaultdict
+import numpy as np
+import subprocess
+import argparse
+import asyncio
+import tempfile
+import inspect
+import shutil
+import httpx
+import json
+import time
+import os
+
+STAGES = [
+    # owner attribute on the app, method, stage name
+    ("image_controller", "decode_image", "decode_image"),
+    ("embedding_controller", "get_frame_query_embeddeing", "embedding"),
+    ("embedding_controller", "get_enrollment_embedding", "embedding"),
+    ("embedding_controller", "search_data_base", "vector_search"),
+    ("embedding_controller", "push_client_vectors_to_vector_db", "vector_write"),
+    ("client_data_model", "create_client", "mongo_write"),
+]
+
+
+class StageRecorder:
+    """Raw per call latencies of the pipeline stages, by wrapping the app scoped objects' methods."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def wrap(self, owner, method_name: str, stage: str):
+        method = getattr(owner, method_name)
+
+        if inspect.iscoroutinefunction(method):
+            async def timed(*args, **kwargs):
+                started_at = time.perf_counter()
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    self.samples[stage].append(time.perf_counter() - started_at)
+        else:
+            # decode_image also runs on worker threads, list appends are atomic
+            def timed(*args, **kwargs):
+                started_at = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    self.samples[stage].append(time.perf_counter() - started_at)
+
+        setattr(owner, method_name, timed)
+
+    def reset(self):
+        self.samples = defaultdict(list)
+
+    def report(self):
+        return {stage: percentiles(samples) for stage, samples in self.samples.items()}
+
+
+def configure(args, work_dir: str):
+    # the environment wins over .env, so only what the stand-ins need is overridden
+    os.environ["FIREBASE_CLIENT"] = "fake"
+    os.environ["VECTORDB_PROVIDER"] = args.vector_db.upper()
+    os.environ["QDRANT_URL"] = args.qdrant_url or ":memory:"
+    os.environ["VECTORDB_PATH"] = os.path.join(work_dir, "vectordb")
+    # a collection of its own, so a real Qdrant server never sees the benchmark clients mixed with real ones
+    os.environ["COLLECTION_NAME"] = f"loadtest_{int(time.time())}"
+    get_settings.cache_clear()
+    return get_settings()
+
+
+def make_identities(args):
+    # every identity has its enrollment images and query images, fixtures reuse an image when they run short
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+        identities = []
+        for images in list(fixtures.values())[:args.clients]:
+            identities.append({"enroll": images[:args.enroll_images],
+                               "query": images[args.enroll_images:] or images[:1]})
+        return identities
+
+    return [{"enroll": [encode_jpeg(make_face(identity, variant=variant)) for variant in range(args.enroll_images)],
+             "query": [encode_jpeg(make_face(identity, variant=args.enroll_images + variant)) for variant in range(3)]}
+            for identity in range(args.clients)]
+
+
+async def run_concurrently(operation, count: int, concurrency: int):
+    # a fixed number of callers, like that many cameras or admins waiting on the API at once
+    latencies = []
+    next_index = iter(range(count))
+
+    async def caller():
+        for index in next_index:
+            started_at = time.perf_counter()
+            await operation(index)
+            latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*[caller() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started_at
+    return {"requests": count,
+            "concurrency": concurrency,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(count / elapsed, 1),
+            "latency": percentiles(latencies)}
+
+
+async def seed_gallery(app, size: int, dim: int, chunk: int = 4096):
+    # distractor identities, so searches scan a gallery of realistic size
+    collection_name = app.vector_db_shards.base_collection_name
+    await app.vector_db_shards.ensure_collection(collection_name=collection_name)
+    rng = np.random.default_rng(1)
+    for start in range(0, size, chunk):
+        rows = range(start, min(start + chunk, size))
+        await app.vector_db_client.insert_many_records_async(
+            collection_name=collection_name,
+            vectors=rng.standard_normal((len(rows), dim), dtype=np.float32),
+            meta_datas=[{"client_id": f"distractor{row}", "client_name": "distractor"} for row in rows],
+            batch_size=chunk)
+
+
+async def enroll_scenario(client: httpx.AsyncClient, identities: list, concurrency: int):
+    outcomes = defaultdict(int)
+    enrolled = []
+
+    async def enroll(index: int):
+        images = identities[index]["enroll"]
+        files = [("image1", ("image1.jpg", images[0], "image/jpeg"))] + \
+                [("images", (f"image{number}.jpg", image, "image/jpeg")) for number, image in enumerate(images[1:], 2)]
+        response = await client.post("/api/v1/client/enroll", files=files,
+                                     data={"client_name": f"client {index}", "client_id": f"loadtest{index}"})
+        body = response.json()
+        outcomes[f"{response.status_code} {body.get('repsonse signal') or body.get('response signal')}"] += 1
+        if response.status_code == 200:
+            enrolled.append(index)
+
+    result = await run_concurrently(enroll, len(identities), concurrency)
+    result["outcomes"] = dict(outcomes)
+    return result, sorted(enrolled)
+
+
+async def authenticate_scenario(client: httpx.AsyncClient, identities: list, enrolled: list, requests: int,
+                                concurrency: int, unknown_ratio: float, doors: int):
+    # known faces are new photos of enrolled clients, unknown ones are drawn far outside the identities
+    rng = np.random.default_rng(2)
+    unknown = (rng.random(requests) < unknown_ratio) | (len(enrolled) == 0)
+    unknown_faces = [encode_jpeg(make_face(10 ** 6 + index)) for index in range(min(requests, 64))]
+    outcomes = defaultdict(int)
+
+    async def authenticate(index: int):
+        if unknown[index]:
+            image, expected = unknown_faces[index % len(unknown_faces)], None
+        else:
+            identity = enrolled[index % len(enrolled)]
+            queries = identities[identity]["query"]
+            image, expected = queries[index // len(enrolled) % len(queries)], f"loadtest{identity}"
+
+        response = await client.post("/api/v1/authenticate/authenticate",
+                                     files={"image1": ("frame.jpg", image, "image/jpeg")},
+                                     data={"device_id": f"loadtestdoor{index % doors}"})
+        body = response.json()
+        if response.status_code != 200:
+            outcomes[f"{response.status_code} {body.get('response signal')}"] += 1
+        elif body.get("repsonse signal") == ResponseSignal.CLEINT_AUTHENTICATION_SUCCEED.value:
+            outcomes["authenticated" if body.get("Client ID") == expected else "wrong client"] += 1
+        else:
+            outcomes["rejected" if expected is None else "missed"] += 1
+
+    result = await run_concurrently(authenticate, requests, concurrency)
+    result["outcomes"] = dict(outcomes)
+    return result
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def settings_snapshot(settings):
+    keys = ["VECTORDB_PROVIDER", "VECTORDB_DISTANCE_METHOD", "EMBEDDING_MODEL_SIZE", "SEARCH_MODE",
+            "INFERENCE_WORKERS", "INFERENCE_MAX_QUEUE_SIZE", "EMBEDDING_BATCH_MAX_SIZE", "EMBEDDING_CACHE_SIZE",
+            "DECISION_CACHE_SIZE", "QDRANT_COLLECTION_PROFILE"]
+    return {key: getattr(settings, key) for key in keys}
+
+
+def compare(baseline: dict, results: dict):
+    print(f"against {baseline.get('commit')}:")
+    for scenario, result in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(scenario)
+        if before is None:
+            continue
+        rows = [("throughput_rps", before["throughput_rps"], result["throughput_rps"])]
+        rows += [(f"{stage} p95_ms", before["stages"][stage]["p95_ms"], stats["p95_ms"])
+                 for stage, stats in result["stages"].items() if "p95_ms" in before["stages"].get(stage, {})]
+        for name, old, new in rows:
+            change = (new - old) / old * 100 if old else 0.0
+            print(f"  {scenario:>12} {name:<24} {old:>10} -> {new:<10} ({change:+.1f}%)")
+
+
+async def run(args, settings):
+    import main as app_module
+
+    identities = make_identities(args)
+    stub_options = {"latency_ms": args.embedding_latency_ms, "jitter_ms": args.embedding_jitter_ms,
+                    "batch_item_ms": args.embedding_batch_item_ms}
+    scenarios = {}
+
+    with stand_ins(app_module, **stub_options):
+        app = app_module.app
+        async with app.router.lifespan_context(app):
+            await app.warm_up_task
+            recorder = StageRecorder()
+            for owner, method_name, stage in STAGES:
+                recorder.wrap(getattr(app, owner), method_name, stage)
+
+            if args.gallery_size:
+                await seed_gallery(app, args.gallery_size, settings.EMBEDDING_MODEL_SIZE)
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+                recorder.reset()
+                scenarios["enroll"], enrolled = await enroll_scenario(client, identities, args.enroll_concurrency)
+                scenarios["enroll"]["stages"] = recorder.report()
+
+                recorder.reset()
+                scenarios["authenticate"] = await authenticate_scenario(client, identities, enrolled, args.requests,
+                                                                        args.concurrency, args.unknown_ratio,
+                                                                        args.doors)
+                scenarios["authenticate"]["stages"] = recorder.report()
+                scenarios["authenticate"]["inference"] = app.inference_executor.get_stats()["stages"]
+
+            if args.qdrant_url:
+                for name in await app.vector_db_client.list_collections_async() or []:
+                    if name.startswith(settings.COLLECTION_NAME):
+                        await app.vector_db_client.delete_collection_async(name)
+
+    return scenarios
+
+
+def main(args):
+    work_dir = tempfile.mkdtemp(prefix="loadtest")
+    settings = configure(args, work_dir)
+    try:
+        scenarios = asyncio.run(run(args, settings))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        # enrollment stores the uploaded images next to the real clients' ones
+        files_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets/Clients")
+        for index in range(args.clients):
+            shutil.rmtree(os.path.join(files_dir, f"loadtest{index}"), ignore_errors=True)
+
+    results = {"commit": current_commit(),
+               "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "arguments": vars(args),
+               "settings": settings_snapshot(settings),
+               "scenarios": scenarios}
+
+    for scenario, result in scenarios.items():
+        print(f"{scenario}: {result['requests']} requests, {result['concurrency']} in flight, "
+              f"{result['throughput_rps']}/s, {dict(result['outcomes'])}")
+        for stage, stats in [("request", result["latency"])] + list(result["stages"].items()):
+            print(f"  {stage:<14} n={stats['count']:<6} p50={stats.get('p50_ms')}ms p95={stats.get('p95_ms')}ms "
+                  f"p99={stats.get('p99_ms')}ms")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(json.load(f), results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-process load test of the enroll and authenticate routes")
+    parser.add_argument("--clients", type=int, default=100, help="identities enrolled through /enroll")
+    parser.add_argument("--enroll-images", type=int, default=3)
+    parser.add_argument("--enroll-concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=2000, help="authenticate requests")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--unknown-ratio", type=float, default=0.2, help="share of requests with an unknown face")
+    parser.add_argument("--doors", type=int, default=16, help="distinct device ids the requests come from")
+    parser.add_argument("--gallery-size", type=int, default=0, help="distractor vectors seeded before the run")
+    parser.add_argument("--fixtures", default=None, help="one directory of face images per identity")
+    parser.add_argument("--embedding-latency-ms", type=float, default=30.0)
+    parser.add_argument("--embedding-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--embedding-batch-item-ms", type=float, default=0.0,
+                        help="extra latency per additional image in a batch")
+    parser.add_argument("--vector-db", default="inmemory", choices=["inmemory", "qdrant", "mmap"])
+    parser.add_argument("--qdrant-url", default=None, help="a Qdrant server instead of the local mode")
+    parser.add_argument("--baseline", default=None, help="results of an earlier run to compare against")
+    parser.add_argument("--output", default=None)
+    main(parser.parse_args())
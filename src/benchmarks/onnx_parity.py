@@ -0,0 +1,119 @@
+# Compares the ONNX Runtime provider against the DeepFace provider on a fixture set.
+# Fixtures use the bulk enrollment layout, one directory of images per identity.
+# Run from src/ (the .env file must be there): python -m benchmarks.onnx_parity path/to/fixtures
+from helpers.config import get_settings
+from stores.deeplearning.ModelFactory import ModelProviderFactory
+from stores.deeplearning.ModelProviderEnum import ModelProviderEnum
+import numpy as np
+import argparse
+import json
+import time
+import os
+
+
+def load_fixtures(fixtures_path: str):
+    images, identities = [], []
+    for identity in sorted(os.listdir(fixtures_path)):
+        identity_dir = os.path.join(fixtures_path, identity)
+        if not os.path.isdir(identity_dir):
+            continue
+        for name in sorted(os.listdir(identity_dir)):
+            if name.lower().endswith((".jpg", ".jpeg", ".png")):
+                images.append(os.path.join(identity_dir, name))
+                identities.append(identity)
+    return images, identities
+
+
+def build_provider(settings, provider_name: str, quantize_int8: bool = False):
+    settings = settings.model_copy(update={"ONNX_QUANTIZE_INT8": quantize_int8})
+    provider = ModelProviderFactory(config=settings).intialize_provider(provider_name)
+    started_at = time.perf_counter()
+    provider.set_embedding_model(model_name=settings.EMBEDDING_MODEL_NAME,
+                                 detector_backend=settings.DETECTION_BACKEND)
+    return provider, time.perf_counter() - started_at
+
+
+def embed_all(provider, images: list):
+    started_at = time.perf_counter()
+    vectors = [provider.embed_image(image_path=image) for image in images]
+    return vectors, (time.perf_counter() - started_at) / max(len(images), 1)
+
+
+def normalize(vectors: list):
+    # images without a detected face keep a zero row and never match
+    matrix = np.zeros((len(vectors), max((len(vector) for vector in vectors if vector is not None), default=1)),
+                      dtype=np.float32)
+    for index, vector in enumerate(vectors):
+        if vector is not None:
+            matrix[index] = np.asarray(vector) / max(np.linalg.norm(vector), 1e-12)
+    return matrix
+
+
+def decisions(matrix: np.ndarray, threshold: float):
+    # the same score rule as the authenticate route, over every pair of fixture images
+    pairs = np.triu_indices(len(matrix), k=1)
+    return (matrix @ matrix.T)[pairs] >= threshold
+
+
+def compare(reference: list, candidate: list, identities: list, threshold: float):
+    both = [index for index in range(len(reference)) if reference[index] is not None and candidate[index] is not None]
+    reference_matrix, candidate_matrix = normalize(reference), normalize(candidate)
+    if reference_matrix.shape[1] != candidate_matrix.shape[1]:
+        # a different model was exported, nothing is comparable
+        return {"error": f"embedding sizes differ: {reference_matrix.shape[1]} and {candidate_matrix.shape[1]}"}
+    similarities = [float(reference_matrix[index] @ candidate_matrix[index]) for index in both]
+
+    labels = np.asarray(identities)
+    pairs = np.triu_indices(len(labels), k=1)
+    same_identity = labels[pairs[0]] == labels[pairs[1]]
+    reference_decisions = decisions(reference_matrix, threshold)
+    candidate_decisions = decisions(candidate_matrix, threshold)
+
+    return {
+        "images": len(reference),
+        "detected_by_both": len(both),
+        "detection_agreement": float(np.mean([(a is None) == (b is None) for a, b in zip(reference, candidate)])),
+        "embedding_cosine_mean": float(np.mean(similarities)) if similarities else None,
+        "embedding_cosine_min": float(np.min(similarities)) if similarities else None,
+        "decision_agreement": float(np.mean(reference_decisions == candidate_decisions)) if len(same_identity) else None,
+        "reference_pair_accuracy": float(np.mean(reference_decisions == same_identity)) if len(same_identity) else None,
+        "candidate_pair_accuracy": float(np.mean(candidate_decisions == same_identity)) if len(same_identity) else None,
+    }
+
+
+def main(fixtures_path: str, threshold: float, int8: bool, output: str = None):
+    settings = get_settings()
+    images, identities = load_fixtures(fixtures_path)
+    print(f"{len(images)} images of {len(set(identities))} identities")
+
+    variants = [("deepface", ModelProviderEnum.DEEPFACE.value, False),
+                ("onnx", ModelProviderEnum.ONNX.value, False)]
+    if int8:
+        variants.append(("onnx_int8", ModelProviderEnum.ONNX.value, True))
+
+    vectors, results = {}, {}
+    for label, provider_name, quantize_int8 in variants:
+        provider, load_seconds = build_provider(settings, provider_name, quantize_int8)
+        vectors[label], seconds_per_image = embed_all(provider, images)
+        results[label] = {"load_s": round(load_seconds, 3), "ms_per_image": round(seconds_per_image * 1000, 3)}
+
+    for label in vectors:
+        if label != "deepface":
+            results[label].update(compare(vectors["deepface"], vectors[label], identities, threshold))
+
+    for label, result in results.items():
+        print(f"{label:>10}: " + ", ".join(f"{key}={value}" for key, value in result.items()))
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("fixtures_path")
+    parser.add_argument("--threshold", type=float, default=0.40)
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    main(args.fixtures_path, args.threshold, args.int8, args.output)
@@ -0,0 +1,144 @@
+# Micro-benchmarks of the authentication pipeline stages on their own: read_frame, embedding and vector search.
+# Vector search runs the in-process providers at every gallery size, the in-memory copy and the mmap store
+# share one gallery on disk. Qdrant at scale is covered by benchmarks.qdrant_profiles.
+# Embedding loads the configured model provider, --face should be a photo with one face in it.
+# Run from src/ (the .env file must be there): python -m benchmarks.pipeline_micro --output micro.json
+from benchmarks.ingestion_memory import make_upload
+from benchmarks.onnx_parity import build_provider
+from benchmarks.standins import percentiles
+from helpers.config import get_settings
+from controllers import ImageController
+from stores.vectordb.providers import InMemoryVectorDB, MMapVectorDB
+from fastapi import UploadFile
+import numpy as np
+import argparse
+import tempfile
+import shutil
+import json
+import time
+import io
+import cv2
+
+
+def repeat(function, runs: int):
+    seconds = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - started_at)
+    return percentiles(seconds)
+
+
+def bench_read_frame(resolutions: list, runs: int):
+    image_controller = ImageController()
+    results = {}
+    for resolution in resolutions:
+        width, height = (int(side) for side in resolution.split("x"))
+        upload = UploadFile(file=io.BytesIO(make_upload(width, height)), filename="frame.jpg")
+
+        def read_frame():
+            upload.file.seek(0)
+            image_controller.read_frame(file=upload)
+
+        results[resolution] = repeat(read_frame, runs)
+    return results
+
+
+def bench_embedding(settings, face_path: str, batch_sizes: list, runs: int):
+    provider, load_seconds = build_provider(settings, settings.EMBEDDING_MODEL_PROVIDER)
+    frame = cv2.imread(face_path) if face_path else \
+        np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    face = provider.primary_face(frame)
+    face_found = face is not None
+    if not face_found:
+        # a synthetic frame has no face to detect, the model still runs on a corner crop
+        face = frame[:160, :160]
+
+    results = {"load_s": round(load_seconds, 3),
+               "face_found": face_found,
+               "detect": repeat(lambda: provider.detect(frame), runs),
+               "embed_image": repeat(lambda: provider.embed_image(image_path=frame), runs)}
+    for batch_size in batch_sizes:
+        results[f"embed_x{batch_size}"] = repeat(lambda: provider.embed([face] * batch_size), runs)
+    return results
+
+
+def bench_vector_search(settings, sizes: list, dim: int, queries: int, limit: int, chunk: int = 65536):
+    results = {}
+    rng = np.random.default_rng(0)
+    query_vectors = rng.standard_normal((queries, dim), dtype=np.float32)
+
+    for size in sizes:
+        directory = tempfile.mkdtemp(prefix="micro_vectordb")
+        try:
+            mmap_store = MMapVectorDB(data_base_path=directory, distance_method=settings.VECTORDB_DISTANCE_METHOD)
+            mmap_store.connect()
+            in_memory = InMemoryVectorDB(backing_client=mmap_store, distance_method=settings.VECTORDB_DISTANCE_METHOD,
+                                         dtype=settings.VECTORDB_INMEMORY_DTYPE)
+
+            # written once through the in-memory provider, which writes through to the mmap store
+            started_at = time.perf_counter()
+            in_memory.create_collection(collection_name="gallery", embedding_size=dim)
+            for start in range(0, size, chunk):
+                rows = range(start, min(start + chunk, size))
+                in_memory.insert_many_records(collection_name="gallery",
+                                              vectors=rng.standard_normal((len(rows), dim), dtype=np.float32),
+                                              meta_datas=[{"client_id": str(row)} for row in rows])
+            build_seconds = time.perf_counter() - started_at
+
+            results[str(size)] = {"build_s": round(build_seconds, 3)}
+            for name, provider in [("inmemory", in_memory), ("mmap", mmap_store)]:
+                next_query = iter(query_vectors)
+                results[str(size)][name] = repeat(lambda: provider.search_by_vector(collection_name="gallery",
+                                                                                    vector=next(next_query),
+                                                                                    limit=limit), queries)
+            mmap_store.disconnect()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def main(args):
+    settings = get_settings()
+    results = {}
+
+    if "read_frame" in args.only:
+        results["read_frame"] = bench_read_frame(args.resolutions, args.runs)
+        for resolution, stats in results["read_frame"].items():
+            print(f"read_frame {resolution:>10}: p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms")
+
+    if "embedding" in args.only:
+        results["embedding"] = bench_embedding(settings, args.face, args.batch_sizes, args.runs)
+        print(f"embedding model loaded in {results['embedding']['load_s']}s, face found: {results['embedding']['face_found']}")
+        for stage, stats in results["embedding"].items():
+            if isinstance(stats, dict):
+                print(f"embedding {stage:>11}: p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms")
+
+    if "search" in args.only:
+        dim = args.dim or settings.EMBEDDING_MODEL_SIZE
+        results["search"] = bench_vector_search(settings, args.gallery_sizes, dim, args.queries, args.limit)
+        for size, result in results["search"].items():
+            for name in ["inmemory", "mmap"]:
+                stats = result[name]
+                print(f"search {name:>8} {size:>8}: p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms "
+                      f"p99={stats['p99_ms']}ms (built in {result['build_s']}s)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of read_frame, embedding and vector search")
+    parser.add_argument("--only", nargs="+", default=["read_frame", "embedding", "search"],
+                        choices=["read_frame", "embedding", "search"])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--resolutions", nargs="+", default=["640x480", "1280x720", "1920x1080"])
+    parser.add_argument("--face", default=None, help="a photo with one face, defaults to a synthetic frame")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--gallery-sizes", nargs="+", type=int, default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=None, help="defaults to EMBEDDING_MODEL_SIZE")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--output", default=None)
+    main(parser.parse_args())
@@ -0,0 +1,127 @@
+# Recall and latency of each Qdrant collection profile against exact search on a synthetic gallery.
+# Needs a Qdrant server, local mode (:memory:) always searches exactly and only checks the wiring.
+# Run from src/ (the .env file must be there): python -m benchmarks.qdrant_profiles --size 1000000
+from helpers.config import get_settings
+from stores.vectordb.providers import Qdrant
+from stores.vectordb.QdrantProfile import QdrantProfile
+from qdrant_client import QdrantClient, models
+import numpy as np
+import argparse
+import json
+import time
+import uuid
+
+
+def make_gallery(size: int, dim: int, queries: int, noise: float, seed: int = 0):
+    # queries are noisy copies of enrolled vectors, like a new frame of a known face
+    rng = np.random.default_rng(seed)
+    gallery = rng.standard_normal((size, dim), dtype=np.float32)
+    gallery /= np.linalg.norm(gallery, axis=1, keepdims=True)
+    query_rows = rng.choice(size, size=queries, replace=False)
+    query_vectors = gallery[query_rows] + noise * rng.standard_normal((queries, dim), dtype=np.float32) / np.sqrt(dim)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return gallery, query_vectors
+
+
+def exact_top_k(gallery: np.ndarray, query_vectors: np.ndarray, k: int, chunk: int = 65536):
+    # ground truth straight from numpy, in chunks so a million row gallery does not need a second copy
+    scores = np.concatenate([query_vectors @ gallery[i:i + chunk].T for i in range(0, len(gallery), chunk)], axis=1)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row.tolist()) for row in top]
+
+
+def wait_until_indexed(provider: Qdrant, collection_name: str, timeout: float = 3600):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if provider.get_collection(collection_name).status == models.CollectionStatus.GREEN:
+            return True
+        time.sleep(1)
+    return False
+
+
+def build(provider: Qdrant, collection_name: str, gallery: np.ndarray, batch_size: int, parallel: int):
+    provider.delete_collection(collection_name)
+    started_at = time.perf_counter()
+    provider.create_collection(collection_name=collection_name, embedding_size=gallery.shape[1])
+    provider.insert_many_records(collection_name=collection_name,
+                                 vectors=gallery,
+                                 meta_datas=[{"row": row} for row in range(len(gallery))],
+                                 record_ids=[str(uuid.UUID(int=row)) for row in range(len(gallery))],
+                                 batch_size=batch_size,
+                                 parallel=parallel)
+    wait_until_indexed(provider, collection_name)
+    return time.perf_counter() - started_at
+
+
+def measure(provider: Qdrant, collection_name: str, query_vectors: np.ndarray, truth: list, k: int):
+    latencies, hits = [], 0
+    for query, expected in zip(query_vectors, truth):
+        started_at = time.perf_counter()
+        records = provider.search_by_vector(collection_name=collection_name, vector=query.tolist(), limit=k) or []
+        latencies.append(time.perf_counter() - started_at)
+        hits += len(expected & {record.meta_data["row"] for record in records})
+
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "recall_at_k": round(hits / (k * len(truth)), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+
+def main(url: str, profile_names: list, size: int, dim: int, queries: int, k: int, noise: float,
+         batch_size: int, parallel: int, keep: bool, output: str = None):
+    settings = get_settings()
+    gallery, query_vectors = make_gallery(size, dim, queries, noise)
+    truth = exact_top_k(gallery, query_vectors, k)
+    print(f"{size} vectors of {dim} dims, {queries} queries, recall@{k} against exact search")
+
+    results = {}
+    for name in profile_names:
+        profile = QdrantProfile.from_name(name)
+        provider = Qdrant(data_base_url=url, distance_method=settings.VECTORDB_DISTANCE_METHOD, profile=profile)
+        if url == ":memory:":
+            provider.client = QdrantClient(location=url)
+        else:
+            provider.connect()
+        collection_name = f"benchmark_{name}"
+
+        build_seconds = build(provider, collection_name, gallery, batch_size, parallel)
+        results[name] = dict(profile.describe(), build_s=round(build_seconds, 3))
+        results[name].update(measure(provider, collection_name, query_vectors, truth, k))
+
+        # the same collection searched exhaustively, the latency every profile is trying to beat
+        provider.search_params = models.SearchParams(exact=True)
+        exact = measure(provider, collection_name, query_vectors, truth, k)
+        results[name]["exact_p50_ms"] = exact["p50_ms"]
+
+        if not keep:
+            provider.delete_collection(collection_name)
+
+    for name, result in results.items():
+        print(f"{name:>8}: recall@{k}={result['recall_at_k']}, p50={result['p50_ms']}ms, p95={result['p95_ms']}ms, "
+              f"p99={result['p99_ms']}ms, exact p50={result['exact_p50_ms']}ms, build={result['build_s']}s")
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="Qdrant url, defaults to QDRANT_URL")
+    parser.add_argument("--profiles", nargs="+", default=list(QdrantProfile.PROFILES))
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=None, help="defaults to EMBEDDING_MODEL_SIZE")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.5)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark collections")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    settings = get_settings()
+    main(args.url or settings.QDRANT_URL, args.profiles, args.size, args.dim or settings.EMBEDDING_MODEL_SIZE,
+         args.queries, args.k, args.noise, args.batch_size, args.parallel, args.keep, args.output)
@@ -0,0 +1,124 @@
+# Throughput of the Qdrant provider over REST with the blocking client, REST with the async client and gRPC.
+# Every mode goes through the awaitable provider methods the request path uses, with `concurrency` requests in flight.
+# With --url :memory: both clients run Qdrant's local mode, gRPC is skipped and only the client overhead is compared.
+# Run from src/ (the .env file must be there): python -m benchmarks.qdrant_transport --url http://localhost:6333
+from helpers.config import get_settings
+from stores.vectordb.providers import Qdrant
+from qdrant_client import QdrantClient, AsyncQdrantClient
+import numpy as np
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+MODES = {
+    "rest_sync": {"use_async": False, "prefer_grpc": False},
+    "rest_async": {"use_async": True, "prefer_grpc": False},
+    "grpc_async": {"use_async": True, "prefer_grpc": True},
+}
+
+
+def make_provider(url: str, mode: str, pool_size: int, distance_method: str):
+    provider = Qdrant(data_base_url=url, distance_method=distance_method, pool_size=pool_size, **MODES[mode])
+    if url == ":memory:":
+        provider.client = QdrantClient(location=url)
+        if provider.use_async:
+            provider.async_client = AsyncQdrantClient(location=url)
+    else:
+        provider.connect()
+    return provider
+
+
+async def run_concurrently(operation, count: int, concurrency: int):
+    # a fixed number of callers, like that many requests waiting on the vector db at once
+    latencies = []
+    next_index = iter(range(count))
+
+    async def caller():
+        for index in next_index:
+            started_at = time.perf_counter()
+            await operation(index)
+            latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*[caller() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started_at
+
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "ops_per_s": round(count / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+    }
+
+
+async def bench_mode(provider: Qdrant, collection_name: str, gallery: np.ndarray, queries: np.ndarray,
+                     inserts: int, concurrency: int):
+    await provider.delete_collection_async(collection_name)
+    await provider.create_collection_async(collection_name=collection_name, embedding_size=gallery.shape[1])
+    await provider.insert_many_records_async(collection_name=collection_name,
+                                             vectors=gallery,
+                                             meta_datas=[{"row": row} for row in range(len(gallery))],
+                                             batch_size=256,
+                                             parallel=4)
+
+    async def search(index: int):
+        await provider.search_by_vector_async(collection_name=collection_name,
+                                              vector=queries[index % len(queries)].tolist(),
+                                              limit=1)
+
+    async def insert(index: int):
+        # one enrollment write, as /enroll issues it
+        await provider.insert_one_record_async(collection_name=collection_name,
+                                               vector=gallery[index % len(gallery)].tolist(),
+                                               meta_data={"row": index},
+                                               record_id=str(uuid.uuid4()))
+
+    result = {"search": await run_concurrently(search, len(queries), concurrency),
+              "insert": await run_concurrently(insert, inserts, concurrency)}
+    await provider.delete_collection_async(collection_name)
+    return result
+
+
+async def main(url: str, modes: list, size: int, dim: int, queries: int, inserts: int,
+               concurrency: int, pool_size: int, output: str = None):
+    settings = get_settings()
+    rng = np.random.default_rng(0)
+    gallery = rng.standard_normal((size, dim), dtype=np.float32)
+    query_vectors = rng.standard_normal((queries, dim), dtype=np.float32)
+    print(f"{size} vectors of {dim} dims, {queries} searches and {inserts} inserts, {concurrency} in flight")
+
+    results = {}
+    for mode in modes:
+        if url == ":memory:" and MODES[mode]["prefer_grpc"]:
+            print(f"{mode:>10}: skipped, local mode has no gRPC transport")
+            continue
+        provider = make_provider(url, mode, pool_size, settings.VECTORDB_DISTANCE_METHOD)
+        results[mode] = await bench_mode(provider, f"benchmark_{mode}", gallery, query_vectors, inserts, concurrency)
+        await provider.disconnect_async()
+
+        print(f"{mode:>10}: " + ", ".join(f"{operation} {result['ops_per_s']}/s "
+                                          f"(p50 {result['p50_ms']}ms, p95 {result['p95_ms']}ms)"
+                                          for operation, result in results[mode].items()))
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="Qdrant url, defaults to QDRANT_URL")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=None, help="defaults to EMBEDDING_MODEL_SIZE")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--inserts", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--pool-size", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    settings = get_settings()
+    asyncio.run(main(args.url or settings.QDRANT_URL, args.modes, args.size, args.dim or settings.EMBEDDING_MODEL_SIZE,
+                     args.queries, args.inserts, args.concurrency, args.pool_size, args.output))
@@ -0,0 +1,128 @@
+# Measures the per request cost of settings parsing and controller construction, through the real routes.
+# The app runs in-process like in benchmarks.load_test, with a zero latency stub model so the overhead is not
+# buried under inference. "after" is the app as it is, "before" puts back what the routes did per request
+# before the settings were cached and the controllers became app scoped:
+#   - Depends(get_settings) and every BaseController parse .env again
+#   - /authenticate builds an ImageController and an EmbeddingController
+#   - /register_client builds an ImageController
+# ImageController now builds its ClientController up front, where the old register_client built it in
+# generate_unique_file_path, so the authenticate "before" figure includes one parse the old code did not do.
+# Run from src/ (the .env file must be there, needs mongomock-motor): python -m benchmarks.request_overhead
+from benchmarks.standins import stand_ins, make_face, encode_jpeg, percentiles
+from benchmarks.load_test import configure
+from helpers.config import get_settings
+from controllers import ImageController, EmbeddingController
+import controllers.BaseController as base_controller_module
+import argparse
+import asyncio
+import tempfile
+import shutil
+import httpx
+import time
+import os
+
+AUTHENTICATE_PATH = "/api/v1/authenticate/authenticate"
+REGISTER_PATH = "/api/v1/client/register_client"
+
+
+def uncached_settings():
+    # the behaviour before get_settings was cached: every call parses .env again
+    return get_settings.__wrapped__()
+
+
+class PerRequestControllers:
+    """ASGI wrapper that rebuilds the controllers a route used to construct, before the route runs."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            if scope["path"] == AUTHENTICATE_PATH:
+                self.app.image_controller = ImageController()
+                self.app.embedding_controller = EmbeddingController(vector_db_client=self.app.vector_db_client,
+                                                                    embedding_client=self.app.embedding_client,
+                                                                    inference_client=self.app.inference_executor,
+                                                                    shard_manager=self.app.vector_db_shards,
+                                                                    embedding_cache=self.app.embedding_cache)
+            elif scope["path"] == REGISTER_PATH:
+                self.app.image_controller = ImageController()
+        await self.app(scope, receive, send)
+
+
+async def measure(client: httpx.AsyncClient, number: int, frame: bytes, run_id: str):
+    latencies = {"authenticate": [], "register": []}
+    for index in range(number):
+        started_at = time.perf_counter()
+        response = await client.post(AUTHENTICATE_PATH, files={"image1": ("frame.jpg", frame, "image/jpeg")},
+                                     data={"device_id": "overheaddoor"})
+        latencies["authenticate"].append(time.perf_counter() - started_at)
+        response.raise_for_status()
+
+        started_at = time.perf_counter()
+        response = await client.post(REGISTER_PATH, files={"image1": ("face.jpg", frame, "image/jpeg")},
+                                     data={"client_name": "overhead", "client_id": f"overhead{run_id}{index}"})
+        latencies["register"].append(time.perf_counter() - started_at)
+        response.raise_for_status()
+    return {route: percentiles(samples) for route, samples in latencies.items()}
+
+
+async def run(number: int):
+    import main as app_module
+
+    frame = encode_jpeg(make_face(0))
+    results = {}
+    with stand_ins(app_module, latency_ms=0.0):
+        app = app_module.app
+        async with app.router.lifespan_context(app):
+            await app.warm_up_task
+            # an empty gallery, so every search finds its collection and returns quickly
+            await app.vector_db_shards.ensure_collection(collection_name=app.vector_db_shards.base_collection_name)
+            image_controller, embedding_controller = app.image_controller, app.embedding_controller
+
+            for mode in ["after", "before", "after again"]:
+                before = mode == "before"
+                asgi_app = PerRequestControllers(app) if before else app
+                if before:
+                    app.dependency_overrides[get_settings] = uncached_settings
+                    base_controller_module.get_settings = uncached_settings
+                try:
+                    transport = httpx.ASGITransport(app=asgi_app)
+                    async with httpx.AsyncClient(transport=transport, base_url="http://overhead") as client:
+                        # the first requests pay for imports and lazy initialisation, they are not counted
+                        await measure(client, 5, frame, f"warmup{mode.replace(' ', '')}")
+                        results[mode] = await measure(client, number, frame, mode.replace(" ", ""))
+                finally:
+                    app.dependency_overrides.pop(get_settings, None)
+                    base_controller_module.get_settings = get_settings
+                    app.image_controller, app.embedding_controller = image_controller, embedding_controller
+    return results
+
+
+def main(number: int):
+    work_dir = tempfile.mkdtemp(prefix="overhead")
+    configure(argparse.Namespace(vector_db="inmemory", qdrant_url=None), work_dir)
+    try:
+        results = asyncio.run(run(number))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        files_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets/Clients")
+        for name in os.listdir(files_dir) if os.path.isdir(files_dir) else []:
+            if name.startswith("overhead"):
+                shutil.rmtree(os.path.join(files_dir, name), ignore_errors=True)
+
+    for mode, routes in results.items():
+        for route, stats in routes.items():
+            print(f"{mode:<12} {route:<13} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms mean={stats['mean_ms']}ms")
+
+    after = {route: min(results["after"][route]["p50_ms"], results["after again"][route]["p50_ms"])
+             for route in results["before"]}
+    for route, stats in results["before"].items():
+        print(f"{route + ' saving':<26} {stats['p50_ms'] - after[route]:>8.3f} ms/request (p50)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per request settings and controller overhead, through the routes")
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+    main(number=args.number)
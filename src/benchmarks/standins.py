@@ -0,0 +1,203 @@
+# In-process stand-ins for the services around the API, shared by the load test and the micro-benchmarks.
+# Only the external systems are replaced: Mongo, Firebase, the embedding model and the vector db server.
+from stores.deeplearning.InferenceExecutor import InferenceQueueFullError
+from stores.vectordb.VectorDBFactory import VectorDBFactory
+from stores.vectordb.QdrantProfile import QdrantProfile
+from stores.vectordb.providers import Qdrant
+from helpers.timing import StageTimer
+from contextlib import contextmanager
+from qdrant_client import QdrantClient
+import numpy as np
+import functools
+import asyncio
+import time
+import os
+import cv2
+
+
+class StubEmbeddingClient:
+    """Inference executor stand-in that answers after a configurable delay.
+
+    Vectors are a fixed random projection of a downsampled grey image, so the
+    same face image always maps to the same vector and unrelated images land
+    far apart. At most `workers` calls are "on the model" at once and calls
+    beyond max_pending are rejected, like the real executor.
+    """
+
+    def __init__(self, config, latency_ms: float = 30.0, jitter_ms: float = 0.0, batch_item_ms: float = 0.0,
+                 seed: int = 0):
+        self.config = config
+        self.executor_type = "stub"
+        self.workers = config.INFERENCE_WORKERS or os.cpu_count() or 1
+        self.max_pending = self.workers + config.INFERENCE_MAX_QUEUE_SIZE
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.batch_item_ms = batch_item_ms
+        self.rng = np.random.default_rng(seed)
+        self.projection = np.random.default_rng(seed).standard_normal((256, config.EMBEDDING_MODEL_SIZE)).astype(np.float32)
+        self.slots = None
+        self.pending = 0
+        self.rejected = 0
+        self.timer = StageTimer()
+        self.ready = False
+        self.startup_report = None
+
+    def start(self):
+        return True
+
+    def warm_up(self):
+        self.ready = True
+        return True
+
+    def shutdown(self):
+        pass
+
+    def vector(self, image):
+        grey = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        pixels = cv2.resize(grey, (16, 16), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+        pixels -= pixels.mean()
+        vector = pixels @ self.projection
+        return (vector / max(float(np.linalg.norm(vector)), 1e-12)).tolist()
+
+    async def run(self, count: int):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise InferenceQueueFullError(f"{self.pending} inference requests are already pending")
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.workers)
+
+        self.pending += 1
+        submitted_at = time.monotonic()
+        try:
+            async with self.slots:
+                started_at = time.monotonic()
+                latency_ms = self.latency_ms + (count - 1) * self.batch_item_ms
+                if self.jitter_ms:
+                    latency_ms += abs(float(self.rng.normal(0, self.jitter_ms)))
+                await asyncio.sleep(latency_ms / 1000)
+        finally:
+            self.pending -= 1
+
+        self.timer.record("queue_wait", started_at - submitted_at)
+        self.timer.record("inference", time.monotonic() - started_at)
+
+    async def embed_image(self, image_path):
+        await self.run(1)
+        return self.vector(image_path)
+
+    async def embed_images(self, images: list):
+        await self.run(len(images))
+        return [self.vector(image) for image in images]
+
+    async def detect_faces(self, image):
+        await self.run(1)
+        return [(0, 0, image.shape[1], image.shape[0])]
+
+    async def embed_faces(self, image, boxes: list):
+        await self.run(len(boxes))
+        return [self.vector(image[y:y + h, x:x + w]) for x, y, w, h in boxes]
+
+    def get_stats(self):
+        return {
+            "executor_type": self.executor_type,
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "ready": self.ready,
+            "stages": self.timer.snapshot(),
+        }
+
+
+class StubInferenceExecutorFactory:
+
+    def __init__(self, config, **stub_options):
+        self.config = config
+        self.stub_options = stub_options
+
+    def intialize_executor(self, executor_type: str):
+        return StubEmbeddingClient(config=self.config, **self.stub_options)
+
+
+class LocalQdrant(Qdrant):
+    # Qdrant's local mode, one in-process store behind the blocking client, awaited from worker threads
+
+    def connect(self):
+        self.client = QdrantClient(location=self.data_base_url)
+        self.async_client = None
+        self.load_schemas()
+
+
+class StandInVectorDBFactory(VectorDBFactory):
+    """The configured provider, with Qdrant in local mode unless QDRANT_URL points at a server."""
+
+    def intialize_qdrant(self, use_async: bool = False):
+        if self.config.QDRANT_URL != ":memory:":
+            return super().intialize_qdrant(use_async=use_async)
+        return LocalQdrant(data_base_url=":memory:",
+                           distance_method=self.config.VECTORDB_DISTANCE_METHOD,
+                           profile=QdrantProfile.from_settings(self.config))
+
+
+@contextmanager
+def stand_ins(app_module, **stub_options):
+    """Points main.py's lifespan at the stand-ins, so the app starts exactly as it would in production."""
+    from mongomock_motor import AsyncMongoMockClient
+
+    replaced = {
+        "AsyncIOMotorClient": AsyncMongoMockClient,
+        "InferenceExecutorFactory": functools.partial(StubInferenceExecutorFactory, **stub_options),
+        "VectorDBFactory": StandInVectorDBFactory,
+    }
+    originals = {name: getattr(app_module, name) for name in replaced}
+    for name, value in replaced.items():
+        setattr(app_module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in originals.items():
+            setattr(app_module, name, value)
+
+
+def make_face(identity: int, size: int = 160, variant: int = 0):
+    # a smooth random pattern per identity, variants add the noise of a new photo of the same person
+    rng = np.random.default_rng(identity)
+    face = cv2.resize(rng.integers(0, 256, (16, 16, 3), dtype=np.uint8), (size, size), interpolation=cv2.INTER_CUBIC)
+    if variant:
+        noise = np.random.default_rng((identity, variant)).normal(0, 6, face.shape)
+        face = np.clip(face + noise, 0, 255).astype(np.uint8)
+    return face
+
+
+def encode_jpeg(image, quality: int = 90):
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def load_fixtures(fixtures_path: str):
+    # the bulk enrollment layout, one directory of images per identity
+    identities = {}
+    for identity in sorted(os.listdir(fixtures_path)):
+        identity_dir = os.path.join(fixtures_path, identity)
+        if not os.path.isdir(identity_dir):
+            continue
+        images = []
+        for name in sorted(os.listdir(identity_dir)):
+            if name.lower().endswith((".jpg", ".jpeg", ".png")):
+                with open(os.path.join(identity_dir, name), "rb") as f:
+                    images.append(f.read())
+        if images:
+            identities[identity] = images
+    return identities
+
+
+def percentiles(seconds: list):
+    if not seconds:
+        return {"count": 0}
+    milliseconds = np.asarray(seconds) * 1000
+    return {
+        "count": len(seconds),
+        "mean_ms": round(float(milliseconds.mean()), 3),
+        "p50_ms": round(float(np.percentile(milliseconds, 50)), 3),
+        "p95_ms": round(float(np.percentile(milliseconds, 95)), 3),
+        "p99_ms": round(float(np.percentile(milliseconds, 99)), 3),
+    }
@@ -1,50 +1,190 @@
 from .BaseController import BaseController
+from stores.vectordb.VectorDBEnums import VectorDBSearchMode, VectorDBMetricMethod
+from stores.vectordb.VectorDBShardManager import VectorDBShardManager
+from helpers.metrics import get_metrics
 import os
 from numpy.typing import NDArray
 import numpy as np
+import functools
+import asyncio
 class EmbeddingController(BaseController):
-    def __init__(self, vector_db_client, embedding_client):
+    def __init__(self, vector_db_client, embedding_client, inference_client = None, shard_manager = None,
+                 embedding_cache = None):
         super().__init__()
         self.vector_db_client = vector_db_client
         self.embedding_client = embedding_client
+        # only camera frames go through the cache, enrollment images are always embedded by the model
+        self.embedding_cache = embedding_cache
+        # detection and face crops go straight to the workers, the embedding client may be a cache or batcher
+        self.inference_client = inference_client or embedding_client
+        self.shard_manager = shard_manager or VectorDBShardManager(vector_db_client = vector_db_client,
+                                                                   base_collection_name = self.app_settings.COLLECTION_NAME,
+                                                                   embedding_size = self.app_settings.EMBEDDING_MODEL_SIZE)
         
-    def push_image_to_vector_db(self, image_path: str, meta_data:dict):
+    async def push_image_to_vector_db(self, image_path: str, meta_data:dict):
         collection_name =  self.app_settings.COLLECTION_NAME
         
-        return_val =  self.vector_db_client.create_collection(collection_name = collection_name,
-                                                              embedding_size = self.app_settings.EMBEDDING_MODEL_SIZE)
+        return_val =  await self.shard_manager.ensure_collection(collection_name = collection_name)
         
         if return_val is None:
             return None
         
-        vector =  self.embedding_client.embed_image(image_path = image_path)
+        with get_metrics().span("embedding"):
+            vector =  await self.embedding_client.embed_image(image_path = image_path)
+        
+        if vector is None:
+            return None
 
-        return_val = self.vector_db_client.insert_one_record(collection_name = collection_name,
-                                                             vector = vector,
-                                                             meta_data = meta_data)
+        with get_metrics().span("vector_write"):
+            return_val = await self.vector_db_client.insert_one_record_async(collection_name = collection_name,
+                                                                             vector = vector,
+                                                                             meta_data = meta_data)
         
         if return_val != True:
             return None
         
         return True 
     
-    def get_frame_query_embeddeing(self, image: NDArray[np.uint8] ):
-        vector =  self.embedding_client.embed_image(image_path = image)
+    async def push_vector_to_vector_db(self, vector: list, meta_data: dict, record_id: str = None):
+        collection_name =  self.app_settings.COLLECTION_NAME
+        
+        return_val = await self.shard_manager.ensure_collection(collection_name = collection_name)
+        if return_val is None:
+            return None
+        
+        return_val = await self.vector_db_client.insert_one_record_async(collection_name = collection_name,
+                                                                         vector = vector,
+                                                                         meta_data = meta_data,
+                                                                         record_id = record_id)
+        if return_val != True:
+            return None
+        
+        return True
+    
+    async def remove_vectors_from_vector_db(self, record_ids: list):
+        return await self.vector_db_client.delete_records_async(collection_name = self.app_settings.COLLECTION_NAME,
+                                                                record_ids = record_ids)
+    
+    def compute_centroid(self, vectors: list):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        centroid = vectors.mean(axis=0)
+        return (centroid / max(float(np.linalg.norm(centroid)), 1e-12)).tolist()
+    
+    async def push_client_vectors_to_vector_db(self, vectors: list, meta_data: dict,
+                                               centroid_record_id: str, image_record_ids: list, site_ids: list = None):
+        # a client allowed at several sites is written to each site's shard
+        with get_metrics().span("vector_write"):
+            results = await asyncio.gather(*[self.write_client_vectors(collection_name = collection_name,
+                                                                       vectors = vectors,
+                                                                       meta_data = meta_data,
+                                                                       centroid_record_id = centroid_record_id,
+                                                                       image_record_ids = image_record_ids)
+                                             for collection_name in self.shard_manager.collection_names(site_ids)])
+        if not all(results):
+            return None
+        
+        return True
+    
+    async def write_client_vectors(self, collection_name: str, vectors: list, meta_data: dict,
+                             centroid_record_id: str, image_record_ids: list):
+        # per-image vectors sit next to the centroids and are only read to re-rank candidates
+        images_collection_name = self.shard_manager.images_collection_name(collection_name)
+        for name in [collection_name, images_collection_name]:
+            if await self.shard_manager.ensure_collection(collection_name = name) is None:
+                return None
+        
+        # the images are written first, so a searchable centroid always has its images to re-rank with
+        return_val = await self.vector_db_client.insert_many_records_async(collection_name = images_collection_name,
+                                                                           vectors = vectors,
+                                                                           meta_datas = [dict(meta_data, image_index = index) for index in range(len(vectors))],
+                                                                           record_ids = image_record_ids)
+        if return_val != True:
+            return None
+        
+        return_val = await self.vector_db_client.insert_one_record_async(collection_name = collection_name,
+                                                                         vector = self.compute_centroid(vectors),
+                                                                         meta_data = dict(meta_data, image_record_ids = image_record_ids),
+                                                                         record_id = centroid_record_id)
+        if return_val != True:
+            return None
+        
+        return True
+    
+    async def remove_client_vectors_from_vector_db(self, centroid_record_id: str, image_record_ids: list, site_ids: list = None):
+        removals = []
+        for collection_name in self.shard_manager.collection_names(site_ids):
+            removals.append(self.vector_db_client.delete_records_async(collection_name = collection_name,
+                                                                       record_ids = [centroid_record_id]))
+            removals.append(self.vector_db_client.delete_records_async(collection_name = self.shard_manager.images_collection_name(collection_name),
+                                                                       record_ids = image_record_ids))
+        return await asyncio.gather(*removals)
+    
+    async def get_frame_query_embeddeing(self, image: NDArray[np.uint8], source_id: str = None):
+        with get_metrics().span("embedding"):
+            if self.embedding_cache is not None:
+                vector =  await self.embedding_cache.embed_image(image_path = image, source_id = source_id)
+            else:
+                vector =  await self.embedding_client.embed_image(image_path = image)
         
         if vector != None:
             return vector
         
         return None
     
-    def search_data_base(self, vector: list, limit:int  = 1):
-        collection_name =  self.app_settings.COLLECTION_NAME
-        documents = self.vector_db_client.search_by_vector(collection_name = collection_name,
-                                                           vector= vector,
-                                                           limit = limit)
+    async def get_enrollment_embedding(self, image: NDArray[np.uint8]):
+        with get_metrics().span("embedding"):
+            return await self.embedding_client.embed_image(image_path = image)
+    
+    async def detect_frame_faces(self, image: NDArray[np.uint8]):
+        with get_metrics().span("detection"):
+            return await self.inference_client.detect_faces(image = image)
+    
+    async def get_face_embeddings(self, image: NDArray[np.uint8], boxes: list):
+        with get_metrics().span("embedding"):
+            return await self.inference_client.embed_faces(image = image, boxes = boxes)
+    
+    async def search_data_base(self, vector: list, limit:int  = 1, site_id: str = None):
+        rerank = self.app_settings.SEARCH_MODE == VectorDBSearchMode.RERANK.value
+        with get_metrics().span("vector_search"):
+            documents = await self.shard_manager.search(vector = vector,
+                                                        limit = max(limit, self.app_settings.SEARCH_RERANK_CANDIDATES) if rerank else limit,
+                                                        site_id = site_id,
+                                                        rescore = functools.partial(self.rerank_by_image_vectors, vector) if rerank else None)
         if not documents:
             return None
         
-        return documents
+        return documents[:limit]
+    
+    async def rerank_by_image_vectors(self, vector: list, collection_name: str, documents: list):
+        # the centroid search narrowed the gallery to a few identities, each is now scored by its closest image
+        image_record_ids = [record_id for document in documents
+                            for record_id in (document.meta_data or {}).get("image_record_ids", [])]
+        if not image_record_ids:
+            return documents
+        
+        image_vectors = await self.vector_db_client.retrieve_vectors_async(collection_name = self.shard_manager.images_collection_name(collection_name),
+                                                                           record_ids = image_record_ids)
+        if not image_vectors:
+            return documents
+        
+        query = np.asarray(vector, dtype=np.float32)
+        normalize = self.app_settings.VECTORDB_DISTANCE_METHOD != VectorDBMetricMethod.DOT.value
+        if normalize:
+            query = query / max(float(np.linalg.norm(query)), 1e-12)
+        
+        for document in documents:
+            vectors = [image_vectors[record_id] for record_id in (document.meta_data or {}).get("image_record_ids", [])
+                       if record_id in image_vectors]
+            # clients enrolled with a single image keep their centroid score
+            if not vectors:
+                continue
+            vectors = np.asarray(vectors, dtype=np.float32)
+            if normalize:
+                vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            document.score = float((vectors @ query).max())
+        
+        return sorted(documents, key=lambda document: document.score, reverse=True)
             
         
     
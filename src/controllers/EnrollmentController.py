@@ -0,0 +1,249 @@
+from .BaseController import BaseController
+from .ClientController import ClientController
+from .ImageController import ImageController
+from models.db_schemes import Client, EnrollmentJob
+from models.enums.EnrollmentJobEnum import EnrollmentJobStatus
+from models.enums.ResponseSignal import ResponseSignal
+import logging
+import numpy as np
+import mimetypes
+import zipfile
+import asyncio
+import csv
+import io
+import os
+import uuid
+import cv2
+
+
+class EnrollmentController(BaseController):
+    def __init__(self, vector_db_client, embedding_client, client_data_model, job_data_model,
+                 embedding_concurrency: int = 1):
+        super().__init__()
+        self.vector_db_client = vector_db_client
+        self.embedding_client = embedding_client
+        self.client_data_model = client_data_model
+        self.job_data_model = job_data_model
+        self.embedding_concurrency = embedding_concurrency
+        self.client_controller = ClientController()
+        self.image_controller = ImageController()
+        self.logger = logging.getLogger(__name__)
+
+    def resolve_import_path(self, source_path: str):
+        # the API only ingests what was dropped under the import root, the CLI takes any path
+        import_root = os.path.realpath(os.path.join(self.base_dir, self.app_settings.ENROLLMENT_IMPORT_ROOT))
+        resolved_path = os.path.realpath(os.path.join(import_root, source_path))
+        if os.path.commonpath([import_root, resolved_path]) != import_root:
+            return None
+        return resolved_path
+
+    async def create_or_resume_job(self, source_path: str, job_id: str = None, force: bool = False):
+        if job_id:
+            job = await self.job_data_model.get_job_by_job_id(job_id=job_id)
+            if job is None:
+                return None, ResponseSignal.ENROLLMENT_JOB_NOT_FOUND.value
+            if job.status == EnrollmentJobStatus.COMPLETED.value:
+                return job, ResponseSignal.ENROLLMENT_JOB_RESUMED.value
+            # two runs over the same cursor would enroll every remaining client twice
+            if not await self.job_data_model.claim_job(job_id=job_id, force=force):
+                return None, ResponseSignal.ENROLLMENT_JOB_RUNNING.value
+            return job, ResponseSignal.ENROLLMENT_JOB_RESUMED.value
+
+        if not source_path or not os.path.exists(source_path):
+            return None, ResponseSignal.ENROLLMENT_SOURCE_NOT_FOUND.value
+
+        job = await self.job_data_model.create_job(job=EnrollmentJob(job_id=self.generate_random_string(),
+                                                                     source_path=source_path,
+                                                                     status=EnrollmentJobStatus.RUNNING.value))
+        return job, ResponseSignal.ENROLLMENT_JOB_STARTED.value
+
+    def is_image_name(self, name: str):
+        content_type, _ = mimetypes.guess_type(name)
+        return content_type in self.app_settings.IMAGE_ALLOWED_EXTENSIONS
+
+    def is_valid_client_id(self, client_id: str):
+        # the client id becomes a directory under assets/Clients, archive entries like ../x.jpg must not escape it
+        return bool(client_id.strip(".")) and ".." not in client_id \
+            and client_id == self.image_controller.clean_file_name(file_name=client_id)
+
+    def scan_source(self, source_path: str):
+        # accepted layouts: <client_id>.<ext> or <client_id>/<image> (first image wins),
+        # plus an optional manifest.csv with client_id,client_name columns
+        if zipfile.is_zipfile(source_path):
+            with zipfile.ZipFile(source_path) as archive:
+                names = [name for name in archive.namelist() if not name.endswith("/")]
+        else:
+            names = []
+            for directory, _, files in os.walk(source_path):
+                relative_directory = os.path.relpath(directory, source_path)
+                for file_name in files:
+                    names.append(file_name if relative_directory == "." else f"{relative_directory}/{file_name}".replace(os.sep, "/"))
+
+        entries = {}
+        for name in sorted(names):
+            parts = name.split("/")
+            if len(parts) > 2 or not self.is_image_name(parts[-1]):
+                continue
+            client_id = os.path.splitext(parts[0])[0] if len(parts) == 1 else parts[0]
+            entries.setdefault(client_id, name)
+
+        client_names = {}
+        if "manifest.csv" in names:
+            manifest = self.read_source_entry(source_path, "manifest.csv").decode("utf-8")
+            for row in csv.DictReader(io.StringIO(manifest)):
+                client_names[row["client_id"]] = row["client_name"]
+
+        return sorted(entries.items()), client_names
+
+    def read_source_entry(self, source_path: str, name: str):
+        if zipfile.is_zipfile(source_path):
+            with zipfile.ZipFile(source_path) as archive:
+                return archive.read(name)
+
+        with open(os.path.join(source_path, name), "rb") as f:
+            return f.read()
+
+    def read_source_batch(self, source_path: str, batch: list):
+        frames = []
+        archive = zipfile.ZipFile(source_path) if zipfile.is_zipfile(source_path) else None
+        try:
+            for client_id, name in batch:
+                if archive is not None:
+                    data = archive.read(name)
+                else:
+                    with open(os.path.join(source_path, name), "rb") as f:
+                        data = f.read()
+                image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+                frames.append((client_id, name, data, image))
+        finally:
+            if archive is not None:
+                archive.close()
+        return frames
+
+    def get_bulk_image_path(self, client_id: str, name: str):
+        clean_file_name = self.image_controller.clean_file_name(file_name=os.path.basename(name))
+        # a fixed file name keeps a resumed chunk from leaving duplicate files behind
+        return os.path.join(self.files_dir, client_id, "bulk_" + clean_file_name)
+
+    def persist_client_image(self, client_id: str, image_path: str, data: bytes):
+        self.client_controller.get_client_path(client_id=client_id)
+        with open(image_path, "wb") as f:
+            f.write(data)
+
+    async def embed_images_with_backoff(self, images: list):
+        # imported here, the inference stores import the controllers package through ModelFactory
+        from stores.deeplearning.InferenceExecutor import InferenceQueueFullError
+
+        # live authentication traffic has priority on the inference queue, a full queue only delays the job
+        backoff = self.app_settings.ENROLLMENT_QUEUE_FULL_BACKOFF_SECONDS
+        for attempt in range(self.app_settings.ENROLLMENT_QUEUE_FULL_RETRIES + 1):
+            try:
+                return await self.embedding_client.embed_images(images=images)
+            except InferenceQueueFullError:
+                if attempt == self.app_settings.ENROLLMENT_QUEUE_FULL_RETRIES:
+                    raise
+                self.logger.info(f"Inference queue is full, retrying the enrollment batch in {backoff:.2f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 10.0)
+
+    async def embed_batch(self, source_path: str, batch: list, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            frames = await asyncio.to_thread(self.read_source_batch, source_path, batch)
+
+            decoded = [frame for frame in frames if frame[3] is not None]
+            vectors = []
+            if decoded:
+                vectors = await self.embed_images_with_backoff(images=[frame[3] for frame in decoded])
+
+        return [(client_id, name, data, vector)
+                for (client_id, name, data, _), vector in zip(decoded, vectors)
+                if vector is not None]
+
+    async def enroll_chunk(self, source_path: str, chunk: list, client_names: dict):
+        batch_size = self.app_settings.ENROLLMENT_EMBEDDING_BATCH_SIZE
+        semaphore = asyncio.Semaphore(self.embedding_concurrency)
+        batches = [chunk[i:i + batch_size] for i in range(0, len(chunk), batch_size)]
+
+        results = await asyncio.gather(*[self.embed_batch(source_path, batch, semaphore) for batch in batches])
+
+        clients, vectors, meta_datas, record_ids = [], [], [], []
+        for client_id, name, data, vector in (item for result in results for item in result):
+            if not self.is_valid_client_id(client_id):
+                self.logger.error(f"Invalid client {client_id} in bulk enrollment: not usable as a directory name")
+                continue
+            try:
+                client = Client(client_id=client_id,
+                                client_name=client_names.get(client_id, client_id),
+                                client_image_path=self.get_bulk_image_path(client_id, name))
+            except ValueError as e:
+                self.logger.error(f"Invalid client {client_id} in bulk enrollment: {e}")
+                continue
+
+            await asyncio.to_thread(self.persist_client_image, client_id, client.client_image_path, data)
+
+            clients.append(client)
+            vectors.append(vector)
+            meta_datas.append({"client_id": client.client_id,
+                               "client_image_path": client.client_image_path,
+                               "client_name": client.client_name})
+            # stable point ids make a re-run of the same chunk overwrite instead of duplicate
+            record_ids.append(str(uuid.uuid5(uuid.NAMESPACE_URL, client.client_id)))
+
+        await self.client_data_model.create_clients(clients=clients)
+
+        return_val = await self.vector_db_client.insert_many_records_async(collection_name=self.app_settings.COLLECTION_NAME,
+                                                                           vectors=vectors,
+                                                                           meta_datas=meta_datas,
+                                                                           record_ids=record_ids,
+                                                                           batch_size=self.app_settings.VECTORDB_UPSERT_BATCH_SIZE,
+                                                                           parallel=self.app_settings.VECTORDB_UPSERT_PARALLEL)
+        if return_val is None and vectors:
+            raise RuntimeError("Error in upserting the chunk vectors")
+
+        enrolled_ids = {client.client_id for client in clients}
+        failed_ids = [client_id for client_id, _ in chunk if client_id not in enrolled_ids]
+        return len(enrolled_ids), failed_ids
+
+    async def run_job(self, job_id: str):
+        job = await self.job_data_model.get_job_by_job_id(job_id=job_id)
+        # create_or_resume_job already claimed the job, so no other run works on it
+        if job is None or job.status == EnrollmentJobStatus.COMPLETED.value:
+            return job
+
+        try:
+            entries, client_names = await asyncio.to_thread(self.scan_source, job.source_path)
+            job.total = len(entries)
+            await self.job_data_model.update_job(job_id=job_id, fields={"total": job.total})
+
+            return_val = await self.vector_db_client.create_collection_async(collection_name=self.app_settings.COLLECTION_NAME,
+                                                                             embedding_size=self.app_settings.EMBEDDING_MODEL_SIZE)
+            if return_val is None:
+                raise RuntimeError("Error in creating the vector db collection")
+
+            # entries are sorted by client id, so the last finished client id is the resume cursor
+            remaining = [entry for entry in entries
+                         if job.last_client_id is None or entry[0] > job.last_client_id]
+
+            chunk_size = self.app_settings.ENROLLMENT_CHUNK_SIZE
+            for i in range(0, len(remaining), chunk_size):
+                chunk = remaining[i:i + chunk_size]
+                enrolled, failed_ids = await self.enroll_chunk(job.source_path, chunk, client_names)
+
+                job.enrolled += enrolled
+                job.failed += len(failed_ids)
+                job.failed_client_ids.extend(failed_ids)
+                job.last_client_id = chunk[-1][0]
+                await self.job_data_model.update_job(job_id=job_id,
+                                                     fields={"enrolled": job.enrolled,
+                                                             "failed": job.failed,
+                                                             "last_client_id": job.last_client_id},
+                                                     failed_client_ids=failed_ids)
+                self.logger.info(f"Bulk enrollment {job_id}: {job.enrolled + job.failed}/{len(entries)}")
+
+            job.status = EnrollmentJobStatus.COMPLETED.value
+        except Exception as e:
+            self.logger.error(f"Bulk enrollment {job_id} failed: {e}")
+            job.status = EnrollmentJobStatus.FAILED.value
+
+        await self.job_data_model.update_job(job_id=job_id, fields={"status": job.status})
+        return job
@@ -1,14 +1,22 @@
 from .BaseController import BaseController
 from fastapi import UploadFile
 from models.enums.ResponseSignal import ResponseSignal
+from helpers.metrics import get_metrics
 import re
 from .ClientController import ClientController
 import os
 import cv2
 import numpy as np
+import struct
+
+# libjpeg can decode straight to 1/2, 1/4 or 1/8 scale by truncating the DCT
+REDUCED_DECODE_FLAGS = [(8, cv2.IMREAD_REDUCED_COLOR_8),
+                        (4, cv2.IMREAD_REDUCED_COLOR_4),
+                        (2, cv2.IMREAD_REDUCED_COLOR_2)]
 class ImageController(BaseController):
     def __init__(self):
         super().__init__()
+        self.client_controller = ClientController()
         
     def validate_image(self, file: UploadFile):
         if file.content_type not in self.app_settings.IMAGE_ALLOWED_EXTENSIONS:
@@ -20,7 +28,7 @@ class ImageController(BaseController):
         
         random_file_name = self.generate_random_string()
         
-        client_diectory = ClientController().get_client_path(client_id=client_id)
+        client_diectory = self.client_controller.get_client_path(client_id=client_id)
         
         clean_file_name = self.clean_file_name(file_name= original_file_name)
         
@@ -30,8 +38,8 @@ class ImageController(BaseController):
         
         
         while os.path.exists(new_unique_file_path):
-            random_file_name = self.generate_unique_file_name
-            new_unique_file_path = os.path.join(clean_file_name, random_file_name + "_" + clean_file_name)
+            random_file_name = self.generate_random_string()
+            new_unique_file_path = os.path.join(client_diectory, random_file_name + "_" + clean_file_name)
         
         return new_unique_file_path, random_file_name + "_" + clean_file_name
         
@@ -44,12 +52,55 @@ class ImageController(BaseController):
         
         return cleaned_name   
     
+    def get_image_size(self, data: bytes):
+        if data[:8] == b"\x89PNG\r\n\x1a\n":
+            # a truncated upload is left to imdecode, which rejects it
+            if len(data) < 24:
+                return None
+            width, height = struct.unpack(">II", data[16:24])
+            return width, height
+        
+        if data[:2] != b"\xff\xd8":
+            return None
+        
+        # walk the jpeg segments up to the start of frame header, no pixel is decoded
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if marker == 0xFF or marker == 0x01 or 0xD0 <= marker <= 0xD8:
+                i += 1 if marker == 0xFF else 2
+                continue
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", data[i + 5:i + 9])
+                return width, height
+            i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+        
+        return None
+    
+    def decode_image(self, data: bytes):
+        flag = cv2.IMREAD_COLOR
+        max_side = self.app_settings.IMAGE_DECODE_MAX_SIDE
+        size = self.get_image_size(data) if max_side > 0 else None
+        
+        if size is not None:
+            for factor, reduced_flag in REDUCED_DECODE_FLAGS:
+                if max(size) // factor >= max_side:
+                    flag = reduced_flag
+                    break
+        
+        # opencv decodes to BGR, which is the channel order DeepFace expects for arrays
+        with get_metrics().span("decode"):
+            return cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+    
     def read_frame(self, file: UploadFile):
-        file_bytes = np.frombuffer(file.file.read(), np.uint8)
-        img = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        with get_metrics().span("upload_read"):
+            data = file.file.read()
+        img = self.decode_image(data=data)
         
         if img is None:
             return None
         
-        return img 
\ No newline at end of file
+        return img
\ No newline at end of file
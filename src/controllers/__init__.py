@@ -1,3 +1,4 @@
 from .ClientController import ClientController
 from .ImageController import ImageController
-from .EmbeddingController import EmbeddingController
\ No newline at end of file
+from .EmbeddingController import EmbeddingController
+from .EnrollmentController import EnrollmentController
\ No newline at end of file
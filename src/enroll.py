@@ -0,0 +1,56 @@
+from helpers.config import get_settings
+from motor.motor_asyncio import AsyncIOMotorClient
+from stores.vectordb.VectorDBFactory import VectorDBFactory
+from stores.deeplearning.InferenceExecutorFactory import InferenceExecutorFactory
+from controllers import EnrollmentController
+from models import ClientDataModel, EnrollmentJobDataModel
+import argparse
+import asyncio
+
+
+async def enroll(source_path: str, job_id: str = None, force: bool = False):
+    settings = get_settings()
+    
+    mongo_client = AsyncIOMotorClient(settings.MONGO_DB_URL)
+    mongo_db = mongo_client.get_database(settings.MONGO_DB_DATABASE)
+    
+    vector_db_client = VectorDBFactory(config=settings).intialize_provider(provider_name=settings.VECTORDB_PROVIDER)
+    vector_db_client.connect()
+    
+    inference_executor = InferenceExecutorFactory(config=settings).intialize_executor(executor_type=settings.INFERENCE_EXECUTOR_TYPE)
+    inference_executor.start()
+    if not inference_executor.warm_up():
+        print("Loading the embedding model failed")
+        inference_executor.shutdown()
+        vector_db_client.disconnect()
+        return
+    
+    try:
+        enrollment_controller = EnrollmentController(vector_db_client=vector_db_client,
+                                                     embedding_client=inference_executor,
+                                                     client_data_model=await ClientDataModel.initialize_client_model(db_client=mongo_db),
+                                                     job_data_model=await EnrollmentJobDataModel.initialize_enrollment_job_model(db_client=mongo_db),
+                                                     embedding_concurrency=inference_executor.workers)
+        
+        job, result_message = await enrollment_controller.create_or_resume_job(source_path=source_path, job_id=job_id, force=force)
+        print(result_message)
+        if job is None:
+            return
+        
+        print(f"Job ID: {job.job_id}")
+        job = await enrollment_controller.run_job(job.job_id)
+        print(f"{job.status}: {job.enrolled} enrolled, {job.failed} failed")
+    finally:
+        inference_executor.shutdown()
+        vector_db_client.disconnect()
+        mongo_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk enroll clients from a directory or a zip archive of images")
+    parser.add_argument("source_path", nargs="?", help="directory or zip archive with <client_id>.<ext> or <client_id>/<image> entries")
+    parser.add_argument("--job-id", help="resume an interrupted enrollment job")
+    parser.add_argument("--force", action="store_true", help="resume a job still marked running, after its process died")
+    args = parser.parse_args()
+    
+    asyncio.run(enroll(source_path=args.source_path, job_id=args.job_id, force=args.force))
@@ -1,14 +1,22 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from functools import lru_cache
 
 class Settings(BaseSettings):
     APP_NAME: str
     APP_VERSION: str
+    LOG_LEVEL: str = "INFO"
+    METRICS_ENABLED: bool = True
     
     IMAGE_ALLOWED_EXTENSIONS: list
     IMAGE_CHUNK_SIZE: int
+    IMAGE_DECODE_MAX_SIDE: int = 1280
+    PENDING_FRAME_CACHE_SIZE: int = 64
+    PENDING_FRAME_TTL_SECONDS: float = 120.0
     
     MONGO_DB_URL: str
     MONGO_DB_DATABASE: str
+    CLIENT_CACHE_SIZE: int = 1024
+    CLIENT_CACHE_TTL_SECONDS: float = 300.0
     
     EMBEDDING_MODEL_PROVIDER: str
     EMBEDDING_MODEL_NAME: str
@@ -16,17 +24,100 @@ class Settings(BaseSettings):
     DETECTION_BACKEND: str
     DEEPFACE_HOME: str
     
+    INFERENCE_EXECUTOR_TYPE: str = "thread"
+    INFERENCE_WORKERS: int = 0
+    INFERENCE_MAX_QUEUE_SIZE: int = 16
+    INFERENCE_TIMEOUT: float = 30.0
+    MODEL_WARMUP_RUNS: int = 2
+    
+    MODEL_SERVER_SOCKET_PATH: str = "/tmp/facial-auth-model.sock"
+    MODEL_SERVER_EXECUTOR_TYPE: str = "thread"
+    MODEL_SERVER_CONNECT_TIMEOUT: float = 120.0
+    
+    ONNX_DETECTOR_MODEL_PATH: str = ""
+    ONNX_EMBEDDING_MODEL_PATH: str = ""
+    ONNX_INTRA_OP_THREADS: int = 0
+    ONNX_INTER_OP_THREADS: int = 0
+    ONNX_QUANTIZE_INT8: bool = False
+    ONNX_DETECTOR_SCORE_THRESHOLD: float = 0.7
+    ONNX_EMBEDDING_COLOR_ORDER: str = "BGR"
+    
+    FACE_GATE_MIN_CONFIDENCE: float = 0.0
+    FACE_GATE_MIN_SIZE: int = 0
+    
+    PIPELINE_DECODE_WORKERS: int = 1
+    PIPELINE_DETECT_WORKERS: int = 2
+    PIPELINE_GATE_WORKERS: int = 1
+    PIPELINE_ALIGN_WORKERS: int = 1
+    PIPELINE_EMBED_WORKERS: int = 1
+    PIPELINE_EMBED_BATCH_SIZE: int = 8
+    PIPELINE_QUEUE_SIZE: int = 16
+    
+    EMBEDDING_BATCH_MAX_SIZE: int = 1
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 10.0
+    
+    EMBEDDING_CACHE_SIZE: int = 0
+    EMBEDDING_CACHE_TTL_SECONDS: float = 10.0
+    EMBEDDING_CACHE_PHASH_MAX_DISTANCE: int = -1
+    
+    DECISION_CACHE_SIZE: int = 0
+    DECISION_CACHE_TTL_SECONDS: float = 3.0
+    DECISION_CACHE_MAX_DISTANCE: float = 0.05
+    
+    TRACKER_MAX_SOURCES: int = 0
+    TRACKER_IOU_THRESHOLD: float = 0.3
+    TRACKER_CONFIDENCE_DECAY: float = 0.95
+    TRACKER_MIN_CONFIDENCE: float = 0.5
+    TRACKER_REVERIFY_SECONDS: float = 2.0
+    TRACKER_MAX_MISSES: int = 5
+    
     VECTORDB_PROVIDER: str = None
     VECTORDB_PATH: str = None
     VECTORDB_DISTANCE_METHOD: str = None
     QDRANT_URL:str = None
+    QDRANT_ASYNC: bool = False
+    QDRANT_PREFER_GRPC: bool = False
+    QDRANT_GRPC_PORT: int = 6334
+    QDRANT_POOL_SIZE: int = 0
+    QDRANT_COLLECTION_PROFILE: str = "default"
+    QDRANT_HNSW_M: int = 0
+    QDRANT_HNSW_EF_CONSTRUCT: int = 0
+    QDRANT_HNSW_EF: int = 0
+    QDRANT_QUANTIZATION: str = "none"
+    QDRANT_QUANTIZATION_RESCORE: bool = True
+    QDRANT_QUANTIZATION_OVERSAMPLING: float = 1.0
+    QDRANT_ON_DISK_VECTORS: bool = False
+    QDRANT_ON_DISK_PAYLOAD: bool = False
     COLLECTION_NAME: str = None
+    VECTORDB_UPSERT_BATCH_SIZE: int = 64
+    VECTORDB_UPSERT_PARALLEL: int = 1
+    VECTORDB_INMEMORY_DTYPE: str = "float32"
+    VECTORDB_INMEMORY_REFRESH_SECONDS: float = 30.0
+    VECTORDB_MMAP_COMPACT_RATIO: float = 0.25
+    VECTORDB_SHARD_FAN_OUT_WORKERS: int = 4
+    VECTORDB_SHARD_REFRESH_SECONDS: float = 30.0
+    DEVICE_SITES: dict = {}
+    SEARCH_MODE: str = "centroid"
+    SEARCH_RERANK_CANDIDATES: int = 5
+    
+    ENROLLMENT_CHUNK_SIZE: int = 256
+    ENROLLMENT_EMBEDDING_BATCH_SIZE: int = 16
+    ENROLLMENT_MAX_IMAGES: int = 5
+    ENROLLMENT_IMPORT_ROOT: str = "assets/imports"
+    ENROLLMENT_QUEUE_FULL_RETRIES: int = 8
+    ENROLLMENT_QUEUE_FULL_BACKOFF_SECONDS: float = 0.25
     
     CREDENTIALS_PATH: str = None
     DATABASE_URL: str = None
+    FIREBASE_CLIENT: str = "firebase"
+    FIREBASE_COALESCE_MS: float = 200.0
+    FIREBASE_MAX_RETRIES: int = 3
+    FIREBASE_RETRY_BASE_SECONDS: float = 0.5
     
     class Config:
         env_file = ".env"
         
+# .env is parsed once per process, every caller shares the same Settings object
+@lru_cache
 def get_settings():
     return Settings()    
\ No newline at end of file
@@ -0,0 +1,88 @@
+from helpers.timing import StageTimer
+from helpers.config import get_settings
+from contextlib import nullcontext
+from functools import lru_cache
+import threading
+
+
+class Metrics:
+    """Process wide latency histograms and counters, rendered in the Prometheus text format.
+
+    A span costs two perf_counter calls and one locked dict update, so the
+    hot path instrumentation stays on in production. Components that already
+    keep their own StageTimer or counters are read at scrape time instead.
+    """
+
+    def __init__(self, namespace: str = "facial_auth", enabled: bool = True):
+        self.namespace = namespace
+        self.enabled = enabled
+        # histogram name -> (label name, timer keyed by the label value)
+        self.histograms = {"stage": ("stage", StageTimer()), "request": ("route", StageTimer())}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage: str):
+        return self.histograms["stage"][1].time(stage) if self.enabled else nullcontext()
+
+    def observe(self, histogram: str, key: str, seconds: float):
+        if self.enabled:
+            self.histograms[histogram][1].record(key, seconds)
+
+    def increment(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def render(self, timers: dict = None, counters: dict = None, gauges: dict = None):
+        """Text exposition of everything recorded here plus what the caller collected from components.
+
+        timers map a histogram name to (label name, StageTimer), counters and
+        gauges map a metric name to a value or to a list of (labels, value).
+        """
+        lines = []
+        for name, (label, timer) in dict(self.histograms, **(timers or {})).items():
+            self._render_histogram(lines, name, label, timer)
+
+        with self._lock:
+            recorded = dict(self.counters)
+        grouped = {}
+        for (name, labels), value in recorded.items():
+            grouped.setdefault(name, []).append((dict(labels), value))
+        for name, samples in sorted(grouped.items()):
+            self._render_samples(lines, f"{name}_total", "counter", samples)
+
+        for kind, metrics in [("counter", counters or {}), ("gauge", gauges or {})]:
+            for name, value in metrics.items():
+                suffix = "_total" if kind == "counter" else ""
+                samples = value if isinstance(value, list) else [({}, value)]
+                self._render_samples(lines, f"{name}{suffix}", kind, samples)
+
+        return "\n".join(lines) + "\n"
+
+    def _render_histogram(self, lines: list, name: str, label: str, timer: StageTimer):
+        exported = timer.export()
+        if not exported:
+            return
+        metric = f"{self.namespace}_{name}_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for key, stats in sorted(exported.items()):
+            for bound, count in stats["histogram_ms"].items():
+                le = bound if bound == "+Inf" else repr(int(bound) / 1000)
+                lines.append(f'{metric}_bucket{{{label}="{key}",le="{le}"}} {count}')
+            lines.append(f'{metric}_sum{{{label}="{key}"}} {stats["sum"]:.6f}')
+            lines.append(f'{metric}_count{{{label}="{key}"}} {stats["count"]}')
+
+    def _render_samples(self, lines: list, name: str, kind: str, samples: list):
+        metric = f"{self.namespace}_{name}"
+        lines.append(f"# TYPE {metric} {kind}")
+        for labels, value in samples:
+            rendered = ",".join(f'{label}="{label_value}"' for label, label_value in labels.items())
+            lines.append(f"{metric}{{{rendered}}} {value}" if rendered else f"{metric} {value}")
+
+
+# one registry per process, like the settings
+@lru_cache
+def get_metrics():
+    return Metrics(enabled=get_settings().METRICS_ENABLED)
@@ -0,0 +1,89 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    # upper bounds of the latency histogram buckets, in milliseconds
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            stats = self._stages.setdefault(stage, {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0,
+                                                    "buckets": [0] * len(self.BUCKETS_MS)})
+            stats["count"] += 1
+            milliseconds = seconds * 1000
+            for index, bound in enumerate(self.BUCKETS_MS):
+                if milliseconds <= bound:
+                    stats["buckets"][index] += 1
+                    break
+            stats["total"] += seconds
+            stats["last"] = seconds
+            if seconds > stats["max"]:
+                stats["max"] = seconds
+
+    @contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                stage: {
+                    "count": stats["count"],
+                    "avg_ms": round(stats["total"] / stats["count"] * 1000, 3),
+                    "max_ms": round(stats["max"] * 1000, 3),
+                    "last_ms": round(stats["last"] * 1000, 3),
+                    "histogram_ms": self._cumulative(stats),
+                }
+                for stage, stats in self._stages.items()
+            }
+
+    def export(self):
+        # raw totals in seconds for the Prometheus exposition, snapshot() rounds for people
+        with self._lock:
+            return {
+                stage: {"count": stats["count"], "sum": stats["total"], "histogram_ms": self._cumulative(stats)}
+                for stage, stats in self._stages.items()
+            }
+
+    def _cumulative(self, stats: dict):
+        # prometheus style: every bucket counts all samples at or below its bound
+        histogram, running = {}, 0
+        for bound, count in zip(self.BUCKETS_MS, stats["buckets"]):
+            running += count
+            histogram[str(bound)] = running
+        histogram["+Inf"] = stats["count"]
+        return histogram
+
+
+class PhaseTimer:
+    """Wall time of one-off phases such as startup, in the order they ran."""
+
+    def __init__(self):
+        self._phases = {}
+
+    def record(self, phase: str, seconds: float):
+        self._phases[phase] = seconds
+
+    @contextmanager
+    def time(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start)
+
+    def snapshot(self):
+        return {
+            "phases_ms": {phase: round(seconds * 1000, 3) for phase, seconds in self._phases.items()},
+            "total_ms": round(sum(self._phases.values()) * 1000, 3),
+        }
@@ -1,47 +1,175 @@
-from fastapi import FastAPI
+import time
+# heavy libraries are only imported when a provider needs them, this measures everything else
+_imports_started_at = time.perf_counter()
+from fastapi import FastAPI, Request
 from routes import base, user, authenticate
 from contextlib import asynccontextmanager
 from helpers.config import get_settings
 from motor.motor_asyncio import AsyncIOMotorClient
 from stores.vectordb.VectorDBFactory import VectorDBFactory
-from stores.deeplearning.ModelFactory import ModelProviderFactory
-from stores import Firebase
+from stores.vectordb.VectorDBShardManager import VectorDBShardManager
+from stores.deeplearning.InferenceExecutorFactory import InferenceExecutorFactory
+from stores.deeplearning.InferenceExecutorEnum import InferenceExecutorEnum
+from stores.deeplearning.EmbeddingBatcher import EmbeddingBatcher
+from stores.deeplearning.FaceTracker import FaceTracker
+from stores.cache.EmbeddingCache import EmbeddingCache
+from stores.cache.DecisionCache import DecisionCache
+from stores.cache.TTLCache import TTLCache
+from stores import Firebase, FakeFirebase, FirebaseWriter
+from models import ClientDataModel, EnrollmentJobDataModel
+from controllers import ImageController, EmbeddingController
+from stores.firebase.FirebaseEnums import FirebaseClientEnum
+from helpers.timing import PhaseTimer
+from helpers.metrics import get_metrics
+import logging
+import asyncio
+_imports_seconds = time.perf_counter() - _imports_started_at
+logger = logging.getLogger('uvicorn.error')
+
+
+async def warm_up_inference(app: FastAPI):
+    # blocking model loads run off the event loop, so /welcome and /ready answer meanwhile
+    with app.startup_timer.time("model_load_and_warm_up"):
+        app.ready = await asyncio.to_thread(app.inference_executor.warm_up)
+    logger.info(f"startup breakdown: {app.startup_timer.snapshot()}, worker: {app.inference_executor.startup_report}")
+
+
 async def lifespan(app: FastAPI):
     # Getting the enviroments settings
     settings = get_settings()
     
+    # module loggers propagate to the root logger, uvicorn only configures its own
+    logging.basicConfig(level=settings.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # the Qdrant REST client goes through httpx, which logs every request at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    
+    # pods report ready only once the model is loaded and warm
+    app.ready = False
+    app.startup_timer = PhaseTimer()
+    app.startup_timer.record("imports", _imports_seconds)
+    
     app.mongo_client = AsyncIOMotorClient(settings.MONGO_DB_URL)
     app.mongo_db = app.mongo_client.get_database(settings.MONGO_DB_DATABASE)
     
+    # collections and indexes are checked once here instead of on every request
+    with app.startup_timer.time("mongo"):
+        app.client_data_model = await ClientDataModel.initialize_client_model(db_client=app.mongo_db,
+                                                                              cache_size=settings.CLIENT_CACHE_SIZE,
+                                                                              cache_ttl_seconds=settings.CLIENT_CACHE_TTL_SECONDS)
+        app.enrollment_job_data_model = await EnrollmentJobDataModel.initialize_enrollment_job_model(db_client=app.mongo_db)
+    
     # Intialize vector db Factroy
     vector_db_factory =  VectorDBFactory(config=settings)
     
-    # Intialize face model factory
-    model_factory = ModelProviderFactory(config=settings)
-    model_provider_client = model_factory.intialize_provider(settings.EMBEDDING_MODEL_PROVIDER)
-    _ = model_provider_client.set_embedding_model(model_name = settings.EMBEDDING_MODEL_NAME,
-                                                              detector_backend = settings.DETECTION_BACKEND)
+    # Intialize the inference workers: thread or process pools with one model each, or the staged pipeline
+    app.inference_executor = InferenceExecutorFactory(config=settings).intialize_executor(executor_type=settings.INFERENCE_EXECUTOR_TYPE)
+    with app.startup_timer.time("inference_workers"):
+        app.inference_executor.start()
+    app.embedding_client = app.inference_executor
+    
+    # Gather concurrent frames into micro batches in front of the workers,
+    # with a model server the batching happens there, across all API workers
+    app.embedding_batcher = None
+    if settings.EMBEDDING_BATCH_MAX_SIZE > 1 and settings.INFERENCE_EXECUTOR_TYPE != InferenceExecutorEnum.REMOTE.value:
+        app.embedding_batcher = EmbeddingBatcher(embedding_client=app.inference_executor,
+                                                 max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+                                                 max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+                                                 max_pending=app.inference_executor.max_pending * settings.EMBEDDING_BATCH_MAX_SIZE)
+        app.embedding_batcher.start()
+        app.embedding_client = app.embedding_batcher
+    
+    # Repeated camera frames are answered from the cache without touching the model
+    app.embedding_cache = None
+    if settings.EMBEDDING_CACHE_SIZE > 0:
+        app.embedding_cache = EmbeddingCache(embedding_client=app.embedding_client,
+                                             max_size=settings.EMBEDDING_CACHE_SIZE,
+                                             ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+                                             phash_max_distance=settings.EMBEDDING_CACHE_PHASH_MAX_DISTANCE)
+    
+    # Recent authentication decisions per camera, cleared whenever the gallery changes
+    app.decision_cache = None
+    if settings.DECISION_CACHE_SIZE > 0:
+        app.decision_cache = DecisionCache(max_sources=settings.DECISION_CACHE_SIZE,
+                                           ttl_seconds=settings.DECISION_CACHE_TTL_SECONDS,
+                                           max_distance=settings.DECISION_CACHE_MAX_DISTANCE)
+    
+    # Faces followed across stream frames are only re-embedded when their identity needs checking
+    app.face_tracker = None
+    if settings.TRACKER_MAX_SOURCES > 0:
+        app.face_tracker = FaceTracker(max_sources=settings.TRACKER_MAX_SOURCES,
+                                       iou_threshold=settings.TRACKER_IOU_THRESHOLD,
+                                       confidence_decay=settings.TRACKER_CONFIDENCE_DECAY,
+                                       min_confidence=settings.TRACKER_MIN_CONFIDENCE,
+                                       reverify_seconds=settings.TRACKER_REVERIFY_SECONDS,
+                                       max_misses=settings.TRACKER_MAX_MISSES)
     
     # Retrieve vector db client
     app.vector_db_client = vector_db_factory.intialize_provider(provider_name=settings.VECTORDB_PROVIDER)
     
-    # Retrieve face model client
-    app.face_model_client =  model_provider_client
-    
     
     # connect to vector db client 
-    app.vector_db_client.connect()
+    with app.startup_timer.time("vector_db"):
+        app.vector_db_client.connect()
+    
+    # controllers hold no per request state, so one instance serves every request
+    app.image_controller = ImageController()
+    app.pending_frames = TTLCache(max_size=settings.PENDING_FRAME_CACHE_SIZE,
+                                  ttl_seconds=settings.PENDING_FRAME_TTL_SECONDS)
+    # every site gets its own collection, searches at a door scan that site's gallery and the all-sites base one
+    app.vector_db_shards = VectorDBShardManager(vector_db_client=app.vector_db_client,
+                                                base_collection_name=settings.COLLECTION_NAME,
+                                                embedding_size=settings.EMBEDDING_MODEL_SIZE,
+                                                fan_out_workers=settings.VECTORDB_SHARD_FAN_OUT_WORKERS,
+                                                refresh_seconds=settings.VECTORDB_SHARD_REFRESH_SECONDS)
+    app.embedding_controller = EmbeddingController(vector_db_client=app.vector_db_client,
+                                                   embedding_client=app.embedding_client,
+                                                   inference_client=app.inference_executor,
+                                                   shard_manager=app.vector_db_shards,
+                                                   embedding_cache=app.embedding_cache)
     
     #connect to firebase 
-    app.firebase_client = Firebase(config= settings)
-    app.firebase_client.connect()
+    if settings.FIREBASE_CLIENT == FirebaseClientEnum.FAKE.value:
+        app.firebase_client = FakeFirebase(config= settings)
+    else:
+        app.firebase_client = Firebase(config= settings)
+    with app.startup_timer.time("firebase"):
+        app.firebase_client.connect()
+    
+    # status updates are written in the background, off the request path
+    app.firebase_writer = FirebaseWriter(firebase_client= app.firebase_client,
+                                         coalesce_ms= settings.FIREBASE_COALESCE_MS,
+                                         max_retries= settings.FIREBASE_MAX_RETRIES,
+                                         retry_base_seconds= settings.FIREBASE_RETRY_BASE_SECONDS)
+    app.firebase_writer.start()
+    
+    # the model loads and warms up in the background, /api/v1/ready answers 503 until it is done
+    app.warm_up_task = asyncio.create_task(warm_up_inference(app))
     
     yield
+    app.warm_up_task.cancel()
     # disconnect all connections
-    app.vector_db_client.disconnect()
+    await app.firebase_writer.stop()
+    await app.vector_db_client.disconnect_async()
     app.mongo_client.close()
+    if app.embedding_batcher is not None:
+        await app.embedding_batcher.stop()
+    app.inference_executor.shutdown()
 
 app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    # the whole request, multipart parsing included, labelled by the route template to keep label counts bounded
+    started_at = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    route_path = route.path if route is not None else "unmatched"
+    metrics = get_metrics()
+    metrics.observe("request", route_path, time.perf_counter() - started_at)
+    metrics.increment("requests", route=route_path, status=response.status_code)
+    return response
+
 app.include_router(base.base_router)
 app.include_router(user.client_router)
 app.include_router(authenticate.authenticate_router)
@@ -0,0 +1,32 @@
+from helpers.config import get_settings
+from stores.deeplearning.ModelServer import ModelServer
+import logging
+import asyncio
+import signal
+
+
+async def serve():
+    settings = get_settings()
+    logging.basicConfig(level=settings.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    
+    model_server = ModelServer(config=settings)
+    if not await model_server.start():
+        print("Loading the embedding model failed")
+        await model_server.stop()
+        return
+    
+    print(f"Model server listening on {settings.MODEL_SERVER_SOCKET_PATH}")
+    serving = asyncio.create_task(model_server.serve_forever())
+    # container stops send SIGTERM, shut down the same way as on ctrl-c
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, serving.cancel)
+    try:
+        await serving
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await model_server.stop()
+
+
+if __name__ == "__main__":
+    # run once per host, then start the API with INFERENCE_EXECUTOR_TYPE=remote and any number of workers
+    asyncio.run(serve())
@@ -2,14 +2,20 @@ from .db_schemes.client import Client
 from .BaseDataModel import BaseDataModel
 from .enums.ClientEnum import ClientEnum
 from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
+from stores.cache.TTLCache import TTLCache
+from helpers.metrics import get_metrics
 class ClientDataModel(BaseDataModel):
-    def __init__(self, db_client):
+    def __init__(self, db_client, cache_size: int = 0, cache_ttl_seconds: float = None):
         super().__init__(db_client)
         self.collection = db_client[ClientEnum.COLLECTION_CLIENT_NAME.value]
+        self.client_cache = TTLCache(max_size=cache_size, ttl_seconds=cache_ttl_seconds) if cache_size > 0 else None
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     @classmethod
-    async def initialize_client_model(cls, db_client: object):
-        instance = cls(db_client)
+    async def initialize_client_model(cls, db_client: object, cache_size: int = 0, cache_ttl_seconds: float = None):
+        instance = cls(db_client, cache_size=cache_size, cache_ttl_seconds=cache_ttl_seconds)
         await instance.init_collection_with_index()
         return instance
         
@@ -26,16 +32,57 @@ class ClientDataModel(BaseDataModel):
                 )
                 
     async def create_client(self, client: Client):
-        result = await self.collection.insert_one(client.model_dump(by_alias=True, exclude_unset=False))
+        with get_metrics().span("mongo_write"):
+            result = await self.collection.insert_one(client.model_dump(by_alias=True, exclude_unset=False))
         client.id = result.inserted_id
+        self.invalidate_client(client_id=client.client_id)
         return client
     
+    async def create_clients(self, clients: list):
+        if not clients:
+            return 0
+        
+        for client in clients:
+            self.invalidate_client(client_id=client.client_id)
+        
+        try:
+            result = await self.collection.insert_many([client.model_dump(by_alias=True, exclude_unset=False) for client in clients],
+                                                       ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            # clients that already exist (e.g. a resumed bulk enrollment) are skipped, the rest are inserted
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+            return e.details["nInserted"]
+    
     async def get_client_by_client_id(self, client_id: str):
-        record = await self.collection.find_one({
-            "client_id": client_id,
-        })
+        if self.client_cache is not None:
+            client = self.client_cache.get(client_id)
+            if client is not None:
+                self.cache_hits += 1
+                return client.model_copy()
+            self.cache_misses += 1
+        
+        with get_metrics().span("mongo_read"):
+            record = await self.collection.find_one({
+                "client_id": client_id,
+            })
         if not record or record is None:
             return None
         
-        return Client(**record)
+        client = Client(**record)
+        if self.client_cache is not None:
+            self.client_cache.set(client_id, client.model_copy())
+        return client
+    
+    async def delete_client(self, client_id: str):
+        result = await self.collection.delete_one({
+            "client_id": client_id,
+        })
+        self.invalidate_client(client_id=client_id)
+        return result.deleted_count
+    
+    def invalidate_client(self, client_id: str):
+        if self.client_cache is not None:
+            self.client_cache.pop(client_id)
          
\ No newline at end of file
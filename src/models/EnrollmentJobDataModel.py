@@ -0,0 +1,55 @@
+from .db_schemes.enrollment_job import EnrollmentJob
+from .BaseDataModel import BaseDataModel
+from .enums.EnrollmentJobEnum import EnrollmentJobEnum, EnrollmentJobStatus
+
+class EnrollmentJobDataModel(BaseDataModel):
+    def __init__(self, db_client):
+        super().__init__(db_client)
+        self.collection = db_client[EnrollmentJobEnum.COLLECTION_ENROLLMENT_JOB_NAME.value]
+
+    @classmethod
+    async def initialize_enrollment_job_model(cls, db_client: object):
+        instance = cls(db_client)
+        await instance.init_collection_with_index()
+        return instance
+        
+    async def init_collection_with_index(self):
+        all_collections = await self.db_client.list_collection_names()
+        if EnrollmentJobEnum.COLLECTION_ENROLLMENT_JOB_NAME.value not in all_collections:
+            self.collection = self.db_client[EnrollmentJobEnum.COLLECTION_ENROLLMENT_JOB_NAME.value]
+            indexes = EnrollmentJob.get_indexes()
+            for index in indexes:
+                await self.collection.create_index(
+                    index["key"],
+                    name = index["name"],
+                    unique = index["unique"]
+                )
+                
+    async def create_job(self, job: EnrollmentJob):
+        result = await self.collection.insert_one(job.model_dump(by_alias=True, exclude_unset=False))
+        job.id = result.inserted_id
+        return job
+    
+    async def get_job_by_job_id(self, job_id: str):
+        record = await self.collection.find_one({
+            "job_id": job_id,
+        })
+        if not record or record is None:
+            return None
+        
+        return EnrollmentJob(**record)
+    
+    async def update_job(self, job_id: str, fields: dict, failed_client_ids: list = None):
+        update = {"$set": fields}
+        if failed_client_ids:
+            update["$push"] = {"failed_client_ids": {"$each": failed_client_ids}}
+            
+        await self.collection.update_one({"job_id": job_id}, update)
+    
+    async def claim_job(self, job_id: str, force: bool = False):
+        # atomic, of two concurrent resumes only one sees the job as not running
+        # force takes over a job left running by a process that died
+        excluded = [EnrollmentJobStatus.COMPLETED.value] + ([] if force else [EnrollmentJobStatus.RUNNING.value])
+        result = await self.collection.update_one({"job_id": job_id, "status": {"$nin": excluded}},
+                                                  {"$set": {"status": EnrollmentJobStatus.RUNNING.value}})
+        return result.matched_count == 1
@@ -1 +1,2 @@
-from .ClientDataModel import ClientDataModel
\ No newline at end of file
+from .ClientDataModel import ClientDataModel
+from .EnrollmentJobDataModel import EnrollmentJobDataModel
\ No newline at end of file
@@ -1,2 +1,3 @@
 from .RetrievedVectorDBData import RetrievedVectorDBdata
 from .client import Client
+from .enrollment_job import EnrollmentJob
@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from bson.objectid import ObjectId
+
+class EnrollmentJob(BaseModel):
+    id: Optional[ObjectId] = Field(default_factory=ObjectId, alias="_id")
+    job_id: str =  Field(..., min_length=1)
+    source_path: str =  Field(..., min_length=1)
+    status: str =  Field(..., min_length=1)
+    total: int = 0
+    enrolled: int = 0
+    failed: int = 0
+    last_client_id: Optional[str] = None
+    failed_client_ids: list = Field(default_factory=list)
+    
+    class Config:
+        arbitrary_types_allowed = True
+        
+    @classmethod
+    def get_indexes(cls):
+        return [{
+            "key" : [("job_id", 1)],
+            "name": "job_id_index_1",
+            "unique": True
+        }]
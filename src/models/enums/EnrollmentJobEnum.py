@@ -0,0 +1,10 @@
+from enum import Enum
+
+class EnrollmentJobEnum(Enum):
+   COLLECTION_ENROLLMENT_JOB_NAME = "EnrollmentJob"
+   
+class EnrollmentJobStatus(Enum):
+   PENDING = "pending"
+   RUNNING = "running"
+   COMPLETED = "completed"
+   FAILED = "failed"
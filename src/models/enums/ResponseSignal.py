@@ -9,11 +9,22 @@ class ResponseSignal(Enum):
     IMAGE_PROCESSING_SUCCEED = "Image processing succeed"
     CLIENT_ADD_FAIL = "Client addtion fail"
     CLIENT_ADD_SUCCESS = "Client added successfully"
+    CLIENT_ENROLL_SUCCESS = "Client enrolled and searchable"
     LOADING_EMBEDDING_MODEL_FAIL = "Loading embedding model fail cheack model name"
     LOADING_EMBEDDING_MODEL_SUCCEED = "Loading embedding model succeed"
     NO_CLIENT_WITH_SUCH_ID = "No client with such id"
     IMAGE_EMBEDDING_FAIL = "Image Embedding Fail"
     IMAGE_ADDED_TO_VECTOR_DB_SUCCESS = "Client Image added to vector db"
     CAMERA_FRAME_READ_FAIL = "Camera Frame reading fail"
+    NO_FACE_DETECTED = "No face detected in frame"
     CLEINT_AUTHENTICATION_SUCCEED = "Client is authenticated"
-    CLEINT_AUTHENTICATION_FAIL = "Client is Unkonwn"
\ No newline at end of file
+    CLEINT_AUTHENTICATION_FAIL = "Client is Unkonwn"
+    INFERENCE_QUEUE_FULL = "Inference workers are busy, try again later"
+    INFERENCE_TIMEOUT = "Inference took too long"
+    ENROLLMENT_SOURCE_NOT_FOUND = "Enrollment source path not found"
+    ENROLLMENT_JOB_NOT_FOUND = "No enrollment job with such id"
+    ENROLLMENT_JOB_STARTED = "Enrollment job started"
+    ENROLLMENT_JOB_RESUMED = "Enrollment job resumed"
+    ENROLLMENT_JOB_RUNNING = "Enrollment job is already running"
+    ENROLLMENT_SOURCE_NOT_ALLOWED = "Enrollment source must be under the import root"
+    INVALID_SITE_ID = "Site ids may only contain letters, digits and dashes"
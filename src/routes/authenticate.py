@@ -1,7 +1,8 @@
 from fastapi import FastAPI , APIRouter, Depends
 import os
 from helpers.config import get_settings, Settings
-from fastapi import FastAPI , APIRouter, Depends, UploadFile, status, Request, File
+from helpers.metrics import get_metrics
+from fastapi import FastAPI , APIRouter, Depends, UploadFile, status, Request, File, Form, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
 from controllers import ImageController, EmbeddingController
 import aiofiles
@@ -9,6 +10,8 @@ import logging
 from models.enums.ResponseSignal import ResponseSignal
 from models import ClientDataModel
 from models.db_schemes import Client
+from stores.deeplearning.InferenceExecutor import InferenceQueueFullError
+import asyncio
 logger = logging.getLogger('uvicorn.error')
 
 authenticate_router =  APIRouter(
@@ -18,10 +21,19 @@ authenticate_router =  APIRouter(
 
 
 @authenticate_router.post("/authenticate")
-async def authenticate_client(request: Request, image1: UploadFile =  File(...)):
-    image_controller = ImageController()
+async def authenticate_client(request: Request, image1: UploadFile =  File(...), device_id: str = Form(None),
+                              site_id: str = Form(None)):
+    image_controller = request.app.image_controller
     
-    numpy_image = image_controller.read_frame(file=image1)
+    site_id = resolve_site_id(device_id=device_id, site_id=site_id)
+    if site_id is not None and not request.app.vector_db_shards.is_valid_site_id(site_id):
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
+                            content={"response signal" : ResponseSignal.INVALID_SITE_ID.value})
+    
+    # the upload is read without blocking and decoded off the event loop, like the stream and enroll paths
+    with get_metrics().span("upload_read"):
+        image_bytes = await image1.read()
+    numpy_image = await asyncio.to_thread(image_controller.decode_image, image_bytes)
     
     if numpy_image is None:
         logger.error("reading camera frame failed")
@@ -29,43 +41,165 @@ async def authenticate_client(request: Request, image1: UploadFile =  File(...))
                             content={"response signal" : ResponseSignal.CAMERA_FRAME_READ_FAIL.value})
     
     #now we have image
-    face_model_client = request.app.face_model_client
-    vector_db_client = request.app.vector_db_client
-    
-    #loading firebase client
-    firebase_client = request.app.firebase_client
-    
-    embedding_controller = EmbeddingController(vector_db_client=vector_db_client,
-                                               embedding_client=face_model_client)
+    embedding_controller = request.app.embedding_controller
     
-    vector = embedding_controller.get_frame_query_embeddeing(image=numpy_image)
+    source_id = device_id or request.client.host
+    try:
+        vector = await embedding_controller.get_frame_query_embeddeing(image=numpy_image, source_id=source_id)
+    except InferenceQueueFullError:
+        logger.warning("inference workers are saturated, rejecting camera frame")
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            content={"response signal" : ResponseSignal.INFERENCE_QUEUE_FULL.value})
+    except (ConnectionError, RuntimeError) as e:
+        # the remote model server is down or failed the request, the caller can retry like on a full queue
+        logger.error(f"inference backend unavailable, rejecting camera frame: {e}")
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            content={"response signal" : ResponseSignal.INFERENCE_QUEUE_FULL.value})
+    except asyncio.TimeoutError:
+        logger.error("embedding camera frame timed out")
+        return JSONResponse(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                            content={"response signal" : ResponseSignal.INFERENCE_TIMEOUT.value})
     
     if vector == None:
         logger.error("error in embedding camera frame")
         return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
                             content={"response signal" : ResponseSignal.IMAGE_EMBEDDING_FAIL.value})
+    
+    decision = await make_decision(app=request.app, vector=vector, source_id=source_id, site_id=site_id)
+    return JSONResponse(content=decision)
+
+
+def resolve_site_id(device_id: str = None, site_id: str = None):
+    # doors that do not send their site are looked up in DEVICE_SITES
+    if site_id:
+        return site_id
+    return get_settings().DEVICE_SITES.get(device_id)
+
+
+async def make_decision(app, vector, source_id: str, site_id: str = None):
+    # the same face at the same door a moment ago was already authenticated
+    decision_cache = app.decision_cache
+    if decision_cache is not None:
+        decision = decision_cache.get(source_id=source_id, vector=vector)
+        if decision is not None:
+            get_metrics().increment("decisions", decision="cached")
+            return decision
         
     # now we have a vector---> search database
-    records = embedding_controller.search_data_base(vector=vector)
+    records = await app.embedding_controller.search_data_base(vector=vector, site_id=site_id)
     if records == None:
-        return JSONResponse(content={"repsonse signal" : ResponseSignal.CLEINT_AUTHENTICATION_FAIL.value})
+        get_metrics().increment("decisions", decision="unknown")
+        return {"repsonse signal" : ResponseSignal.CLEINT_AUTHENTICATION_FAIL.value}
         
     record = records[0]
     score = record.score
     meta_data =  record.meta_data
     
     if score >= 0.40:
-        firebase_client.update_value(value = 1)
-        return JSONResponse(content={"repsonse signal" : ResponseSignal.CLEINT_AUTHENTICATION_SUCCEED.value,
-                                 "Client ID": meta_data['client_id'],
-                                 "Client_name": meta_data["client_name"]})
-    firebase_client.update_value(value = 0)
-    return JSONResponse(content={"repsonse signal" : ResponseSignal.CLEINT_AUTHENTICATION_FAIL.value})
+        get_metrics().increment("decisions", decision="authenticated")
+        app.firebase_writer.submit(value = 1)
+        decision = {"repsonse signal" : ResponseSignal.CLEINT_AUTHENTICATION_SUCCEED.value,
+                    "Client ID": meta_data['client_id'],
+                    "Client_name": meta_data["client_name"]}
+        if decision_cache is not None:
+            decision_cache.set(source_id=source_id, vector=vector, decision=decision)
+        return decision
+    get_metrics().increment("decisions", decision="unknown")
+    app.firebase_writer.submit(value = 0)
+    return {"repsonse signal" : ResponseSignal.CLEINT_AUTHENTICATION_FAIL.value}
+
+
+async def decide_stream_frame(app, image, source_id: str, site_id: str = None):
+    face_tracker = app.face_tracker
+    if face_tracker is None:
+        vector = await app.embedding_controller.get_frame_query_embeddeing(image=image, source_id=source_id)
+        if vector == None:
+            return {"response signal" : ResponseSignal.IMAGE_EMBEDDING_FAIL.value}
+        return await make_decision(app=app, vector=vector, source_id=source_id, site_id=site_id)
+    
+    # detection runs on every frame, the embedding model only when the track needs verifying
+    boxes = await app.embedding_controller.detect_frame_faces(image=image)
+    tracks = face_tracker.update(source_id=source_id, boxes=boxes)
+    if not tracks:
+        return {"response signal" : ResponseSignal.NO_FACE_DETECTED.value}
     
+    # the largest face is the one standing at the camera
+    track = max(tracks, key=lambda track: track.area)
+    if face_tracker.needs_embedding(track):
+        vectors = await app.embedding_controller.get_face_embeddings(image=image, boxes=[track.box])
+        if vectors[0] == None:
+            return {"response signal" : ResponseSignal.IMAGE_EMBEDDING_FAIL.value}
+        decision = await make_decision(app=app, vector=vectors[0], source_id=source_id, site_id=site_id)
+        face_tracker.set_decision(track=track, decision=decision)
     
+    return dict(track.decision, track=track.track_id)
+
+
+@authenticate_router.websocket("/stream")
+async def authenticate_stream(websocket: WebSocket, device_id: str = None, site_id: str = None):
+    """Authenticate a continuous stream of JPEG frames sent as binary messages.
     
+    Frames that arrive while the previous one is still being processed replace
+    each other, so only the newest frame is ever embedded. Every decision is
+    pushed back as a JSON message tagged with the sequence number of its frame.
+    """
+    app = websocket.app
+    site_id = resolve_site_id(device_id=device_id, site_id=site_id)
+    if site_id is not None and not app.vector_db_shards.is_valid_site_id(site_id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=ResponseSignal.INVALID_SITE_ID.value)
+        return
     
-        
+    await websocket.accept()
+    source_id = device_id or websocket.client.host
+    
+    latest = {"frame": None, "seq": 0, "dropped": 0}
+    frame_ready = asyncio.Event()
     
+    async def receive_frames():
+        while True:
+            data = await websocket.receive_bytes()
+            if latest["frame"] is not None:
+                latest["dropped"] += 1
+            latest["seq"] += 1
+            latest["frame"] = data
+            frame_ready.set()
     
-    
\ No newline at end of file
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            waiter = asyncio.create_task(frame_ready.wait())
+            await asyncio.wait({waiter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver.done():
+                waiter.cancel()
+                # surface anything other than the client going away
+                error = receiver.exception()
+                if not isinstance(error, WebSocketDisconnect):
+                    logger.error(f"camera stream error: {error}")
+                break
+            
+            frame_ready.clear()
+            data, seq = latest["frame"], latest["seq"]
+            latest["frame"] = None
+            
+            message = {"frame": seq, "dropped frames": latest["dropped"]}
+            numpy_image = await asyncio.to_thread(app.image_controller.decode_image, data)
+            if numpy_image is None:
+                message["response signal"] = ResponseSignal.CAMERA_FRAME_READ_FAIL.value
+                await websocket.send_json(message)
+                continue
+            
+            try:
+                message.update(await decide_stream_frame(app=app, image=numpy_image, source_id=source_id,
+                                                         site_id=site_id))
+            except InferenceQueueFullError:
+                message["response signal"] = ResponseSignal.INFERENCE_QUEUE_FULL.value
+            except (ConnectionError, RuntimeError) as e:
+                logger.error(f"inference backend unavailable, rejecting stream frame: {e}")
+                message["response signal"] = ResponseSignal.INFERENCE_QUEUE_FULL.value
+            except asyncio.TimeoutError:
+                message["response signal"] = ResponseSignal.INFERENCE_TIMEOUT.value
+            await websocket.send_json(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
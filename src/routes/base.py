@@ -1,6 +1,8 @@
-from fastapi import FastAPI , APIRouter, Depends
+from fastapi import FastAPI , APIRouter, Depends, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse
 import os
 from helpers.config import get_settings, Settings
+from helpers.metrics import get_metrics
 base_router =  APIRouter(
     prefix="/api/v1",
     tags=["api_v1"],
@@ -14,3 +16,87 @@ async def welcome(app_settings: Settings = Depends(get_settings)):
     app_version = app_settings.APP_VERSION
      
     return{"APP name" : app_name, "APP version" : app_version}
+
+
+@base_router.get("/ready")
+async def ready(request: Request):
+    content = {"ready": request.app.ready,
+               "startup": request.app.startup_timer.snapshot(),
+               "inference_worker": request.app.inference_executor.startup_report}
+    
+    # load balancers keep traffic away until the model is loaded and warm
+    if not request.app.ready:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=content)
+    
+    return content
+
+
+@base_router.get("/stats")
+async def stats(request: Request):
+    stats = {"inference": request.app.inference_executor.get_stats(),
+             "firebase": request.app.firebase_writer.get_stats()}
+    
+    if request.app.embedding_batcher is not None:
+        stats["batching"] = request.app.embedding_batcher.get_stats()
+    
+    if request.app.embedding_cache is not None:
+        stats["embedding_cache"] = request.app.embedding_cache.get_stats()
+    
+    if request.app.decision_cache is not None:
+        stats["decision_cache"] = request.app.decision_cache.get_stats()
+    
+    if request.app.face_tracker is not None:
+        stats["face_tracker"] = request.app.face_tracker.get_stats()
+    
+    stats["vector_db_shards"] = await request.app.vector_db_shards.get_stats()
+    
+    return stats
+
+
+@base_router.get("/metrics")
+async def metrics(request: Request):
+    """Prometheus scrape endpoint: request and stage spans plus the components' own counters and queues."""
+    app = request.app
+    inference_stats = app.inference_executor.get_stats()
+    firebase_stats = app.firebase_writer.get_stats()
+    
+    timers = {"inference": ("stage", app.inference_executor.timer),
+              "firebase": ("stage", app.firebase_writer.timer)}
+    
+    cache_lookups = []
+    if app.embedding_cache is not None:
+        cache_stats = app.embedding_cache.get_stats()
+        cache_lookups += [({"cache": "embedding", "result": "hit"}, cache_stats["hits"] + cache_stats["phash_hits"]),
+                          ({"cache": "embedding", "result": "miss"}, cache_stats["misses"])]
+    if app.decision_cache is not None:
+        cache_stats = app.decision_cache.get_stats()
+        cache_lookups += [({"cache": "decision", "result": "hit"}, cache_stats["hits"]),
+                          ({"cache": "decision", "result": "miss"}, cache_stats["misses"])]
+    if app.client_data_model.client_cache is not None:
+        cache_lookups += [({"cache": "client", "result": "hit"}, app.client_data_model.cache_hits),
+                          ({"cache": "client", "result": "miss"}, app.client_data_model.cache_misses)]
+    
+    counters = {"inference_rejected": inference_stats["rejected"],
+                "firebase_writes": [({"result": result}, firebase_stats[result])
+                                    for result in ("written", "skipped", "coalesced", "failed")]}
+    if cache_lookups:
+        counters["cache_lookups"] = cache_lookups
+    if app.face_tracker is not None:
+        tracker_stats = app.face_tracker.get_stats()
+        counters["tracker_frames"] = tracker_stats["frames"]
+        counters["tracker_embeds"] = tracker_stats["embeds"]
+    
+    queue_depth = [({"queue": "inference"}, inference_stats["pending"]),
+                   ({"queue": "firebase"}, firebase_stats["queue_depth"]),
+                   ({"queue": "pending_frames"}, len(app.pending_frames))]
+    if app.embedding_batcher is not None:
+        queue_depth.append(({"queue": "batcher"}, app.embedding_batcher.get_stats()["pending"]))
+    
+    shard_sizes = await app.vector_db_shards.get_cached_sizes()
+    gauges = {"ready": int(bool(app.ready)),
+              "queue_depth": queue_depth,
+              "inference_max_pending": inference_stats["max_pending"],
+              "gallery_size": [({"collection": name}, size) for name, size in shard_sizes.items()]}
+    
+    return PlainTextResponse(get_metrics().render(timers=timers, counters=counters, gauges=gauges),
+                             media_type="text/plain; version=0.0.4")
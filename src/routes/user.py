@@ -1,16 +1,29 @@
 from fastapi import FastAPI , APIRouter, Depends
 import os
 from helpers.config import get_settings, Settings
-from fastapi import FastAPI , APIRouter, Depends, UploadFile, status, Request, File, Form
+from helpers.metrics import get_metrics
+from fastapi import FastAPI , APIRouter, Depends, UploadFile, status, Request, File, Form, BackgroundTasks
 from fastapi.responses import JSONResponse
-from controllers import ClientController, ImageController, EmbeddingController
+from controllers import ClientController, ImageController, EmbeddingController, EnrollmentController
 import aiofiles
 import logging
 from models.enums.ResponseSignal import ResponseSignal
-from models import ClientDataModel
 from models.db_schemes import Client
+from stores.deeplearning.InferenceExecutor import InferenceQueueFullError
+from typing import List
+import asyncio
+import uuid
 logger = logging.getLogger('uvicorn.error')
 
+
+def invalidate_decisions(app):
+    # any gallery change can turn a cached or tracked decision wrong
+    if app.decision_cache is not None:
+        app.decision_cache.invalidate()
+    if app.face_tracker is not None:
+        app.face_tracker.invalidate()
+
+
 client_router =  APIRouter(
     prefix="/api/v1/client",
     tags=["api_v1", "client"],
@@ -21,9 +34,7 @@ client_router =  APIRouter(
 async def register_client(
     request: Request, image1: UploadFile = File(...), client_name: str = Form(...), client_id: str = Form(...), app_settings = Depends(get_settings)):
     
-    db_client = request.app.mongo_db
-    
-    image_controller = ImageController()
+    image_controller = request.app.image_controller
     
     is_valid, result_message = image_controller.validate_image(file=image1)
     if not is_valid:
@@ -34,7 +45,7 @@ async def register_client(
     image_path, unique_fileID = image_controller.generate_unique_file_path(original_file_name=image1.filename,client_id=client_id)
     
     
-    client_data_model = await ClientDataModel.initialize_client_model(db_client=db_client)
+    client_data_model = request.app.client_data_model
     
     try:
         client_record = await client_data_model.create_client(client= Client(client_name= client_name,
@@ -47,15 +58,21 @@ async def register_client(
         
     
     try:
-        async with aiofiles.open(image_path, 'wb') as f:
-            while chunk := await image1.read(app_settings.IMAGE_CHUNK_SIZE):
-                await f.write(chunk)
+        # the upload is read once: the same bytes are persisted as they are and decoded for embedding
+        with get_metrics().span("upload_read"):
+            image_bytes = await image1.read()
+        with get_metrics().span("file_write"):
+            async with aiofiles.open(image_path, 'wb') as f:
+                await f.write(image_bytes)
     except Exception as e:
         logger.error(f'Client image upload error: {e}')
         return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
                             content={"response signal" : ResponseSignal.IMAGE_READ_FAIL.value})
     
-    
+    # proccess_client_image picks the decoded frame up from memory instead of re-reading the file
+    numpy_image = await asyncio.to_thread(image_controller.decode_image, image_bytes)
+    if numpy_image is not None:
+        request.app.pending_frames.set(client_id, numpy_image)
     
     return JSONResponse(content={"repsonse signal" : ResponseSignal.CLIENT_ADD_SUCCESS.value,
                                  "Client ID": str(client_record.id)})
@@ -65,11 +82,7 @@ async def register_client(
 async def proccess_client_image(
     request: Request, client_id: str, app_settings = Depends(get_settings)):
     
-    db_client = request.app.mongo_db
-    face_model_client = request.app.face_model_client
-    vector_db_client = request.app.vector_db_client
-    
-    client_data_model = await ClientDataModel.initialize_client_model(db_client=db_client)
+    client_data_model = request.app.client_data_model
     
     client =  await client_data_model.get_client_by_client_id(client_id=client_id)
     
@@ -79,20 +92,201 @@ async def proccess_client_image(
                             content={"response signal" : ResponseSignal.NO_CLIENT_WITH_SUCH_ID.value})
     
     image_path = client.client_image_path
-    embedding_controller = EmbeddingController(vector_db_client=vector_db_client,
-                                               embedding_client=face_model_client)
+    embedding_controller = request.app.embedding_controller
+    
+    # fall back to the stored file when the frame decoded at registration is gone
+    numpy_image = request.app.pending_frames.pop(client_id)
     
     
     #meta_data = client.model_dump()
     meta_data = {"client_id" : client.client_id,
                  "client_image_path": client.client_image_path,
                  "client_name":client.client_name}
-    return_val = embedding_controller.push_image_to_vector_db(image_path=image_path,
-                                                              meta_data=meta_data)
+    try:
+        return_val = await embedding_controller.push_image_to_vector_db(image_path=image_path if numpy_image is None else numpy_image,
+                                                                        meta_data=meta_data)
+    except InferenceQueueFullError:
+        logger.warning("inference workers are saturated, rejecting client image")
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            content={"response signal" : ResponseSignal.INFERENCE_QUEUE_FULL.value})
+    except (ConnectionError, RuntimeError) as e:
+        # the remote model server is down or failed the request, the caller can retry like on a full queue
+        logger.error(f"inference backend unavailable, rejecting client image: {e}")
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            content={"response signal" : ResponseSignal.INFERENCE_QUEUE_FULL.value})
+    except asyncio.TimeoutError:
+        logger.error("embedding client image timed out")
+        return JSONResponse(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                            content={"response signal" : ResponseSignal.INFERENCE_TIMEOUT.value})
     
     if return_val == None:
         logger.error(f'Client image embedding error')
         return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
                             content={"response signal" : ResponseSignal.IMAGE_EMBEDDING_FAIL.value})
+    
+    invalidate_decisions(app=request.app)
         
-    return JSONResponse(content={"repsonse signal" : ResponseSignal.IMAGE_ADDED_TO_VECTOR_DB_SUCCESS.value})
\ No newline at end of file
+    return JSONResponse(content={"repsonse signal" : ResponseSignal.IMAGE_ADDED_TO_VECTOR_DB_SUCCESS.value})
+
+
+@client_router.post("/enroll")
+async def enroll_client(
+    request: Request, image1: UploadFile = File(...), images: List[UploadFile] = File(None),
+    client_name: str = Form(...), client_id: str = Form(...), site_ids: str = Form(None),
+    app_settings = Depends(get_settings)):
+    
+    image_controller = request.app.image_controller
+    embedding_controller = request.app.embedding_controller
+    client_data_model = request.app.client_data_model
+    
+    # comma separated sites the client may enter, without any the client goes to the shared gallery
+    site_ids = [site_id.strip() for site_id in (site_ids or "").split(",") if site_id.strip()]
+    if not all(request.app.vector_db_shards.is_valid_site_id(site_id) for site_id in site_ids):
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
+                            content={"response signal" : ResponseSignal.INVALID_SITE_ID.value})
+    
+    # image1 stays the client's reference image, any extra uploads only add to its vectors
+    uploads = ([image1] + (images or []))[:app_settings.ENROLLMENT_MAX_IMAGES]
+    for upload in uploads:
+        is_valid, result_message = image_controller.validate_image(file=upload)
+        if not is_valid:
+            return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
+                                content={"repsonse signal" : result_message})
+    
+    image_paths = [image_controller.generate_unique_file_path(original_file_name=upload.filename,client_id=client_id)[0]
+                   for upload in uploads]
+    
+    try:
+        client = Client(client_name= client_name,
+                        client_id= client_id,
+                        client_image_path= image_paths[0])
+    except ValueError as e:
+        logger.error(f'Client validation error: {e}')
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
+                            content={"response signal" : ResponseSignal.CLIENT_ADD_FAIL.value})
+    
+    with get_metrics().span("upload_read"):
+        images_bytes = await asyncio.gather(*[upload.read() for upload in uploads])
+    numpy_images = await asyncio.gather(*[asyncio.to_thread(image_controller.decode_image, image_bytes)
+                                          for image_bytes in images_bytes])
+    if numpy_images[0] is None:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
+                            content={"response signal" : ResponseSignal.IMAGE_READ_FAIL.value})
+    
+    try:
+        vectors = await asyncio.gather(*[embedding_controller.get_enrollment_embedding(image=numpy_image)
+                                         for numpy_image in numpy_images if numpy_image is not None])
+    except InferenceQueueFullError:
+        logger.warning("inference workers are saturated, rejecting client image")
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            content={"response signal" : ResponseSignal.INFERENCE_QUEUE_FULL.value})
+    except (ConnectionError, RuntimeError) as e:
+        # the remote model server is down or failed the request, the caller can retry like on a full queue
+        logger.error(f"inference backend unavailable, rejecting client image: {e}")
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            content={"response signal" : ResponseSignal.INFERENCE_QUEUE_FULL.value})
+    except asyncio.TimeoutError:
+        logger.error("embedding client image timed out")
+        return JSONResponse(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                            content={"response signal" : ResponseSignal.INFERENCE_TIMEOUT.value})
+    
+    # an extra image without a usable face is skipped, the reference image must have one
+    if vectors[0] == None:
+        logger.error(f'Client image embedding error')
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
+                            content={"response signal" : ResponseSignal.IMAGE_EMBEDDING_FAIL.value})
+    vectors = [vector for vector in vectors if vector is not None]
+    
+    meta_data = {"client_id" : client.client_id,
+                 "client_image_path": client.client_image_path,
+                 "client_name":client.client_name,
+                 "site_ids": site_ids}
+    centroid_record_id = str(uuid.uuid4())
+    image_record_ids = [str(uuid.uuid4()) for _ in vectors]
+    
+    async def write_images():
+        with get_metrics().span("file_write"):
+            for image_path, image_bytes in zip(image_paths, images_bytes):
+                async with aiofiles.open(image_path, 'wb') as f:
+                    await f.write(image_bytes)
+        return True
+    
+    # the record, the vectors and the image files are independent, so they are written together
+    results = await asyncio.gather(client_data_model.create_client(client=client),
+                                   embedding_controller.push_client_vectors_to_vector_db(vectors=vectors,
+                                                                                         meta_data=meta_data,
+                                                                                         centroid_record_id=centroid_record_id,
+                                                                                         image_record_ids=image_record_ids,
+                                                                                         site_ids=site_ids),
+                                   write_images(),
+                                   return_exceptions=True)
+    
+    failed = [result is None or isinstance(result, Exception) for result in results]
+    if any(failed):
+        logger.error(f'Client enrollment error: {results}')
+        
+        # undo the writes that went through so the client can simply retry
+        rollbacks = [embedding_controller.remove_client_vectors_from_vector_db(centroid_record_id=centroid_record_id,
+                                                                               image_record_ids=image_record_ids,
+                                                                               site_ids=site_ids)]
+        if not failed[0]:
+            rollbacks.append(client_data_model.delete_client(client_id=client.client_id))
+        rollbacks.extend(asyncio.to_thread(os.remove, image_path) for image_path in image_paths)
+        await asyncio.gather(*rollbacks, return_exceptions=True)
+        
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
+                            content={"response signal" : ResponseSignal.CLIENT_ADD_FAIL.value})
+    
+    invalidate_decisions(app=request.app)
+    
+    return JSONResponse(content={"repsonse signal" : ResponseSignal.CLIENT_ENROLL_SUCCESS.value,
+                                 "Client ID": str(results[0].id),
+                                 "Enrolled images": len(vectors)})
+
+
+async def run_bulk_job(app, enrollment_controller, job_id: str):
+    await enrollment_controller.run_job(job_id)
+    # the clients only become searchable as the job goes, so decisions are dropped once it is done
+    invalidate_decisions(app=app)
+
+
+@client_router.post("/bulk_enroll")
+async def bulk_enroll(
+    request: Request, background_tasks: BackgroundTasks, source_path: str = Form(None), job_id: str = Form(None)):
+    
+    enrollment_controller = EnrollmentController(vector_db_client=request.app.vector_db_client,
+                                                 embedding_client=request.app.inference_executor,
+                                                 client_data_model=request.app.client_data_model,
+                                                 job_data_model=request.app.enrollment_job_data_model,
+                                                 embedding_concurrency=request.app.inference_executor.workers)
+    
+    if source_path and job_id is None:
+        source_path = enrollment_controller.resolve_import_path(source_path=source_path)
+        if source_path is None:
+            return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
+                                content={"response signal" : ResponseSignal.ENROLLMENT_SOURCE_NOT_ALLOWED.value})
+    
+    job, result_message = await enrollment_controller.create_or_resume_job(source_path=source_path, job_id=job_id)
+    
+    if job is None:
+        status_code = status.HTTP_409_CONFLICT if result_message == ResponseSignal.ENROLLMENT_JOB_RUNNING.value \
+            else status.HTTP_400_BAD_REQUEST
+        return JSONResponse(status_code=status_code,
+                            content={"response signal" : result_message})
+    
+    background_tasks.add_task(run_bulk_job, request.app, enrollment_controller, job.job_id)
+    
+    return JSONResponse(content={"repsonse signal" : result_message,
+                                 "Job ID": job.job_id})
+
+
+@client_router.get("/bulk_enroll/{job_id}")
+async def bulk_enroll_status(request: Request, job_id: str):
+    
+    job = await request.app.enrollment_job_data_model.get_job_by_job_id(job_id=job_id)
+    
+    if job == None:
+        return JSONResponse(status_code=status.HTTP_404_NOT_FOUND,
+                            content={"response signal" : ResponseSignal.ENROLLMENT_JOB_NOT_FOUND.value})
+    
+    return JSONResponse(content=job.model_dump(exclude={"id"}))
\ No newline at end of file
@@ -1 +1,3 @@
-from .firebase.Firebase import Firebase
\ No newline at end of file
+from .firebase.Firebase import Firebase
+from .firebase.FakeFirebase import FakeFirebase
+from .firebase.FirebaseWriter import FirebaseWriter
\ No newline at end of file
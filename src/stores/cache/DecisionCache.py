@@ -0,0 +1,51 @@
+from .TTLCache import TTLCache
+import numpy as np
+import time
+
+
+class DecisionCache:
+
+    def __init__(self, max_sources: int, ttl_seconds: float, max_distance: float, entries_per_source: int = 4):
+        self.cache = TTLCache(max_size=max_sources, ttl_seconds=ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.entries_per_source = entries_per_source
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def normalize(self, vector: list):
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def get(self, source_id: str, vector: list):
+        entries = self.cache.get(source_id)
+        if entries:
+            vector = self.normalize(vector)
+            # the source entry refreshes on every write, so each decision carries its own age
+            fresh = [entry for entry in entries if not self.cache.is_expired(entry[2])]
+            for cached_vector, decision, _ in fresh:
+                if 1 - float(cached_vector @ vector) <= self.max_distance:
+                    self.hits += 1
+                    return decision
+
+        self.misses += 1
+        return None
+
+    def set(self, source_id: str, vector: list, decision: dict):
+        entries = [entry for entry in self.cache.get(source_id, []) if not self.cache.is_expired(entry[2])]
+        entries.append((self.normalize(vector), decision, time.monotonic()))
+        self.cache.set(source_id, entries[-self.entries_per_source:])
+
+    def invalidate(self):
+        # any gallery change can turn a cached decision wrong
+        self.cache.clear()
+        self.invalidations += 1
+
+    def get_stats(self):
+        return {
+            "sources": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
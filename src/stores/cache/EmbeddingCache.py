@@ -0,0 +1,90 @@
+from .TTLCache import TTLCache
+import numpy as np
+import hashlib
+import asyncio
+import cv2
+
+
+class EmbeddingCache:
+
+    def __init__(self, embedding_client, max_size: int, ttl_seconds: float, phash_max_distance: int = -1):
+        self.embedding_client = embedding_client
+        self.cache = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.phash_max_distance = phash_max_distance
+        self.in_flight = {}
+        self.hits = 0
+        self.phash_hits = 0
+        self.misses = 0
+
+    def content_hash(self, image: np.ndarray):
+        digest = hashlib.blake2b(np.ascontiguousarray(image).data, digest_size=16)
+        digest.update(str(image.shape).encode())
+        return digest.hexdigest()
+
+    def perceptual_hash(self, image: np.ndarray):
+        # 64 bit difference hash: brightness gradients of a 9x8 thumbnail
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        thumbnail = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).flatten()
+        return int(np.packbits(bits).view(">u8")[0])
+
+    def find_similar(self, phash: int, source_id: str):
+        # a whole frame hash mostly sees the background, so only frames of the same camera are compared
+        best_vector, best_distance = None, self.phash_max_distance + 1
+        for _, (vector, cached_phash, cached_source_id) in self.cache.items():
+            if cached_phash is None or cached_source_id != source_id:
+                continue
+            distance = (phash ^ cached_phash).bit_count()
+            if distance < best_distance:
+                best_vector, best_distance = vector, distance
+        return best_vector
+
+    async def embed_image(self, image_path, source_id: str = None):
+        # file paths can change on disk, only decoded frames are cached
+        if not isinstance(image_path, np.ndarray):
+            return await self.embedding_client.embed_image(image_path=image_path)
+
+        key = self.content_hash(image_path)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached[0]
+
+        phash = None
+        if self.phash_max_distance >= 0 and source_id is not None:
+            phash = self.perceptual_hash(image_path)
+            vector = self.find_similar(phash, source_id)
+            if vector is not None:
+                self.phash_hits += 1
+                return vector
+
+        # identical frames arriving together share one embedding
+        if key in self.in_flight:
+            self.hits += 1
+            return await asyncio.shield(self.in_flight[key])
+
+        self.misses += 1
+        future = asyncio.ensure_future(self.embedding_client.embed_image(image_path=image_path))
+        self.in_flight[key] = future
+        try:
+            vector = await asyncio.shield(future)
+        finally:
+            self.in_flight.pop(key, None)
+
+        if vector is not None:
+            self.cache.set(key, (vector, phash, source_id))
+        return vector
+
+    def clear(self):
+        self.cache.clear()
+
+    def get_stats(self):
+        lookups = self.hits + self.phash_hits + self.misses
+        return {
+            "size": len(self.cache),
+            "max_size": self.cache.max_size,
+            "hits": self.hits,
+            "phash_hits": self.phash_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.phash_hits) / lookups, 3) if lookups else 0,
+        }
@@ -0,0 +1,53 @@
+from collections import OrderedDict
+import time
+
+
+class TTLCache:
+
+    def __init__(self, max_size: int, ttl_seconds: float = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def is_expired(self, stored_at: float):
+        return self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            return default
+
+        value, stored_at = entry
+        if self.is_expired(stored_at):
+            del self.entries[key]
+            return default
+
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self.entries[key] = (value, time.monotonic())
+        self.entries.move_to_end(key)
+
+        # least recently used entries go first
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        entry = self.entries.pop(key, None)
+        if entry is None or self.is_expired(entry[1]):
+            return default
+        return entry[0]
+
+    def clear(self):
+        self.entries.clear()
+
+    def items(self):
+        for key, (value, stored_at) in list(self.entries.items()):
+            if self.is_expired(stored_at):
+                self.entries.pop(key, None)
+                continue
+            yield key, value
@@ -0,0 +1,116 @@
+from .InferenceExecutor import InferenceQueueFullError
+import logging
+import asyncio
+
+
+class EmbeddingBatcher:
+
+    def __init__(self, embedding_client, max_batch_size: int, max_wait_ms: float, max_pending: int = None):
+        self.embedding_client = embedding_client
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.pending = []
+        self.has_items = None
+        self.batch_full = None
+        self.task = None
+        # the event loop only keeps weak references to tasks, in-flight batches are held here
+        self.batch_tasks = set()
+        self.batches = 0
+        self.batched_images = 0
+        self.batch_sizes = {}
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        self.has_items = asyncio.Event()
+        self.batch_full = asyncio.Event()
+        self.task = asyncio.create_task(self._collect_batches())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+        # batches already on the workers are drained, so their callers get their vectors
+        if self.batch_tasks:
+            await asyncio.gather(*self.batch_tasks, return_exceptions=True)
+
+        for _, future, _ in self.pending:
+            if not future.done():
+                future.cancel()
+        self.pending = []
+
+    async def embed_image(self, image_path):
+        if self.max_pending is not None and len(self.pending) >= self.max_pending:
+            raise InferenceQueueFullError(f"{len(self.pending)} frames are already waiting for a batch")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # the enqueue time bounds how long this frame may wait for its batch
+        self.pending.append((image_path, future, loop.time()))
+
+        self.has_items.set()
+        if len(self.pending) >= self.max_batch_size:
+            self.batch_full.set()
+
+        return await future
+
+    async def _collect_batches(self):
+        while True:
+            await self.has_items.wait()
+
+            # wait for a full batch, or until the oldest frame has waited long enough since it arrived
+            timeout = self.pending[0][2] + self.max_wait - asyncio.get_running_loop().time()
+            if len(self.pending) < self.max_batch_size and timeout > 0:
+                try:
+                    await asyncio.wait_for(self.batch_full.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self.pending[:self.max_batch_size]
+            self.pending = self.pending[self.max_batch_size:]
+
+            if not self.pending:
+                self.has_items.clear()
+            if len(self.pending) < self.max_batch_size:
+                self.batch_full.clear()
+
+            # the next batch keeps forming while this one is on the inference workers
+            task = asyncio.create_task(self._run_batch(batch))
+            self.batch_tasks.add(task)
+            task.add_done_callback(self.batch_tasks.discard)
+
+    async def _run_batch(self, batch: list):
+        batch = [(image, future) for image, future, _ in batch if not future.done()]
+        if not batch:
+            return
+
+        self.batches += 1
+        self.batched_images += len(batch)
+        self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+
+        try:
+            vectors = await self.embedding_client.embed_images(images=[image for image, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    def get_stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "pending": len(self.pending),
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched_images / self.batches, 3) if self.batches else 0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+        }
@@ -0,0 +1,231 @@
+from .ModelFactory import ModelProviderFactory
+from .InferenceExecutorEnum import InferenceExecutorEnum
+from .InferenceExecutor import InferenceQueueFullError, warm_up_batch_sizes
+from helpers.timing import StageTimer
+from helpers.metrics import get_metrics
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import asyncio
+import time
+
+
+class PipelineJob:
+
+    def __init__(self, payload, stop_after: str, future: asyncio.Future):
+        self.payload = payload
+        self.stop_after = stop_after
+        self.future = future
+        self.queued_at = time.monotonic()
+
+
+class PipelineStage:
+
+    def __init__(self, name: str, handler, workers: int, queue_size: int, batch_size: int = 1):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.executor = None
+        self.tasks = []
+        self.next_stage = None
+
+
+class FacePipeline:
+    """Inference split into decode -> detect -> gate -> align -> embed stages.
+
+    Every stage has its own thread pool and bounded queue, so the slowest stage
+    can be scaled on its own. Frames without a usable face leave the pipeline
+    at the gate and never reach the recognition model.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.executor_type = InferenceExecutorEnum.PIPELINE.value
+        self.timeout = config.INFERENCE_TIMEOUT
+        # the embed workers bound throughput, bulk enrollment runs one batch per worker
+        self.workers = config.PIPELINE_EMBED_WORKERS
+        # frames a route may queue before it is answered with a 503
+        self.max_pending = config.PIPELINE_QUEUE_SIZE
+        self.provider = None
+        self.stages = {}
+        self.rejected = 0
+        self.no_face = 0
+        self.timer = StageTimer()
+        self.ready = False
+        self.startup_report = None
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        queue_size = self.config.PIPELINE_QUEUE_SIZE
+        stages = [
+            PipelineStage("decode", self._decode, self.config.PIPELINE_DECODE_WORKERS, queue_size),
+            PipelineStage("detect", self._detect, self.config.PIPELINE_DETECT_WORKERS, queue_size),
+            PipelineStage("gate", self._gate, self.config.PIPELINE_GATE_WORKERS, queue_size),
+            PipelineStage("align", self._align, self.config.PIPELINE_ALIGN_WORKERS, queue_size),
+            PipelineStage("embed", self._embed, self.config.PIPELINE_EMBED_WORKERS, queue_size,
+                          batch_size=self.config.PIPELINE_EMBED_BATCH_SIZE),
+        ]
+
+        for stage, next_stage in zip(stages, stages[1:] + [None]):
+            stage.next_stage = next_stage
+            stage.executor = ThreadPoolExecutor(max_workers=stage.workers,
+                                                thread_name_prefix=f"pipeline-{stage.name}")
+            stage.tasks = [asyncio.create_task(self._run_stage(stage)) for _ in range(stage.workers)]
+            self.stages[stage.name] = stage
+
+        return True
+
+    def warm_up(self):
+        # the stages share one provider, loaded and warmed up here before any frame is queued
+        started_at = time.perf_counter()
+        model_factory = ModelProviderFactory(config=self.config)
+        provider = model_factory.intialize_provider(self.config.EMBEDDING_MODEL_PROVIDER)
+        loaded = provider.set_embedding_model(model_name=self.config.EMBEDDING_MODEL_NAME,
+                                              detector_backend=self.config.DETECTION_BACKEND)
+        provider.set_face_gate(min_confidence=self.config.FACE_GATE_MIN_CONFIDENCE,
+                               min_size=self.config.FACE_GATE_MIN_SIZE)
+        self.startup_report = {"loaded": loaded, "load_ms": round((time.perf_counter() - started_at) * 1000, 3)}
+
+        if loaded and self.config.MODEL_WARMUP_RUNS > 0:
+            self.startup_report["warm_up"] = provider.warm_up(runs=self.config.MODEL_WARMUP_RUNS,
+                                                              batch_sizes=warm_up_batch_sizes(self.config))
+
+        self.provider = provider
+        self.ready = loaded
+        if not self.ready:
+            self.logger.error("Error in loading the embedding model for the inference pipeline")
+            return False
+
+        self.logger.info("inference pipeline is ready: " +
+                         ", ".join(f"{stage.workers} {name}" for name, stage in self.stages.items()))
+        return True
+
+    def shutdown(self):
+        for stage in self.stages.values():
+            for task in stage.tasks:
+                task.cancel()
+            stage.executor.shutdown(wait=False, cancel_futures=True)
+        self.stages = {}
+
+    def _decode(self, image_path):
+        return self.provider.decode(image_path)
+
+    def _detect(self, image):
+        return image, self.provider.detect(image)
+
+    def _gate(self, payload: tuple):
+        image, faces = payload
+        faces = self.provider.gate(faces)
+        get_metrics().increment("faces_detected", len(faces))
+        if len(faces) == 0:
+            self.no_face += 1
+            return None
+        return image, faces
+
+    def _align(self, payload: tuple):
+        image, faces = payload
+        # the largest face is the one the frame is about
+        face = max(faces, key=lambda face: face["w"] * face["h"])
+        return self.provider.align(image, face)
+
+    def _embed(self, faces: list):
+        return self.provider.embed(faces)
+
+    async def _run_stage(self, stage: PipelineStage):
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = [await stage.queue.get()]
+            while len(jobs) < stage.batch_size and not stage.queue.empty():
+                jobs.append(stage.queue.get_nowait())
+
+            # callers that timed out are not worth the work
+            jobs = [job for job in jobs if not job.future.done()]
+            if not jobs:
+                continue
+
+            started_at = time.monotonic()
+            for job in jobs:
+                self.timer.record(f"{stage.name}_wait", started_at - job.queued_at)
+
+            try:
+                if stage.batch_size > 1:
+                    results = await loop.run_in_executor(stage.executor, stage.handler,
+                                                         [job.payload for job in jobs])
+                else:
+                    results = [await loop.run_in_executor(stage.executor, stage.handler, jobs[0].payload)]
+            except Exception as e:
+                self.logger.error(f"Error in {stage.name} stage: {e}")
+                for job in jobs:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                continue
+
+            self.timer.record(stage.name, time.monotonic() - started_at)
+
+            for job, result in zip(jobs, results):
+                if job.future.done():
+                    continue
+                if result is None or job.stop_after == stage.name or stage.next_stage is None:
+                    job.future.set_result(result)
+                    continue
+                job.payload = result
+                job.queued_at = time.monotonic()
+                # a full downstream queue holds this worker back instead of dropping the frame
+                await stage.next_stage.queue.put(job)
+
+    async def submit(self, payload, first_stage: str = "decode", stop_after: str = "embed", wait: bool = False):
+        if self.provider is None:
+            self.rejected += 1
+            raise InferenceQueueFullError("the inference pipeline is still warming up")
+
+        stage = self.stages[first_stage]
+        job = PipelineJob(payload=payload, stop_after=stop_after,
+                          future=asyncio.get_running_loop().create_future())
+        if wait:
+            # internal batches can be larger than the queue, they wait for room instead of being rejected
+            await stage.queue.put(job)
+        else:
+            try:
+                stage.queue.put_nowait(job)
+            except asyncio.QueueFull:
+                self.rejected += 1
+                raise InferenceQueueFullError(f"{stage.queue.qsize()} frames are already waiting for {stage.name}")
+
+        submitted_at = time.monotonic()
+        result = await asyncio.wait_for(job.future, timeout=self.timeout)
+        self.timer.record("total", time.monotonic() - submitted_at)
+        return result
+
+    async def embed_image(self, image_path):
+        return await self.submit(image_path)
+
+    async def embed_images(self, images: list):
+        # the embed stage batches whatever is waiting, so images are simply submitted together,
+        # batches come from bulk enrollment and the batcher, which do their own admission
+        return list(await asyncio.gather(*[self.submit(image, wait=True) for image in images]))
+
+    async def detect_faces(self, image):
+        result = await self.submit(image, stop_after="gate")
+        if result is None:
+            return []
+        _, faces = result
+        return [(face["x"], face["y"], face["w"], face["h"]) for face in faces]
+
+    async def embed_faces(self, image, boxes: list):
+        return list(await asyncio.gather(*[self.submit((image, [{"x": x, "y": y, "w": w, "h": h}]), first_stage="align")
+                                           for x, y, w, h in boxes]))
+
+    def get_stats(self):
+        return {
+            "executor_type": self.executor_type,
+            "workers": self.workers,
+            "stage_workers": {name: stage.workers for name, stage in self.stages.items()},
+            "queues": {name: stage.queue.qsize() for name, stage in self.stages.items()},
+            "pending": sum(stage.queue.qsize() for stage in self.stages.values()),
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "no_face": self.no_face,
+            "ready": self.ready,
+            "stages": self.timer.snapshot(),
+        }
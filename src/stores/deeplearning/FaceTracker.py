@@ -0,0 +1,111 @@
+from stores.cache.TTLCache import TTLCache
+import numpy as np
+import itertools
+import time
+
+
+class FaceTrack:
+
+    def __init__(self, track_id: int, box: tuple):
+        self.track_id = track_id
+        self.box = box
+        self.confidence = 0.0
+        self.decision = None
+        self.verified_at = None
+        self.misses = 0
+
+    @property
+    def area(self):
+        return self.box[2] * self.box[3]
+
+
+class FaceTracker:
+
+    def __init__(self, max_sources: int, iou_threshold: float, confidence_decay: float,
+                 min_confidence: float, reverify_seconds: float, max_misses: int):
+        # a source idle for longer than the reverify interval would re-embed everything anyway
+        self.sources = TTLCache(max_size=max_sources, ttl_seconds=reverify_seconds)
+        self.iou_threshold = iou_threshold
+        self.confidence_decay = confidence_decay
+        self.min_confidence = min_confidence
+        self.reverify_seconds = reverify_seconds
+        self.max_misses = max_misses
+        self.track_ids = itertools.count(1)
+        self.frames = 0
+        self.embeds = 0
+        self.invalidations = 0
+
+    def iou(self, boxes_a: np.ndarray, boxes_b: np.ndarray):
+        # boxes are (x, y, w, h), the result is a len(a) x len(b) matrix
+        a = boxes_a[:, None, :]
+        b = boxes_b[None, :, :]
+        inter_w = np.clip(np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+        inter_h = np.clip(np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+        inter = inter_w * inter_h
+        union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - inter
+        return inter / np.maximum(union, 1e-9)
+
+    def update(self, source_id: str, boxes: list):
+        """Match the detector boxes of one frame to the source's tracks.
+        
+        Returns one track per box, in box order. Unmatched boxes open new tracks,
+        tracks unseen for more than max_misses frames are dropped.
+        """
+        self.frames += 1
+        tracks = self.sources.get(source_id, [])
+        matched = [None] * len(boxes)
+
+        if tracks and boxes:
+            overlaps = self.iou(np.asarray([track.box for track in tracks], dtype=np.float32),
+                                np.asarray(boxes, dtype=np.float32))
+            # greedy matching, highest overlap first
+            for track_index, box_index in zip(*np.unravel_index(np.argsort(-overlaps, axis=None), overlaps.shape)):
+                if overlaps[track_index, box_index] < self.iou_threshold:
+                    break
+                track = tracks[track_index]
+                if matched[box_index] is not None or track in matched:
+                    continue
+                matched[box_index] = track
+
+        for track in tracks:
+            if track in matched:
+                track.misses = 0
+                track.confidence *= self.confidence_decay
+            else:
+                track.misses += 1
+
+        survivors = [track for track in tracks if track.misses <= self.max_misses]
+        for box_index, box in enumerate(boxes):
+            if matched[box_index] is None:
+                matched[box_index] = FaceTrack(track_id=next(self.track_ids), box=tuple(box))
+                survivors.append(matched[box_index])
+            else:
+                matched[box_index].box = tuple(box)
+
+        self.sources.set(source_id, survivors)
+        return matched
+
+    def needs_embedding(self, track: FaceTrack):
+        return (track.decision is None
+                or track.confidence < self.min_confidence
+                or time.monotonic() - track.verified_at >= self.reverify_seconds)
+
+    def set_decision(self, track: FaceTrack, decision: dict):
+        self.embeds += 1
+        track.decision = decision
+        track.confidence = 1.0
+        track.verified_at = time.monotonic()
+
+    def invalidate(self):
+        # a gallery change can turn any identified track wrong
+        self.sources.clear()
+        self.invalidations += 1
+
+    def get_stats(self):
+        return {
+            "sources": len(self.sources),
+            "frames": self.frames,
+            "embeds": self.embeds,
+            "embeds_per_frame": round(self.embeds / self.frames, 4) if self.frames else 0.0,
+            "invalidations": self.invalidations,
+        }
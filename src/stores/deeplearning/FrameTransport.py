@@ -0,0 +1,57 @@
+import numpy as np
+import asyncio
+import struct
+import json
+
+# every message is: header length, payload length, a JSON header, then the raw array bytes.
+# arrays travel as their buffer plus dtype and shape in the header, never pickled.
+_PREFIX = struct.Struct("!II")
+
+
+def _pack(value, arrays: list):
+    if isinstance(value, np.ndarray):
+        arrays.append(np.ascontiguousarray(value))
+        return {"__array__": len(arrays) - 1}
+    if isinstance(value, (list, tuple)):
+        return [_pack(item, arrays) for item in value]
+    if isinstance(value, dict):
+        return {key: _pack(item, arrays) for key, item in value.items()}
+    return value
+
+
+def _unpack(value, arrays: list):
+    if isinstance(value, dict):
+        if "__array__" in value:
+            return arrays[value["__array__"]]
+        return {key: _unpack(item, arrays) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_unpack(item, arrays) for item in value]
+    return value
+
+
+def write_message(writer: asyncio.StreamWriter, message: dict):
+    arrays = []
+    body = _pack(message, arrays)
+    header = json.dumps({"body": body,
+                         "arrays": [{"dtype": array.dtype.str, "shape": array.shape} for array in arrays]}).encode()
+
+    writer.write(_PREFIX.pack(len(header), sum(array.nbytes for array in arrays)))
+    writer.write(header)
+    for array in arrays:
+        writer.write(memoryview(array).cast("B"))
+
+
+async def read_message(reader: asyncio.StreamReader):
+    header_size, payload_size = _PREFIX.unpack(await reader.readexactly(_PREFIX.size))
+    header = json.loads(await reader.readexactly(header_size))
+    payload = await reader.readexactly(payload_size) if payload_size else b""
+
+    # the arrays are read only views into the received payload, no copy is made
+    arrays, offset = [], 0
+    for spec in header["arrays"]:
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        arrays.append(np.frombuffer(payload, dtype=dtype, count=count, offset=offset).reshape(spec["shape"]))
+        offset += count * dtype.itemsize
+
+    return _unpack(header["body"], arrays)
@@ -0,0 +1,161 @@
+from .InferenceExecutorEnum import InferenceExecutorEnum
+from .InferenceExecutor import InferenceQueueFullError
+from .FrameTransport import read_message, write_message
+from helpers.timing import StageTimer
+import logging
+import itertools
+import asyncio
+import time
+import os
+
+
+class InferenceClient:
+    """Executor stand-in for API workers, every call is answered by the model server process."""
+
+    def __init__(self, config):
+        self.config = config
+        self.executor_type = InferenceExecutorEnum.REMOTE.value
+        self.socket_path = config.MODEL_SERVER_SOCKET_PATH
+        self.workers = config.INFERENCE_WORKERS or os.cpu_count() or 1
+        self.max_pending = self.workers + config.INFERENCE_MAX_QUEUE_SIZE
+        self.timeout = config.INFERENCE_TIMEOUT
+        self.reader = None
+        self.writer = None
+        self.read_task = None
+        self.connect_lock = None
+        self.responses = {}
+        self.request_ids = itertools.count()
+        self.rejected = 0
+        self.reconnects = 0
+        self.timer = StageTimer()
+        self.ready = False
+        self.startup_report = None
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        # the connection belongs to the event loop, it is opened on the first request
+        return True
+
+    async def _status(self):
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        try:
+            write_message(writer, {"id": 0, "method": "status", "kwargs": {}})
+            await writer.drain()
+            return (await read_message(reader))["result"]
+        finally:
+            writer.close()
+
+    def warm_up(self):
+        # the model lives in the server, here we only wait until it is up and warm
+        deadline = time.monotonic() + self.config.MODEL_SERVER_CONNECT_TIMEOUT
+        while True:
+            try:
+                status = asyncio.run(self._status())
+                if status["ready"]:
+                    self.startup_report = status["startup_report"]
+                    self.ready = True
+                    return True
+            except (OSError, asyncio.IncompleteReadError):
+                pass
+
+            if time.monotonic() >= deadline:
+                self.logger.error(f"Error in reaching the model server on {self.socket_path}")
+                return False
+            time.sleep(0.5)
+
+    def shutdown(self):
+        if self.read_task is not None:
+            self.read_task.cancel()
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = self.read_task = None
+
+    async def _connect(self):
+        if self.connect_lock is None:
+            self.connect_lock = asyncio.Lock()
+
+        async with self.connect_lock:
+            if self.writer is not None:
+                return
+            self.reader, self.writer = await asyncio.open_unix_connection(self.socket_path)
+            self.read_task = asyncio.create_task(self._read_responses(self.reader))
+
+    async def _read_responses(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                response = await read_message(reader)
+                future = self.responses.pop(response["id"], None)
+                if future is None or future.done():
+                    continue
+                if response.get("error") == "queue_full":
+                    future.set_exception(InferenceQueueFullError(response["message"]))
+                elif "error" in response:
+                    future.set_exception(RuntimeError(response["message"]))
+                else:
+                    future.set_result(response["result"])
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            # the server went away, waiting callers fail and the next request reconnects
+            self.logger.error(f"Error in model server connection: {e}")
+            self.reconnects += 1
+            self.writer = None
+            for future in self.responses.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("model server connection lost"))
+            self.responses = {}
+
+    async def submit(self, method_name: str, **kwargs):
+        if len(self.responses) >= self.max_pending:
+            self.rejected += 1
+            raise InferenceQueueFullError(f"{len(self.responses)} inference requests are already pending")
+
+        try:
+            await self._connect()
+        except OSError as e:
+            raise ConnectionError(f"model server unreachable on {self.socket_path}: {e}") from e
+
+        request_id = next(self.request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self.responses[request_id] = future
+
+        submitted_at = time.monotonic()
+        try:
+            # the reader clears self.writer when the connection drops, even between _connect and here
+            writer = self.writer
+            if writer is None:
+                raise ConnectionError("model server connection lost")
+            try:
+                write_message(writer, {"id": request_id, "method": method_name, "kwargs": kwargs})
+                await writer.drain()
+            except OSError as e:
+                raise ConnectionError(f"model server connection lost: {e}") from e
+            result = await asyncio.wait_for(future, timeout=self.timeout)
+        finally:
+            self.responses.pop(request_id, None)
+
+        self.timer.record("round_trip", time.monotonic() - submitted_at)
+        return result
+
+    async def embed_image(self, image_path):
+        return await self.submit("embed_image", image_path=image_path)
+
+    async def embed_images(self, images: list):
+        return await self.submit("embed_images", images=images)
+
+    async def detect_faces(self, image):
+        return [tuple(box) for box in await self.submit("detect_faces", image=image)]
+
+    async def embed_faces(self, image, boxes: list):
+        return await self.submit("embed_faces", image=image, boxes=boxes)
+
+    def get_stats(self):
+        return {
+            "executor_type": self.executor_type,
+            "socket_path": self.socket_path,
+            "workers": self.workers,
+            "pending": len(self.responses),
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "reconnects": self.reconnects,
+            "ready": self.ready,
+            "stages": self.timer.snapshot(),
+        }
@@ -0,0 +1,168 @@
+from .ModelFactory import ModelProviderFactory
+from .InferenceExecutorEnum import InferenceExecutorEnum
+from helpers.timing import StageTimer
+from helpers.metrics import get_metrics
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+import logging
+import multiprocessing
+import threading
+import asyncio
+import time
+import os
+
+# every worker (thread or process) keeps its own provider with a preloaded model
+_worker_state = threading.local()
+
+
+def _initialize_worker(config):
+    started_at = time.perf_counter()
+    model_factory = ModelProviderFactory(config=config)
+    provider = model_factory.intialize_provider(config.EMBEDDING_MODEL_PROVIDER)
+    loaded = provider.set_embedding_model(model_name=config.EMBEDDING_MODEL_NAME,
+                                          detector_backend=config.DETECTION_BACKEND)
+    provider.set_face_gate(min_confidence=config.FACE_GATE_MIN_CONFIDENCE,
+                           min_size=config.FACE_GATE_MIN_SIZE)
+    _worker_state.provider = provider
+    _worker_state.report = {"loaded": loaded, "load_ms": round((time.perf_counter() - started_at) * 1000, 3)}
+
+    if loaded and config.MODEL_WARMUP_RUNS > 0:
+        _worker_state.report["warm_up"] = provider.warm_up(runs=config.MODEL_WARMUP_RUNS,
+                                                           batch_sizes=warm_up_batch_sizes(config))
+
+
+def warm_up_batch_sizes(config):
+    # every batch size the workers are configured for gets its graph traced before traffic arrives
+    batch_sizes = {1, config.EMBEDDING_BATCH_MAX_SIZE}
+    if config.INFERENCE_EXECUTOR_TYPE == InferenceExecutorEnum.PIPELINE.value:
+        batch_sizes.add(config.PIPELINE_EMBED_BATCH_SIZE)
+    return sorted(batch_sizes)
+
+
+def _run_on_worker(method_name: str, args: tuple, kwargs: dict):
+    started_at = time.monotonic()
+    # an empty task only reports how the worker started
+    result = _worker_state.report
+    # the stage split travels back with the result, process workers cannot record into this process
+    _worker_state.provider.call_stats = {}
+    if method_name is not None:
+        result = getattr(_worker_state.provider, method_name)(*args, **kwargs)
+    return result, started_at, time.monotonic(), _worker_state.provider.call_stats
+
+
+class InferenceQueueFullError(Exception):
+    pass
+
+
+class InferenceExecutor:
+
+    def __init__(self, config):
+        self.config = config
+        self.executor_type = config.INFERENCE_EXECUTOR_TYPE
+        self.workers = config.INFERENCE_WORKERS or os.cpu_count() or 1
+        self.max_pending = self.workers + config.INFERENCE_MAX_QUEUE_SIZE
+        self.timeout = config.INFERENCE_TIMEOUT
+        self.executor = None
+        self.pending = 0
+        self.rejected = 0
+        self.pending_lock = threading.Lock()
+        self.timer = StageTimer()
+        self.ready = False
+        self.startup_report = None
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        if self.executor_type == InferenceExecutorEnum.PROCESS.value:
+            # spawn instead of fork so workers never inherit a half initialized tensorflow runtime
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=_initialize_worker,
+                                                initargs=(self.config,))
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers,
+                                               thread_name_prefix="inference",
+                                               initializer=_initialize_worker,
+                                               initargs=(self.config,))
+
+        return True
+
+    def warm_up(self):
+        # one empty task per worker forces every worker to start, load its model and warm it up now
+        warm_ups = [self.executor.submit(_run_on_worker, None, (), {}) for _ in range(self.workers)]
+        wait(warm_ups)
+
+        reports = []
+        for warm_up in warm_ups:
+            if warm_up.exception() is not None:
+                self.logger.error(f"Error in starting inference worker: {warm_up.exception()}")
+                return False
+            reports.append(warm_up.result()[0])
+
+        # every worker goes through the same phases, one report is representative
+        self.startup_report = reports[0]
+        self.ready = all(report["loaded"] for report in reports)
+        if not self.ready:
+            self.logger.error("Error in loading the embedding model on an inference worker")
+            return False
+
+        self.logger.info(f"{self.workers} {self.executor_type} inference workers are ready")
+        return True
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def _release(self, _future):
+        with self.pending_lock:
+            self.pending -= 1
+
+    async def submit(self, method_name: str, *args, **kwargs):
+        with self.pending_lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise InferenceQueueFullError(f"{self.pending} inference requests are already pending")
+            self.pending += 1
+
+        submitted_at = time.monotonic()
+        try:
+            future = self.executor.submit(_run_on_worker, method_name, args, kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+
+        result, started_at, finished_at, call_stats = await asyncio.wait_for(asyncio.wrap_future(future),
+                                                                             timeout=self.timeout)
+
+        self.timer.record("queue_wait", started_at - submitted_at)
+        self.timer.record("inference", finished_at - started_at)
+        for stage in ("detect", "embed"):
+            if stage in call_stats:
+                self.timer.record(stage, call_stats[stage])
+        if "faces" in call_stats:
+            get_metrics().increment("faces_detected", call_stats["faces"])
+        self.timer.record("total", time.monotonic() - submitted_at)
+        return result
+
+    async def embed_image(self, image_path):
+        return await self.submit("embed_image", image_path=image_path)
+
+    async def embed_images(self, images: list):
+        return await self.submit("embed_images", images=images)
+
+    async def detect_faces(self, image):
+        return await self.submit("detect_faces", image=image)
+
+    async def embed_faces(self, image, boxes: list):
+        return await self.submit("embed_faces", image=image, boxes=boxes)
+
+    def get_stats(self):
+        return {
+            "executor_type": self.executor_type,
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "ready": self.ready,
+            "stages": self.timer.snapshot(),
+        }
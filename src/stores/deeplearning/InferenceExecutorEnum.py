@@ -0,0 +1,7 @@
+from enum import Enum
+
+class InferenceExecutorEnum(Enum):
+    THREAD = "thread"
+    PROCESS = "process"
+    PIPELINE = "pipeline"
+    REMOTE = "remote"
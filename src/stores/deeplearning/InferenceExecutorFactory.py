@@ -0,0 +1,20 @@
+from .InferenceExecutorEnum import InferenceExecutorEnum
+from .InferenceExecutor import InferenceExecutor
+from .FacePipeline import FacePipeline
+from .InferenceClient import InferenceClient
+
+class InferenceExecutorFactory:
+    
+    def __init__(self, config: dict):
+        self.config = config
+    
+    def intialize_executor(self, executor_type: str):
+        
+        if executor_type == InferenceExecutorEnum.PIPELINE.value:
+            return FacePipeline(config=self.config)
+        
+        if executor_type == InferenceExecutorEnum.REMOTE.value:
+            return InferenceClient(config=self.config)
+        
+        # thread and process pools are both handled by the executor itself
+        return InferenceExecutor(config=self.config)
@@ -1,5 +1,6 @@
 from .ModelProviderEnum import ModelProviderEnum
-from .providers.deepface import DeepFaceProvider
+from controllers.BaseController import BaseController
+import os
 
 class ModelProviderFactory:
     
@@ -8,9 +9,24 @@ class ModelProviderFactory:
     
     def intialize_provider(self, provider_name: str):
         
+        # providers are imported on demand, importing deepface loads all of tensorflow
         if provider_name == ModelProviderEnum.DEEPFACE.value:
+            from .providers.deepface import DeepFaceProvider
+            
             provider = DeepFaceProvider()
             return provider
         
+        if provider_name == ModelProviderEnum.ONNX.value:
+            from .providers.onnx import OnnxProvider
+            
+            base_dir = BaseController().base_dir
+            provider = OnnxProvider(detector_model_path=os.path.join(base_dir, self.config.ONNX_DETECTOR_MODEL_PATH),
+                                    embedding_model_path=os.path.join(base_dir, self.config.ONNX_EMBEDDING_MODEL_PATH),
+                                    intra_op_threads=self.config.ONNX_INTRA_OP_THREADS,
+                                    inter_op_threads=self.config.ONNX_INTER_OP_THREADS,
+                                    quantize_int8=self.config.ONNX_QUANTIZE_INT8,
+                                    score_threshold=self.config.ONNX_DETECTOR_SCORE_THRESHOLD,
+                                    color_order=self.config.ONNX_EMBEDDING_COLOR_ORDER)
+            return provider
         
         return None
\ No newline at end of file
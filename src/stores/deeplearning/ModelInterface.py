@@ -1,11 +1,140 @@
 from abc import ABC, abstractmethod
+import numpy as np
+import time
+import cv2
 
 class ModelInterface(ABC):
     
+    model_name = None
+    detector_backend = None
+    min_face_confidence = 0.0
+    min_face_size = 0
+    # seconds per stage and faces found by the current call, reset and read by the inference worker
+    call_stats = None
+    
     @abstractmethod
     def set_embedding_model(self, model_name: str, vector_size: int, model_path: str):
         pass
     
     @abstractmethod
-    def embed_image(self, image_path: str):
-        pass
\ No newline at end of file
+    def detect(self, image):
+        pass
+    
+    @abstractmethod
+    def embed(self, faces: list):
+        pass
+    
+    # the stages below only build on detect and embed, so every provider shares them
+    
+    def set_face_gate(self, min_confidence: float, min_size: int):
+        self.min_face_confidence = min_confidence
+        self.min_face_size = min_size
+    
+    def warm_up(self, runs: int, batch_sizes: list = (1,)):
+        """Run detection and embedding on synthetic frames so the first request skips lazy loading and tracing.
+        
+        Returns the milliseconds of every run per stage, the first run shows the cold cost.
+        """
+        frame = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+        face = frame[:160, :160]
+        timings = {}
+        for _ in range(runs):
+            started_at = time.perf_counter()
+            self.detect(frame)
+            timings.setdefault("detect_ms", []).append(round((time.perf_counter() - started_at) * 1000, 3))
+            
+            for batch_size in batch_sizes:
+                started_at = time.perf_counter()
+                self.embed([face] * batch_size)
+                timings.setdefault(f"embed_x{batch_size}_ms", []).append(round((time.perf_counter() - started_at) * 1000, 3))
+        
+        return timings
+    
+    def record_call(self, **stats):
+        if self.call_stats is None:
+            return
+        for key, value in stats.items():
+            self.call_stats[key] = self.call_stats.get(key, 0) + value
+    
+    def decode(self, image_path):
+        # paths and encoded bytes are decoded here, frames already decoded by the routes pass through
+        if isinstance(image_path, np.ndarray):
+            return image_path
+        if isinstance(image_path, (bytes, bytearray)):
+            return cv2.imdecode(np.frombuffer(image_path, np.uint8), cv2.IMREAD_COLOR)
+        return cv2.imread(image_path)
+    
+    def gate(self, faces: list):
+        return [face for face in faces
+                if face["confidence"] > self.min_face_confidence
+                and min(face["w"], face["h"]) >= self.min_face_size]
+    
+    def align(self, image, face: dict):
+        x, y, w, h = face["x"], face["y"], face["w"], face["h"]
+        left_eye, right_eye = face.get("left_eye"), face.get("right_eye")
+        
+        # rotate around the eye midpoint so the eyes are level, then crop the face box
+        if left_eye is not None and right_eye is not None:
+            angle = np.degrees(np.arctan2(left_eye[1] - right_eye[1], left_eye[0] - right_eye[0]))
+            center = ((left_eye[0] + right_eye[0]) / 2, (left_eye[1] + right_eye[1]) / 2)
+            rotation = cv2.getRotationMatrix2D(center, angle, 1.0)
+            image = cv2.warpAffine(image, rotation, (image.shape[1], image.shape[0]))
+        
+        return image[max(y, 0):y + h, max(x, 0):x + w]
+    
+    def primary_face(self, image):
+        """Run decode, detect, gate and align for one image, None when it shows no usable face."""
+        image = self.decode(image)
+        if image is None:
+            return None
+        
+        started_at = time.perf_counter()
+        faces = self.gate(self.detect(image))
+        self.record_call(detect=time.perf_counter() - started_at, faces=len(faces))
+        if len(faces) == 0:
+            return None
+        
+        # the largest face is the one the image is about
+        face = max(faces, key=lambda face: face["w"] * face["h"])
+        return self.align(image, face)
+    
+    def embed_image(self, image_path):
+        if self.model_name == None or self.detector_backend == None:
+            return None
+        
+        return self.embed_images(images = [image_path])[0]
+    
+    def embed_images(self, images: list):
+        if self.model_name == None or self.detector_backend == None:
+            return [None] * len(images)
+        
+        # images without a usable face stop here, before the recognition model
+        faces = [self.primary_face(image) for image in images]
+        kept = [index for index, face in enumerate(faces) if face is not None]
+        vectors = [None] * len(images)
+        started_at = time.perf_counter()
+        embedded = self.embed([faces[index] for index in kept])
+        self.record_call(embed=time.perf_counter() - started_at)
+        for index, vector in zip(kept, embedded):
+            vectors[index] = vector
+        
+        return vectors
+    
+    def detect_faces(self, image):
+        if self.detector_backend == None:
+            return []
+        
+        started_at = time.perf_counter()
+        faces = self.gate(self.detect(image))
+        self.record_call(detect=time.perf_counter() - started_at, faces=len(faces))
+        return [(face["x"], face["y"], face["w"], face["h"]) for face in faces]
+    
+    def embed_faces(self, image, boxes: list):
+        if self.model_name == None:
+            return [None] * len(boxes)
+        
+        # the tracker already knows where the faces are, so detection is skipped
+        started_at = time.perf_counter()
+        vectors = self.embed([self.align(image, {"x": x, "y": y, "w": w, "h": h}) for x, y, w, h in boxes])
+        self.record_call(embed=time.perf_counter() - started_at)
+        return vectors
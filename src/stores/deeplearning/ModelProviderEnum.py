@@ -1,4 +1,5 @@
 from enum import Enum
 
 class ModelProviderEnum(Enum):
-    DEEPFACE = "DeepFace"
\ No newline at end of file
+    DEEPFACE = "DeepFace"
+    ONNX = "ONNX"
@@ -0,0 +1,121 @@
+from .InferenceExecutorFactory import InferenceExecutorFactory
+from .InferenceExecutor import InferenceQueueFullError
+from .EmbeddingBatcher import EmbeddingBatcher
+from .FrameTransport import read_message, write_message
+import logging
+import asyncio
+import os
+
+
+class ModelServer:
+    """Hosts the face model once and serves every API worker over a Unix socket.
+
+    Single frames from all connected workers go through one batcher, so
+    concurrent requests from different processes share forward passes.
+    """
+
+    METHODS = ("embed_image", "embed_images", "detect_faces", "embed_faces", "status")
+
+    def __init__(self, config):
+        # the API workers run the remote executor, this process runs the real one
+        self.config = config.model_copy(update={"INFERENCE_EXECUTOR_TYPE": config.MODEL_SERVER_EXECUTOR_TYPE})
+        self.socket_path = config.MODEL_SERVER_SOCKET_PATH
+        self.executor = InferenceExecutorFactory(config=self.config).intialize_executor(
+            executor_type=self.config.INFERENCE_EXECUTOR_TYPE)
+        self.batcher = None
+        self.server = None
+        self.connections = 0
+        self.logger = logging.getLogger(__name__)
+
+    async def start(self):
+        self.executor.start()
+        if not await asyncio.to_thread(self.executor.warm_up):
+            return False
+
+        if self.config.EMBEDDING_BATCH_MAX_SIZE > 1:
+            self.batcher = EmbeddingBatcher(embedding_client=self.executor,
+                                            max_batch_size=self.config.EMBEDDING_BATCH_MAX_SIZE,
+                                            max_wait_ms=self.config.EMBEDDING_BATCH_MAX_WAIT_MS,
+                                            max_pending=self.executor.max_pending * self.config.EMBEDDING_BATCH_MAX_SIZE)
+            self.batcher.start()
+
+        # a socket left behind by a crashed server would block the bind
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.server = await asyncio.start_unix_server(self.handle_connection, path=self.socket_path)
+        self.logger.info(f"model server listening on {self.socket_path}")
+        return True
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+        if self.batcher is not None:
+            await self.batcher.stop()
+        self.executor.shutdown()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    async def dispatch(self, method: str, kwargs: dict):
+        if method == "status":
+            return {"ready": self.executor.ready, "startup_report": self.executor.startup_report}
+
+        if self.batcher is not None and method == "embed_image":
+            return await self.batcher.embed_image(**kwargs)
+
+        if self.batcher is not None and method == "embed_images":
+            # split so the frames can be batched together with other workers' frames
+            return list(await asyncio.gather(*[self.batcher.embed_image(image_path=image)
+                                               for image in kwargs["images"]]))
+
+        return await getattr(self.executor, method)(**kwargs)
+
+    async def handle_request(self, request: dict, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        response = {"id": request["id"]}
+        try:
+            if request["method"] not in self.METHODS:
+                raise ValueError(f"unknown method {request['method']}")
+            response["result"] = await self.dispatch(request["method"], request["kwargs"])
+        except InferenceQueueFullError as e:
+            response["error"] = "queue_full"
+            response["message"] = str(e)
+        except Exception as e:
+            self.logger.error(f"Error in model server request: {e}")
+            response["error"] = "failed"
+            response["message"] = str(e)
+
+        async with write_lock:
+            try:
+                # the message is serialized before anything is written, so a bad result never leaves half a frame
+                write_message(writer, response)
+            except Exception as e:
+                self.logger.error(f"Error in serializing the model server response: {e}")
+                write_message(writer, {"id": request["id"], "error": "failed",
+                                       "message": f"result could not be serialized: {e}"})
+            try:
+                await writer.drain()
+            except ConnectionError as e:
+                # the worker went away, its reader fails every call it was waiting on
+                self.logger.error(f"Error in answering the model server request: {e}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        write_lock = asyncio.Lock()
+        requests = set()
+        try:
+            # requests on one connection are answered as they finish, not in order
+            while True:
+                request = await read_message(reader)
+                task = asyncio.create_task(self.handle_request(request, writer, write_lock))
+                requests.add(task)
+                task.add_done_callback(requests.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections -= 1
+            for task in requests:
+                task.cancel()
+            writer.close()
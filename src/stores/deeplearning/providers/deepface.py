@@ -1,43 +1,60 @@
 from ..ModelInterface import ModelInterface
 from deepface import DeepFace
 from models.enums.ResponseSignal import ResponseSignal
-from logging import Logger
+import logging
 class DeepFaceProvider(ModelInterface):
     
     def __init__(self: str):
         self.model_name = None
         self.detector_backend = None
-        self.logger = Logger(__name__)
+        self.model = None
+        self.logger = logging.getLogger(__name__)
     
     def set_embedding_model(self, model_name: str, detector_backend:str):
-        self.model_name = model_name
-        self.detector_backend = detector_backend
         try:
-            model = DeepFace.build_model(model_name =model_name)
-            self.logger.info("loading embedding model succeed")
-        except:
-            self.logger.error("error in loading embedding model")         
+            # deepface caches built models by name, holding the reference keeps this one loaded
+            self.model = DeepFace.build_model(model_name =model_name)
+        except Exception as e:
+            self.logger.error(f"error in loading embedding model: {e}")
+            return False
         
+        self.model_name = model_name
+        self.detector_backend = detector_backend
+        self.logger.info("loading embedding model succeed")
+        return True
 
-    def embed_image(self, image_path: str):
-        if self.model_name == None or self.detector_backend == None:
-            return None
-        
-        
+    def detect(self, image):
         try:
-            out = DeepFace.represent(img_path = image_path, model_name= self.model_name,
-                                    detector_backend = self.detector_backend, align = True, enforce_detection=False)
+            faces = DeepFace.extract_faces(img_path = image, detector_backend = self.detector_backend,
+                                           align = False, enforce_detection = False)
         except Exception as e:
-            self.logger.error(f"Error in image embedding: {e}")
-            return None
-        
-        if len(out) == 0 or out == None or out[0]["embedding"] == None:
-            return None
+            self.logger.error(f"Error in face detection: {e}")
+            return []
         
-        vector = out[0]["embedding"]
-        return vector
+        # without enforce_detection a frame with no face comes back as one zero confidence face, the gate drops it
+        return [dict(face["facial_area"], confidence = face.get("confidence", 0)) for face in faces]
+    
+    def embed(self, faces: list):
+        if len(faces) == 0:
+            return []
         
-
+        try:
+            # the faces are already detected and aligned, only the recognition model runs here
+            if len(faces) == 1:
+                outs = [DeepFace.represent(img_path = faces[0], model_name= self.model_name,
+                                           detector_backend = "skip", enforce_detection=False)]
+            else:
+                outs = DeepFace.represent(img_path = faces, model_name= self.model_name,
+                                          detector_backend = "skip", enforce_detection=False)
+        except Exception as e:
+            self.logger.error(f"Error in face embedding: {e}")
+            return [None] * len(faces)
         
+        vectors = []
+        for out in outs:
+            if out == None or len(out) == 0 or out[0]["embedding"] == None:
+                vectors.append(None)
+                continue
+            vectors.append(out[0]["embedding"])
         
-    
\ No newline at end of file
+        return vectors
@@ -0,0 +1,133 @@
+from ..ModelInterface import ModelInterface
+import logging
+import onnxruntime as ort
+import numpy as np
+import cv2
+import os
+class OnnxProvider(ModelInterface):
+    """Face detection and embedding with exported models on ONNX Runtime.
+
+    The detector is expected in the UltraFace layout (version-RFB-320 or slim-320):
+    a normalized NCHW RGB image in, per anchor scores and corner boxes out. The
+    embedding model is any face model taking a square crop in NHWC or NCHW layout,
+    such as Facenet512 exported from Keras with tf2onnx.
+    """
+
+    def __init__(self, detector_model_path: str, embedding_model_path: str, intra_op_threads: int = 0,
+                 inter_op_threads: int = 0, quantize_int8: bool = False, score_threshold: float = 0.7,
+                 color_order: str = "BGR"):
+        self.model_name = None
+        self.detector_backend = None
+        self.detector_model_path = detector_model_path
+        self.embedding_model_path = embedding_model_path
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.quantize_int8 = quantize_int8
+        self.score_threshold = score_threshold
+        self.color_order = color_order
+        self.detector = None
+        self.embedder = None
+        self.logger = logging.getLogger(__name__)
+
+    def session_options(self):
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # zero leaves the choice to onnxruntime, one thread per physical core
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        if self.inter_op_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        return options
+
+    def quantized_model_path(self, model_path: str):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        # the int8 variant is written next to the float model once and reused afterwards,
+        # unsigned weights because the CPU ConvInteger kernel only takes uint8
+        root, extension = os.path.splitext(model_path)
+        quantized_path = f"{root}.int8{extension}"
+        if not os.path.exists(quantized_path):
+            quantize_dynamic(model_input=model_path, model_output=quantized_path, weight_type=QuantType.QUInt8)
+        return quantized_path
+
+    def set_embedding_model(self, model_name: str, detector_backend:str):
+        try:
+            embedding_model_path = self.embedding_model_path
+            if self.quantize_int8:
+                embedding_model_path = self.quantized_model_path(embedding_model_path)
+
+            self.detector = ort.InferenceSession(self.detector_model_path, sess_options=self.session_options(),
+                                                 providers=["CPUExecutionProvider"])
+            self.embedder = ort.InferenceSession(embedding_model_path, sess_options=self.session_options(),
+                                                 providers=["CPUExecutionProvider"])
+            self.model_name = model_name
+            self.detector_backend = detector_backend
+            self.logger.info("loading embedding model succeed")
+            return True
+        except Exception as e:
+            self.logger.error(f"error in loading embedding model: {e}")
+            return False
+
+    def detect(self, image):
+        height, width = image.shape[:2]
+        detector_input = self.detector.get_inputs()[0]
+        input_height, input_width = detector_input.shape[2], detector_input.shape[3]
+
+        blob = cv2.resize(image, (input_width, input_height))[:, :, ::-1]
+        blob = ((blob.astype(np.float32) - 127.0) / 128.0).transpose(2, 0, 1)[None]
+
+        try:
+            outputs = self.detector.run(None, {detector_input.name: blob})
+        except Exception as e:
+            self.logger.error(f"Error in face detection: {e}")
+            return []
+
+        named = dict(zip([output.name for output in self.detector.get_outputs()], outputs))
+        scores = named.get("scores", outputs[0])[0][:, 1]
+        boxes = named.get("boxes", outputs[1])[0]
+
+        keep = scores > self.score_threshold
+        scores, boxes = scores[keep], boxes[keep] * [width, height, width, height]
+        rects = [[int(x1), int(y1), int(x2 - x1), int(y2 - y1)] for x1, y1, x2, y2 in boxes]
+        indices = cv2.dnn.NMSBoxes(rects, scores.tolist(), self.score_threshold, 0.3)
+
+        # no landmarks in this layout, so alignment is a plain crop
+        return [{"x": rects[index][0], "y": rects[index][1], "w": rects[index][2], "h": rects[index][3],
+                 "confidence": float(scores[index]), "left_eye": None, "right_eye": None}
+                for index in np.asarray(indices).flatten()]
+
+    def preprocess(self, face: np.ndarray, size: int):
+        # same as deepface: keep the aspect ratio, pad with black to a square, scale to [0, 1]
+        factor = min(size / face.shape[0], size / face.shape[1])
+        resized = cv2.resize(face, (max(int(face.shape[1] * factor), 1), max(int(face.shape[0] * factor), 1)))
+        pad_height, pad_width = size - resized.shape[0], size - resized.shape[1]
+        padded = np.pad(resized, ((pad_height // 2, pad_height - pad_height // 2),
+                                  (pad_width // 2, pad_width - pad_width // 2), (0, 0)))
+        if self.color_order == "RGB":
+            padded = padded[:, :, ::-1]
+        return padded.astype(np.float32) / 255.0
+
+    def embed(self, faces: list):
+        if len(faces) == 0:
+            return []
+
+        embedder_input = self.embedder.get_inputs()[0]
+        channels_first = embedder_input.shape[1] == 3
+        size = embedder_input.shape[2] if channels_first else embedder_input.shape[1]
+
+        batch = np.stack([self.preprocess(face, size) for face in faces])
+        if channels_first:
+            batch = batch.transpose(0, 3, 1, 2)
+
+        try:
+            # models exported with a fixed batch of one take the faces one by one
+            if embedder_input.shape[0] == 1:
+                outputs = np.concatenate([self.embedder.run(None, {embedder_input.name: batch[index:index + 1]})[0]
+                                          for index in range(len(faces))])
+            else:
+                outputs = self.embedder.run(None, {embedder_input.name: batch})[0]
+        except Exception as e:
+            self.logger.error(f"Error in face embedding: {e}")
+            return [None] * len(faces)
+
+        return [vector.tolist() for vector in outputs]
@@ -0,0 +1,32 @@
+import logging
+import time
+
+
+class FakeFirebase:
+    # stands in for the realtime database in tests and local runs, every write is kept in memory
+    def __init__(self, config=None, latency_seconds: float = 0, fail_times: int = 0):
+        self.config = config
+        self.latency_seconds = latency_seconds
+        self.fail_times = fail_times
+        self.data = {}
+        self.writes = []
+        self.logger = logging.getLogger(__name__)
+
+    def connect(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def update_value(self, value: bool):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            self.logger.error("Error in updatin firebase")
+            return False
+
+        self.data["Status"] = value
+        self.writes.append(value)
+        return True
@@ -1,12 +1,12 @@
 import firebase_admin
 from firebase_admin import db, credentials
 from firebase_admin import delete_app
-from logging import Logger
+import logging
 class Firebase:
     def __init__(self, config):
         self.config = config
         self.app = None
-        self.logger  = Logger(__name__)
+        self.logger  = logging.getLogger(__name__)
         
     def connect(self):
         if not firebase_admin._apps:
@@ -0,0 +1,5 @@
+from enum import Enum
+
+class FirebaseClientEnum(Enum):
+    FIREBASE = "firebase"
+    FAKE = "fake"
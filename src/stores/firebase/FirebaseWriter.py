@@ -0,0 +1,91 @@
+from helpers.timing import StageTimer
+import logging
+import asyncio
+
+
+class FirebaseWriter:
+
+    def __init__(self, firebase_client, coalesce_ms: float, max_retries: int, retry_base_seconds: float):
+        self.firebase_client = firebase_client
+        self.coalesce_window = coalesce_ms / 1000
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.latest = None
+        self.has_value = None
+        self.last_written = None
+        self.task = None
+        self.submitted = 0
+        self.written = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.timer = StageTimer()
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        self.has_value = asyncio.Event()
+        self.task = asyncio.create_task(self._write_loop())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+        # the last status must still reach the database on shutdown
+        if self.has_value is not None and self.has_value.is_set():
+            self.has_value.clear()
+            await self._write(self.latest)
+
+    def submit(self, value):
+        self.submitted += 1
+        if self.has_value.is_set():
+            self.coalesced += 1
+        self.latest = value
+        self.has_value.set()
+
+    async def _write_loop(self):
+        while True:
+            await self.has_value.wait()
+
+            # a burst of authentications collapses into its final status
+            await asyncio.sleep(self.coalesce_window)
+            value = self.latest
+            self.has_value.clear()
+
+            if value == self.last_written:
+                self.skipped += 1
+                continue
+
+            await self._write(value)
+
+    async def _write(self, value):
+        for attempt in range(self.max_retries + 1):
+            with self.timer.time("write"):
+                return_val = await asyncio.to_thread(self.firebase_client.update_value, value=value)
+
+            if return_val:
+                self.last_written = value
+                self.written += 1
+                return True
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.retry_base_seconds * 2 ** attempt)
+
+        self.failed += 1
+        self.logger.error(f"Giving up on firebase status {value} after {self.max_retries + 1} attempts")
+        return False
+
+    def get_stats(self):
+        return {
+            "queue_depth": 1 if self.has_value is not None and self.has_value.is_set() else 0,
+            "submitted": self.submitted,
+            "written": self.written,
+            "skipped": self.skipped,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "latency": self.timer.snapshot(),
+        }
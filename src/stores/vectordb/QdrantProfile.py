@@ -0,0 +1,109 @@
+from .VectorDBEnums import VectorDBQuantization
+from qdrant_client import models
+
+
+class QdrantProfile:
+    """How a Qdrant collection is built and queried, picked per deployment size.
+
+    Build settings (HNSW graph, quantization, on-disk storage) only apply to
+    collections created after a change. hnsw_ef and the quantization search
+    options are sent with every query and take effect immediately.
+    """
+
+    # 0 keeps the server default for that value
+    PROFILES = {
+        # plain collection, what the service always created
+        "default": {},
+        # up to ~100k identities: everything in RAM, a slightly denser graph
+        "small": {"hnsw_m": 16, "hnsw_ef_construct": 128, "hnsw_ef": 64},
+        # up to a few million: int8 vectors in RAM for the graph walk, full vectors on disk for rescoring
+        "large": {"hnsw_m": 32, "hnsw_ef_construct": 256, "hnsw_ef": 128,
+                  "quantization": VectorDBQuantization.SCALAR.value, "oversampling": 2.0,
+                  "on_disk_vectors": True, "on_disk_payload": True},
+        # beyond that: 1 bit per dimension, so heavier oversampling is needed to keep recall
+        "xlarge": {"hnsw_m": 32, "hnsw_ef_construct": 256, "hnsw_ef": 128,
+                   "quantization": VectorDBQuantization.BINARY.value, "oversampling": 4.0,
+                   "on_disk_vectors": True, "on_disk_payload": True},
+    }
+
+    def __init__(self, name: str = "default", hnsw_m: int = 0, hnsw_ef_construct: int = 0, hnsw_ef: int = 0,
+                 quantization: str = VectorDBQuantization.NONE.value, rescore: bool = True,
+                 oversampling: float = 1.0, on_disk_vectors: bool = False, on_disk_payload: bool = False):
+        self.name = name
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construct = hnsw_ef_construct
+        self.hnsw_ef = hnsw_ef
+        self.quantization = quantization
+        self.rescore = rescore
+        self.oversampling = oversampling
+        self.on_disk_vectors = on_disk_vectors
+        self.on_disk_payload = on_disk_payload
+
+    @classmethod
+    def from_name(cls, name: str, **overrides):
+        if name not in cls.PROFILES:
+            raise ValueError(f"unknown Qdrant profile {name}, expected one of {list(cls.PROFILES)} or custom")
+        return cls(name=name, **dict(cls.PROFILES[name], **overrides))
+
+    @classmethod
+    def from_settings(cls, config):
+        if config.QDRANT_COLLECTION_PROFILE == "custom":
+            profile = cls(name="custom",
+                          hnsw_m=config.QDRANT_HNSW_M,
+                          hnsw_ef_construct=config.QDRANT_HNSW_EF_CONSTRUCT,
+                          hnsw_ef=config.QDRANT_HNSW_EF,
+                          quantization=config.QDRANT_QUANTIZATION,
+                          rescore=config.QDRANT_QUANTIZATION_RESCORE,
+                          oversampling=config.QDRANT_QUANTIZATION_OVERSAMPLING,
+                          on_disk_vectors=config.QDRANT_ON_DISK_VECTORS,
+                          on_disk_payload=config.QDRANT_ON_DISK_PAYLOAD)
+        else:
+            profile = cls.from_name(config.QDRANT_COLLECTION_PROFILE)
+
+        # query time ef can be tuned on a live collection without rebuilding it
+        if config.QDRANT_HNSW_EF > 0:
+            profile.hnsw_ef = config.QDRANT_HNSW_EF
+        return profile
+
+    def vectors_config(self, embedding_size: int, distance):
+        return models.VectorParams(size=embedding_size,
+                                   distance=distance,
+                                   on_disk=self.on_disk_vectors or None)
+
+    def hnsw_config(self):
+        if not self.hnsw_m and not self.hnsw_ef_construct:
+            return None
+        return models.HnswConfigDiff(m=self.hnsw_m or None,
+                                     ef_construct=self.hnsw_ef_construct or None)
+
+    def quantization_config(self):
+        if self.quantization == VectorDBQuantization.SCALAR.value:
+            return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8,
+                                                                                    quantile=0.99,
+                                                                                    always_ram=True))
+        if self.quantization == VectorDBQuantization.BINARY.value:
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def search_params(self):
+        quantization = None
+        if self.quantization != VectorDBQuantization.NONE.value:
+            # the quantized scores only shortlist, the original vectors decide the final order
+            quantization = models.QuantizationSearchParams(rescore=self.rescore,
+                                                           oversampling=self.oversampling)
+        if not self.hnsw_ef and quantization is None:
+            return None
+        return models.SearchParams(hnsw_ef=self.hnsw_ef or None, quantization=quantization)
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "hnsw_m": self.hnsw_m,
+            "hnsw_ef_construct": self.hnsw_ef_construct,
+            "hnsw_ef": self.hnsw_ef,
+            "quantization": self.quantization,
+            "rescore": self.rescore,
+            "oversampling": self.oversampling,
+            "on_disk_vectors": self.on_disk_vectors,
+            "on_disk_payload": self.on_disk_payload,
+        }
@@ -2,8 +2,21 @@ from enum import Enum
 
 class VectorDBProviders(Enum):
     QDRANT = "QDRANT"
+    INMEMORY = "INMEMORY"
+    MMAP = "MMAP"
 
 
 class VectorDBMetricMethod(Enum):
     COSINE = "cosine"
-    DOT = "dot"
\ No newline at end of file
+    DOT = "dot"
+
+
+class VectorDBQuantization(Enum):
+    NONE = "none"
+    SCALAR = "scalar"
+    BINARY = "binary"
+
+
+class VectorDBSearchMode(Enum):
+    CENTROID = "centroid"
+    RERANK = "rerank"
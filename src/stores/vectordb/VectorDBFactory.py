@@ -1,5 +1,7 @@
-from .providers import Qdrant
+from .providers import Qdrant, InMemoryVectorDB, MMapVectorDB
+import os
 from .VectorDBEnums import VectorDBProviders
+from .QdrantProfile import QdrantProfile
 from controllers.BaseController import BaseController
 class VectorDBFactory:
     
@@ -7,12 +9,37 @@ class VectorDBFactory:
         self.config = config
         self.base_controller = BaseController()
         
+    def intialize_qdrant(self, use_async: bool = False):
+        return Qdrant(data_base_url= self.config.QDRANT_URL, 
+                      distance_method= self.config.VECTORDB_DISTANCE_METHOD,
+                      profile= QdrantProfile.from_settings(self.config),
+                      use_async= use_async,
+                      prefer_grpc= self.config.QDRANT_PREFER_GRPC,
+                      grpc_port= self.config.QDRANT_GRPC_PORT,
+                      pool_size= self.config.QDRANT_POOL_SIZE)
+        
     def intialize_provider(self, provider_name: str):
         
         if provider_name == VectorDBProviders.QDRANT.value:
             
-            provider = Qdrant(data_base_url= self.config.QDRANT_URL, 
-                                      distance_method= self.config.VECTORDB_DISTANCE_METHOD)
+            return self.intialize_qdrant(use_async= self.config.QDRANT_ASYNC)
+        
+        if provider_name == VectorDBProviders.INMEMORY.value:
+            # Qdrant stays the durable store, searches are served from memory
+            # so the backing store is only written to, from worker threads
+            backing_client = self.intialize_qdrant()
+            provider = InMemoryVectorDB(backing_client= backing_client,
+                                        distance_method= self.config.VECTORDB_DISTANCE_METHOD,
+                                        dtype= self.config.VECTORDB_INMEMORY_DTYPE,
+                                        refresh_seconds= self.config.VECTORDB_INMEMORY_REFRESH_SECONDS)
+            return provider
+        
+        if provider_name == VectorDBProviders.MMAP.value:
+            # relative paths are resolved against the src directory
+            data_base_path = os.path.join(self.base_controller.base_dir, self.config.VECTORDB_PATH)
+            provider = MMapVectorDB(data_base_path= data_base_path,
+                                    distance_method= self.config.VECTORDB_DISTANCE_METHOD,
+                                    compact_ratio= self.config.VECTORDB_MMAP_COMPACT_RATIO)
             return provider
         return None
             
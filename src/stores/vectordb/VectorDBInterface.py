@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+import asyncio
 
 
 class VectorDBInterface(ABC):
@@ -16,6 +17,10 @@ class VectorDBInterface(ABC):
     def get_collection(self, collection_name: str):
         pass
     
+    @abstractmethod
+    def list_collections(self):
+        pass
+    
     @abstractmethod
     def is_collection_exists(self, collection_name: str):
         pass
@@ -33,11 +38,61 @@ class VectorDBInterface(ABC):
                           meta_data: dict = None, record_id: int = None ):
         pass
     
+    @abstractmethod
+    def insert_many_records(self, collection_name: str, vectors: list,
+                            meta_datas: list = None, record_ids: list = None,
+                            batch_size: int = 64, parallel: int = 1):
+        pass
+    
+    @abstractmethod
+    def delete_records(self, collection_name: str, record_ids: list):
+        pass
+    
+    
+    @abstractmethod
+    def retrieve_vectors(self, collection_name: str, record_ids: list):
+        pass
+    
     
     @abstractmethod
     def search_by_vector(self, collection_name: str, vector: list, limit:int = 3):
         pass
     
+    # awaitable counterparts used from the request path. Providers with a native async
+    # client override them, the rest run the blocking call in a worker thread.
+    async def disconnect_async(self):
+        return self.disconnect()
+    
+    async def get_collection_async(self, collection_name: str):
+        return await asyncio.to_thread(self.get_collection, collection_name)
+    
+    async def list_collections_async(self):
+        return await asyncio.to_thread(self.list_collections)
+    
+    async def is_collection_exists_async(self, collection_name: str):
+        return await asyncio.to_thread(self.is_collection_exists, collection_name)
+    
+    async def create_collection_async(self, collection_name: str, embedding_size: int):
+        return await asyncio.to_thread(self.create_collection, collection_name, embedding_size)
+    
+    async def delete_collection_async(self, collection_name: str):
+        return await asyncio.to_thread(self.delete_collection, collection_name)
+    
+    async def insert_one_record_async(self, collection_name: str, vector: list,
+                                      meta_data: dict = None, record_id: int = None):
+        return await asyncio.to_thread(self.insert_one_record, collection_name, vector, meta_data, record_id)
+    
+    async def insert_many_records_async(self, collection_name: str, vectors: list,
+                                        meta_datas: list = None, record_ids: list = None,
+                                        batch_size: int = 64, parallel: int = 1):
+        return await asyncio.to_thread(self.insert_many_records, collection_name, vectors,
+                                       meta_datas, record_ids, batch_size, parallel)
+    
+    async def delete_records_async(self, collection_name: str, record_ids: list):
+        return await asyncio.to_thread(self.delete_records, collection_name, record_ids)
     
+    async def retrieve_vectors_async(self, collection_name: str, record_ids: list):
+        return await asyncio.to_thread(self.retrieve_vectors, collection_name, record_ids)
     
-       
\ No newline at end of file
+    async def search_by_vector_async(self, collection_name: str, vector: list, limit: int = 1):
+        return await asyncio.to_thread(self.search_by_vector, collection_name, vector, limit)
@@ -0,0 +1,136 @@
+import logging
+import asyncio
+import time
+import re
+
+
+class VectorDBShardManager:
+    """Keeps one gallery collection per site and routes writes and searches to them.
+
+    Clients enrolled without a site stay in the base collection and are allowed
+    at every site. A search for a site scans that site's collection and the base
+    collection, a search without one fans out over the base collection and every
+    site collection concurrently and merges the results.
+    """
+
+    # no underscores, so a site collection can never be mistaken for another one's images collection
+    SITE_ID_PATTERN = re.compile(r"^[A-Za-z0-9-]{1,64}$")
+
+    def __init__(self, vector_db_client, base_collection_name: str, embedding_size: int,
+                 fan_out_workers: int = 4, refresh_seconds: float = 30.0):
+        self.vector_db_client = vector_db_client
+        self.base_collection_name = base_collection_name
+        self.embedding_size = embedding_size
+        self.fan_out_workers = fan_out_workers
+        self.refresh_seconds = refresh_seconds
+        self.site_collections = []
+        self.listed_at = None
+        self.sizes = None
+        self.sized_at = None
+        self.sizing_task = None
+        self.logger = logging.getLogger(__name__)
+
+    def is_valid_site_id(self, site_id: str):
+        return bool(self.SITE_ID_PATTERN.match(site_id))
+
+    def collection_name(self, site_id: str = None):
+        if not site_id:
+            return self.base_collection_name
+        if not self.is_valid_site_id(site_id):
+            raise ValueError(f"invalid site id {site_id}")
+        return f"{self.base_collection_name}_site_{site_id}"
+
+    def collection_names(self, site_ids: list = None):
+        if not site_ids:
+            return [self.base_collection_name]
+        return [self.collection_name(site_id) for site_id in site_ids]
+
+    def images_collection_name(self, collection_name: str):
+        return f"{collection_name}_images"
+
+    def is_site_collection(self, collection_name: str):
+        return collection_name.startswith(f"{self.base_collection_name}_site_") and \
+            not collection_name.endswith("_images")
+
+    async def ensure_collection(self, collection_name: str):
+        # the providers answer "already exists" from their own schema cache, without a round trip
+        return_val = await self.vector_db_client.create_collection_async(collection_name=collection_name,
+                                                                         embedding_size=self.embedding_size)
+        if return_val is None:
+            return None
+
+        if self.is_site_collection(collection_name) and collection_name not in self.site_collections:
+            self.site_collections = self.site_collections + [collection_name]
+        return True
+
+    async def list_site_collections(self):
+        # other api workers add sites too, so the listing is refreshed now and then
+        if self.listed_at is None or time.monotonic() - self.listed_at > self.refresh_seconds:
+            names = await self.vector_db_client.list_collections_async() or []
+            self.site_collections = sorted(name for name in names if self.is_site_collection(name))
+            self.listed_at = time.monotonic()
+        return self.site_collections
+
+    async def search(self, vector: list, limit: int = 1, site_id: str = None, rescore=None):
+        if site_id:
+            # bulk and two-step enrollments, and every client from before sites existed, live in the base collection
+            collection_names = [self.base_collection_name, self.collection_name(site_id)]
+        else:
+            collection_names = [self.base_collection_name] + await self.list_site_collections()
+
+        # one auth fans out over at most fan_out_workers shards at a time
+        slots = asyncio.Semaphore(self.fan_out_workers)
+
+        async def search_collection(collection_name: str):
+            async with slots:
+                documents = await self.vector_db_client.search_by_vector_async(collection_name=collection_name,
+                                                                               vector=vector,
+                                                                               limit=limit)
+                # candidates are re-scored inside their own shard, where their image vectors live
+                if documents and rescore is not None:
+                    documents = await rescore(collection_name, documents)
+            return documents or []
+
+        results = await asyncio.gather(*[search_collection(collection_name) for collection_name in collection_names])
+
+        documents = sorted((document for result in results for document in result),
+                           key=lambda document: document.score, reverse=True)[:limit]
+        if not documents:
+            return None
+        return documents
+
+    async def collection_size(self, collection_name: str):
+        info = await self.vector_db_client.get_collection_async(collection_name=collection_name)
+        if info is None:
+            return 0
+        # qdrant answers with a CollectionInfo, the mmap store with a plain dict
+        if isinstance(info, dict):
+            return info["points_count"]
+        return info.points_count or 0
+
+    async def get_stats(self):
+        collection_names = [self.base_collection_name] + await self.list_site_collections()
+        sizes = await asyncio.gather(*[self.collection_size(name) for name in collection_names])
+        return {
+            "base_collection": self.base_collection_name,
+            "sizes": dict(zip(collection_names, sizes)),
+        }
+
+    async def refresh_sizes(self):
+        try:
+            stats = await self.get_stats()
+            self.sizes = stats["sizes"]
+        except Exception as e:
+            self.logger.error(f"Error while counting the shard sizes: {e}")
+        finally:
+            self.sized_at = time.monotonic()
+            self.sizing_task = None
+
+    async def get_cached_sizes(self):
+        # a scrape must not cost one round trip per site, the sizes are counted at most once per refresh interval
+        if self.sizing_task is None and (self.sized_at is None or time.monotonic() - self.sized_at > self.refresh_seconds):
+            self.sizing_task = asyncio.create_task(self.refresh_sizes())
+        # callers wait for the first counts only, afterwards they get the last ones while a refresh runs
+        if self.sizes is None and self.sizing_task is not None:
+            await asyncio.shield(self.sizing_task)
+        return self.sizes or {}
@@ -1 +1,3 @@
-from .qdrant import Qdrant
\ No newline at end of file
+from .qdrant import Qdrant
+from .inmemory import InMemoryVectorDB
+from .mmap_store import MMapVectorDB
\ No newline at end of file
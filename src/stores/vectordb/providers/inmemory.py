@@ -0,0 +1,306 @@
+from ..VectorDBInterface import VectorDBInterface
+from ..VectorDBEnums import VectorDBMetricMethod
+import logging
+from models.db_schemes import RetrievedVectorDBdata
+import numpy as np
+import threading
+import time
+import uuid
+
+
+class InMemoryCollection:
+
+    def __init__(self, embedding_size: int, dtype):
+        self.embedding_size = embedding_size
+        self.dtype = dtype
+        self.matrix = np.empty((0, embedding_size), dtype=dtype)
+        self.size = 0
+        self.record_ids = []
+        self.meta_datas = []
+        self.rows = {}
+        self.synced_at = time.monotonic()
+
+    def upsert(self, record_ids: list, vectors: np.ndarray, meta_datas: list):
+        for record_id, vector, meta_data in zip(record_ids, vectors, meta_datas):
+            row = self.rows.get(record_id)
+            if row is None:
+                row = self.size
+                if row == self.matrix.shape[0]:
+                    # grow geometrically so appends stay amortized O(1)
+                    grown = np.empty((max(64, row * 2), self.embedding_size), dtype=self.dtype)
+                    grown[:row] = self.matrix[:row]
+                    self.matrix = grown
+                self.rows[record_id] = row
+                self.record_ids.append(record_id)
+                self.meta_datas.append(meta_data)
+                self.size += 1
+            else:
+                self.meta_datas[row] = meta_data
+            self.matrix[row] = vector
+
+    def remove(self, record_ids: list):
+        removed = set(record_ids)
+        keep = [row for row, record_id in enumerate(self.record_ids) if record_id not in removed]
+        self.matrix = self.matrix[keep]
+        self.record_ids = [self.record_ids[row] for row in keep]
+        self.meta_datas = [self.meta_datas[row] for row in keep]
+        self.rows = {record_id: row for row, record_id in enumerate(self.record_ids)}
+        self.size = len(keep)
+
+
+class InMemoryVectorDB(VectorDBInterface):
+
+    # a collection the backing store does not have is looked up again after this long
+    MISSING_RETRY_SECONDS = 5.0
+
+    def __init__(self, backing_client: VectorDBInterface, distance_method, dtype: str = "float32",
+                 refresh_seconds: float = 30.0):
+        self.backing_client = backing_client
+        self.normalize = distance_method != VectorDBMetricMethod.DOT.value
+        self.dtype = np.dtype(dtype)
+        self.refresh_seconds = refresh_seconds
+        self.collections = {}
+        self.refreshing = set()
+        # writes made while a collection is being (re)loaded, replayed onto the new copy before it is swapped in
+        self.write_logs = {}
+        self.missing = {}
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def connect(self):
+        self.backing_client.connect()
+
+        for collection_name in self.backing_client.list_collections():
+            self.load_collection(collection_name)
+
+    def disconnect(self):
+        self.backing_client.disconnect()
+        self.collections = {}
+
+    async def disconnect_async(self):
+        await self.backing_client.disconnect_async()
+        self.collections = {}
+
+    def prepare_vectors(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[np.newaxis, :]
+
+        if self.normalize:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+
+        return vectors.astype(self.dtype)
+
+    def load_collection(self, collection_name: str):
+        write_log = []
+        with self.lock:
+            self.write_logs.setdefault(collection_name, []).append(write_log)
+
+        try:
+            info = self.backing_client.get_collection(collection_name=collection_name)
+            if info is None:
+                with self.lock:
+                    self.missing[collection_name] = time.monotonic()
+                return None
+
+            collection = InMemoryCollection(embedding_size=info.config.params.vectors.size, dtype=self.dtype)
+
+            record_ids, vectors, meta_datas = [], [], []
+            for record_id, vector, meta_data in self.backing_client.scroll_records(collection_name=collection_name):
+                record_ids.append(record_id)
+                vectors.append(vector)
+                meta_datas.append(meta_data)
+
+            if record_ids:
+                collection.upsert(record_ids, self.prepare_vectors(vectors), meta_datas)
+
+            # writes that landed during the scroll may be missing from it, replaying them is idempotent
+            with self.lock:
+                for write in write_log:
+                    write(collection)
+                self.collections[collection_name] = collection
+                self.missing.pop(collection_name, None)
+        finally:
+            with self.lock:
+                write_logs = self.write_logs[collection_name]
+                write_logs.remove(write_log)
+                if not write_logs:
+                    del self.write_logs[collection_name]
+
+        self.logger.info(f"Loaded {collection.size} vectors of {collection_name} into memory")
+        return collection
+
+    def apply_write(self, collection_name: str, write):
+        # applied to the live copy and logged for any load in progress, under one lock so none is lost in a swap
+        with self.lock:
+            collection = self.collections.get(collection_name)
+            if collection is not None:
+                write(collection)
+            for write_log in self.write_logs.get(collection_name, []):
+                write_log.append(write)
+        return collection is not None
+
+    def get_or_load_collection(self, collection_name: str):
+        # another api worker may have created the collection (a new site shard) after this one connected
+        collection = self.collections.get(collection_name)
+        if collection is not None:
+            return collection
+
+        # a site without a shard yet must not cost a backing store round trip on every search
+        missing_at = self.missing.get(collection_name)
+        if missing_at is not None and time.monotonic() - missing_at < self.MISSING_RETRY_SECONDS:
+            return None
+
+        with self.load_lock:
+            collection = self.collections.get(collection_name)
+            if collection is None:
+                collection = self.load_collection(collection_name)
+        return collection
+
+    def refresh_in_background(self, collection_name: str):
+        # other api workers write to the same backing store, so stale copies are reloaded periodically
+        with self.lock:
+            if collection_name in self.refreshing:
+                return
+            self.refreshing.add(collection_name)
+
+        def refresh():
+            try:
+                self.load_collection(collection_name)
+            except Exception as e:
+                self.logger.error(f"Error while refreshing {collection_name}: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(collection_name)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def get_collection(self, collection_name: str):
+        return self.backing_client.get_collection(collection_name=collection_name)
+
+    def list_collections(self):
+        return self.backing_client.list_collections()
+
+    def is_collection_exists(self, collection_name: str):
+        if collection_name in self.collections:
+            return True
+        return self.backing_client.is_collection_exists(collection_name=collection_name)
+
+    def create_collection(self, collection_name: str, embedding_size: int):
+        return_val = self.backing_client.create_collection(collection_name=collection_name,
+                                                           embedding_size=embedding_size)
+        if return_val is None:
+            return None
+
+        with self.lock:
+            self.missing.pop(collection_name, None)
+            if collection_name not in self.collections:
+                self.collections[collection_name] = InMemoryCollection(embedding_size=embedding_size,
+                                                                       dtype=self.dtype)
+        return True
+
+    def delete_collection(self, collection_name: str):
+        with self.lock:
+            self.collections.pop(collection_name, None)
+        return self.backing_client.delete_collection(collection_name=collection_name)
+
+    def insert_one_record(self, collection_name: str, vector: list,
+                          meta_data: dict = None, record_id: int = None):
+        return self.insert_many_records(collection_name=collection_name,
+                                        vectors=[vector],
+                                        meta_datas=[meta_data],
+                                        record_ids=None if record_id is None else [record_id])
+
+    def insert_many_records(self, collection_name: str, vectors: list,
+                            meta_datas: list = None, record_ids: list = None,
+                            batch_size: int = 64, parallel: int = 1):
+        if meta_datas is None:
+            meta_datas = [None] * len(vectors)
+
+        # ids are chosen here so the memory copy and the backing store agree on them
+        if record_ids is None:
+            record_ids = [str(uuid.uuid4()) for _ in range(len(vectors))]
+        record_ids = [str(record_id) for record_id in record_ids]
+
+        return_val = self.backing_client.insert_many_records(collection_name=collection_name,
+                                                             vectors=vectors,
+                                                             meta_datas=meta_datas,
+                                                             record_ids=record_ids,
+                                                             batch_size=batch_size,
+                                                             parallel=parallel)
+        if return_val is None:
+            return None
+
+        prepared = self.prepare_vectors(vectors)
+        meta_datas = [meta_data or {} for meta_data in meta_datas]
+        if not self.apply_write(collection_name, lambda collection: collection.upsert(record_ids, prepared, meta_datas)):
+            # the backing store has the collection now, whatever the missing cache says
+            self.missing.pop(collection_name, None)
+            collection = self.get_or_load_collection(collection_name)
+            return True if collection is not None else None
+        return True
+
+    def delete_records(self, collection_name: str, record_ids: list):
+        return_val = self.backing_client.delete_records(collection_name=collection_name,
+                                                        record_ids=record_ids)
+        if return_val is None:
+            return None
+
+        removed = [str(record_id) for record_id in record_ids]
+        self.apply_write(collection_name, lambda collection: collection.remove(removed))
+        return True
+
+    def retrieve_vectors(self, collection_name: str, record_ids: list):
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            return self.backing_client.retrieve_vectors(collection_name=collection_name,
+                                                        record_ids=record_ids)
+
+        with self.lock:
+            rows = {str(record_id): collection.rows.get(str(record_id)) for record_id in record_ids}
+            return {record_id: collection.matrix[row].astype(np.float32)
+                    for record_id, row in rows.items() if row is not None}
+
+    def search_by_vector(self, collection_name: str, vector: list, limit: int = 1):
+        collection = self.get_or_load_collection(collection_name)
+        if collection is None:
+            self.logger.error("Collection does not exist")
+            return None
+
+        if self.refresh_seconds and time.monotonic() - collection.synced_at > self.refresh_seconds:
+            collection.synced_at = time.monotonic()
+            self.refresh_in_background(collection_name)
+
+        with self.lock:
+            matrix = collection.matrix[:collection.size]
+            meta_datas = collection.meta_datas
+
+        if matrix.shape[0] == 0:
+            self.logger.info("No vector match found")
+            return None
+
+        query = self.prepare_vectors(vector)[0]
+        if self.dtype == np.float32:
+            scores = matrix @ query
+        else:
+            # numpy has no fast half precision matmul, so upcast in cache friendly blocks
+            query = query.astype(np.float32)
+            scores = np.concatenate([matrix[i:i + 65536].astype(np.float32) @ query
+                                     for i in range(0, matrix.shape[0], 65536)])
+
+        limit = min(limit, scores.shape[0])
+        if limit < scores.shape[0]:
+            top_rows = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top_rows = np.arange(scores.shape[0])
+        top_rows = top_rows[np.argsort(-scores[top_rows])]
+
+        return [
+            RetrievedVectorDBdata(
+                score=float(scores[row]),
+                meta_data=meta_datas[row]
+            )
+            for row in top_rows
+        ]
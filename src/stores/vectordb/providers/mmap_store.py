@@ -0,0 +1,368 @@
+from ..VectorDBInterface import VectorDBInterface
+from ..VectorDBEnums import VectorDBMetricMethod
+import logging
+from models.db_schemes import RetrievedVectorDBdata
+import numpy as np
+import threading
+import shutil
+import fcntl
+import json
+import uuid
+import os
+
+RECORD_ID_DTYPE = np.dtype("S64")
+
+
+class MMapCollection:
+    # read side of one collection directory:
+    #   header.json   embedding size
+    #   vectors.f32   append only float32 rows, written last on every insert
+    #   ids.bin       fixed width record ids, one per row
+    #   payload.jsonl metadata lines, located through payload.idx (offset, length) pairs
+    #   deleted.u8    tombstone flag per row, updated in place
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "header.json")) as f:
+            self.embedding_size = json.load(f)["embedding_size"]
+        self.stamp = None
+        self.size = 0
+        self.vectors = np.empty((0, self.embedding_size), dtype=np.float32)
+        self.record_ids = np.empty((0,), dtype=RECORD_ID_DTYPE)
+        self.offsets = np.empty((0, 2), dtype=np.uint64)
+        self.deleted = np.empty((0,), dtype=np.uint8)
+        self.payload = None
+
+    def file_path(self, name: str):
+        return os.path.join(self.path, name)
+
+    def refresh(self):
+        # everything is opened through one directory fd, so a compaction renaming the directory mid refresh
+        # cannot pair offsets from one generation with the payload file of the next
+        dir_fd = os.open(self.path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            # a size or inode change means another writer appended or compacted the collection
+            stat = os.stat("vectors.f32", dir_fd=dir_fd)
+            stamp = (stat.st_ino, stat.st_size)
+            if stamp == self.stamp:
+                return
+
+            def opener(name, flags):
+                return os.open(name, flags, dir_fd=dir_fd)
+
+            size = stat.st_size // (self.embedding_size * 4)
+            if size > 0:
+                with open("vectors.f32", "rb", opener=opener) as f:
+                    self.vectors = np.memmap(f, dtype=np.float32, mode="r", shape=(size, self.embedding_size))
+                with open("ids.bin", "rb", opener=opener) as f:
+                    self.record_ids = np.memmap(f, dtype=RECORD_ID_DTYPE, mode="r", shape=(size,))
+                with open("payload.idx", "rb", opener=opener) as f:
+                    self.offsets = np.memmap(f, dtype=np.uint64, mode="r", shape=(size, 2))
+                with open("deleted.u8", "rb", opener=opener) as f:
+                    self.deleted = np.memmap(f, dtype=np.uint8, mode="r", shape=(size,))
+            else:
+                self.vectors = np.empty((0, self.embedding_size), dtype=np.float32)
+                self.record_ids = np.empty((0,), dtype=RECORD_ID_DTYPE)
+                self.offsets = np.empty((0, 2), dtype=np.uint64)
+                self.deleted = np.empty((0,), dtype=np.uint8)
+            # payload lines are appended before the vectors grow, so this file already holds every mapped row;
+            # the previous one is closed once no reader holds it any more
+            self.payload = open("payload.jsonl", "rb", opener=opener)
+            self.size = size
+            self.stamp = stamp
+        finally:
+            os.close(dir_fd)
+
+    def read_meta_datas(self, rows, offsets=None, payload=None):
+        # readers outside the lock pass the offsets and payload they captured together
+        if offsets is None:
+            offsets, payload = self.offsets, self.payload
+        meta_datas = []
+        for row in rows:
+            offset, length = offsets[row]
+            meta_datas.append(json.loads(os.pread(payload.fileno(), int(length), int(offset))))
+        return meta_datas
+
+
+class MMapVectorDB(VectorDBInterface):
+
+    def __init__(self, data_base_path: str, distance_method, compact_ratio: float = 0.25):
+        self.data_base_path = data_base_path
+        self.normalize = distance_method != VectorDBMetricMethod.DOT.value
+        self.compact_ratio = compact_ratio
+        self.collections = {}
+        self.lock = threading.RLock()
+        self.logger = logging.getLogger(__name__)
+
+    def connect(self):
+        os.makedirs(self.data_base_path, exist_ok=True)
+
+    def disconnect(self):
+        self.collections = {}
+
+    def collection_path(self, collection_name: str):
+        return os.path.join(self.data_base_path, collection_name)
+
+    def write_lock(self, collection_name: str):
+        # the lock file lives next to the collection so compaction can swap the directory under it
+        lock_file = open(os.path.join(self.data_base_path, f"{collection_name}.lock"), "a")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def open_collection(self, collection_name: str):
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            if not self.is_collection_exists(collection_name):
+                return None
+            collection = MMapCollection(self.collection_path(collection_name))
+            self.collections[collection_name] = collection
+
+        collection.refresh()
+        return collection
+
+    def get_collection(self, collection_name: str):
+        collection = self.open_collection(collection_name)
+        if collection is None:
+            self.logger.info("No such collection exists")
+            return None
+
+        deleted = int(collection.deleted.sum())
+        return {
+            "name": collection_name,
+            "embedding_size": collection.embedding_size,
+            "points_count": collection.size - deleted,
+            "deleted_count": deleted,
+        }
+
+    def list_collections(self):
+        if not os.path.isdir(self.data_base_path):
+            return []
+        # .compact and .old directories only exist while a compaction swaps them in
+        return [name for name in os.listdir(self.data_base_path)
+                if "." not in name and self.is_collection_exists(name)]
+
+    def is_collection_exists(self, collection_name: str):
+        return os.path.exists(os.path.join(self.collection_path(collection_name), "header.json"))
+
+    def create_collection(self, collection_name: str, embedding_size: int):
+        if self.is_collection_exists(collection_name):
+            self.logger.info(f"Collection {collection_name} already exists")
+            return True
+
+        with self.lock:
+            lock_file = self.write_lock(collection_name)
+            try:
+                self.write_collection_files(self.collection_path(collection_name), embedding_size)
+            finally:
+                lock_file.close()
+        return True
+
+    def write_collection_files(self, path: str, embedding_size: int):
+        os.makedirs(path, exist_ok=True)
+        for name in ["vectors.f32", "ids.bin", "payload.jsonl", "payload.idx", "deleted.u8"]:
+            open(os.path.join(path, name), "ab").close()
+        # the header is written last, it marks the collection as complete
+        with open(os.path.join(path, "header.json"), "w") as f:
+            json.dump({"embedding_size": embedding_size}, f)
+
+    def delete_collection(self, collection_name: str):
+        if not self.is_collection_exists(collection_name):
+            self.logger.info("No such collection exists to delete")
+            return False
+
+        with self.lock:
+            lock_file = self.write_lock(collection_name)
+            try:
+                shutil.rmtree(self.collection_path(collection_name))
+                self.collections.pop(collection_name, None)
+            finally:
+                lock_file.close()
+        return True
+
+    def insert_one_record(self, collection_name: str, vector: list,
+                          meta_data: dict = None, record_id: int = None):
+        return self.insert_many_records(collection_name=collection_name,
+                                        vectors=[vector],
+                                        meta_datas=[meta_data],
+                                        record_ids=None if record_id is None else [record_id])
+
+    def insert_many_records(self, collection_name: str, vectors: list,
+                            meta_datas: list = None, record_ids: list = None,
+                            batch_size: int = 64, parallel: int = 1):
+        if not self.is_collection_exists(collection_name):
+            self.logger.error("Collection does not exist")
+            return None
+
+        if meta_datas is None:
+            meta_datas = [None] * len(vectors)
+
+        if record_ids is None:
+            record_ids = [str(uuid.uuid4()) for _ in range(len(vectors))]
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.normalize:
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        record_ids = np.array([str(record_id).encode() for record_id in record_ids], dtype=RECORD_ID_DTYPE)
+
+        with self.lock:
+            lock_file = self.write_lock(collection_name)
+            try:
+                collection = self.open_collection(collection_name)
+                if vectors.shape[1] != collection.embedding_size:
+                    self.logger.error(f"Vector size {vectors.shape[1]} does not match the collection")
+                    return None
+
+                # an upsert appends the new row and tombstones the old one
+                self.tombstone_rows(collection, np.isin(collection.record_ids, record_ids))
+
+                with open(collection.file_path("payload.jsonl"), "ab") as f:
+                    offsets = np.empty((len(meta_datas), 2), dtype=np.uint64)
+                    for i, meta_data in enumerate(meta_datas):
+                        line = json.dumps(meta_data or {}).encode()
+                        offsets[i] = (f.tell(), len(line))
+                        f.write(line + b"\n")
+
+                with open(collection.file_path("payload.idx"), "ab") as f:
+                    f.write(offsets.tobytes())
+                with open(collection.file_path("ids.bin"), "ab") as f:
+                    f.write(record_ids.tobytes())
+                with open(collection.file_path("deleted.u8"), "ab") as f:
+                    f.write(bytes(len(record_ids)))
+                # readers size the collection from this file, so it grows last
+                with open(collection.file_path("vectors.f32"), "ab") as f:
+                    f.write(vectors.tobytes())
+            except Exception as e:
+                self.logger.error(f"Error while inserting records: {e}")
+                return None
+            finally:
+                lock_file.close()
+
+        return True
+
+    def tombstone_rows(self, collection: MMapCollection, mask: np.ndarray):
+        rows = np.flatnonzero(mask & (collection.deleted == 0))
+        if rows.shape[0] == 0:
+            return 0
+
+        with open(collection.file_path("deleted.u8"), "r+b") as f:
+            for row in rows:
+                f.seek(int(row))
+                f.write(b"\x01")
+        return int(rows.shape[0])
+
+    def delete_records(self, collection_name: str, record_ids: list):
+        if not self.is_collection_exists(collection_name):
+            self.logger.error("Collection does not exist")
+            return None
+
+        record_ids = np.array([str(record_id).encode() for record_id in record_ids], dtype=RECORD_ID_DTYPE)
+
+        with self.lock:
+            lock_file = self.write_lock(collection_name)
+            try:
+                collection = self.open_collection(collection_name)
+                self.tombstone_rows(collection, np.isin(collection.record_ids, record_ids))
+                needs_compaction = collection.size and (collection.deleted.sum() / collection.size) > self.compact_ratio
+            finally:
+                lock_file.close()
+
+        if needs_compaction:
+            self.compact_collection(collection_name)
+
+        return True
+
+    def compact_collection(self, collection_name: str):
+        with self.lock:
+            lock_file = self.write_lock(collection_name)
+            try:
+                collection = self.open_collection(collection_name)
+                keep = np.flatnonzero(collection.deleted == 0)
+
+                path = self.collection_path(collection_name)
+                compact_path = path + ".compact"
+                shutil.rmtree(compact_path, ignore_errors=True)
+                os.makedirs(compact_path)
+
+                meta_datas = collection.read_meta_datas(keep)
+                offsets = np.empty((len(keep), 2), dtype=np.uint64)
+                with open(os.path.join(compact_path, "payload.jsonl"), "wb") as f:
+                    for i, meta_data in enumerate(meta_datas):
+                        line = json.dumps(meta_data).encode()
+                        offsets[i] = (f.tell(), len(line))
+                        f.write(line + b"\n")
+
+                with open(os.path.join(compact_path, "payload.idx"), "wb") as f:
+                    f.write(offsets.tobytes())
+                with open(os.path.join(compact_path, "ids.bin"), "wb") as f:
+                    f.write(np.ascontiguousarray(collection.record_ids[keep]).tobytes())
+                with open(os.path.join(compact_path, "deleted.u8"), "wb") as f:
+                    f.write(bytes(len(keep)))
+                with open(os.path.join(compact_path, "vectors.f32"), "wb") as f:
+                    f.write(np.ascontiguousarray(collection.vectors[keep]).tobytes())
+                self.write_collection_files(compact_path, collection.embedding_size)
+
+                # readers holding the old maps keep working on the unlinked files until they refresh
+                old_path = path + ".old"
+                shutil.rmtree(old_path, ignore_errors=True)
+                os.rename(path, old_path)
+                os.rename(compact_path, path)
+                shutil.rmtree(old_path)
+                self.collections.pop(collection_name, None)
+            finally:
+                lock_file.close()
+
+        self.logger.info(f"Compacted {collection_name} to {len(keep)} vectors")
+        return True
+
+    def retrieve_vectors(self, collection_name: str, record_ids: list):
+        with self.lock:
+            collection = self.open_collection(collection_name)
+        if collection is None:
+            self.logger.error("Collection does not exist")
+            return None
+
+        wanted = np.array([str(record_id).encode() for record_id in record_ids], dtype=RECORD_ID_DTYPE)
+        rows = np.flatnonzero(np.isin(collection.record_ids, wanted) & (collection.deleted == 0))
+        return {collection.record_ids[row].decode(): np.array(collection.vectors[row]) for row in rows}
+
+    def search_by_vector(self, collection_name: str, vector: list, limit: int = 1):
+        with self.lock:
+            collection = self.open_collection(collection_name)
+            if collection is not None:
+                vectors, deleted = collection.vectors, collection.deleted
+                offsets, payload = collection.offsets, collection.payload
+        if collection is None:
+            self.logger.error("Collection does not exist")
+            return None
+
+        if vectors.shape[0] == 0:
+            self.logger.info("No vector match found")
+            return None
+
+        query = np.asarray(vector, dtype=np.float32)
+        if self.normalize:
+            query = query / max(np.linalg.norm(query), 1e-12)
+
+        # the scan runs straight on the page cache, nothing is copied into the heap
+        scores = vectors @ query
+        scores[deleted != 0] = -np.inf
+
+        limit = min(limit, int((deleted == 0).sum()))
+        if limit == 0:
+            self.logger.info("No vector match found")
+            return None
+
+        if limit < scores.shape[0]:
+            top_rows = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top_rows = np.arange(scores.shape[0])
+        top_rows = top_rows[np.argsort(-scores[top_rows])]
+
+        meta_datas = collection.read_meta_datas(top_rows, offsets=offsets, payload=payload)
+        return [
+            RetrievedVectorDBdata(
+                score=float(scores[row]),
+                meta_data=meta_data
+            )
+            for row, meta_data in zip(top_rows, meta_datas)
+        ]
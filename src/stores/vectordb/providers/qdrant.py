@@ -1,28 +1,115 @@
 from ..VectorDBInterface import VectorDBInterface
 from ..VectorDBEnums import VectorDBMetricMethod
-from qdrant_client import QdrantClient, models
-from logging import Logger
+from ..QdrantProfile import QdrantProfile
+from qdrant_client import QdrantClient, AsyncQdrantClient, models
+import logging
 from models.db_schemes import RetrievedVectorDBdata
+import asyncio
 import uuid
 
 
 class Qdrant(VectorDBInterface):
 
-    def __init__(self, data_base_url, distance_method):
+    def __init__(self, data_base_url, distance_method, profile: QdrantProfile = None,
+                 use_async: bool = False, prefer_grpc: bool = False, grpc_port: int = 6334, pool_size: int = 0):
         if distance_method == VectorDBMetricMethod.COSINE.value:
             self.distance_method = models.Distance.COSINE
         elif distance_method == VectorDBMetricMethod.DOT.value:
             self.distance_method = models.Distance.DOT
 
         self.data_base_url = data_base_url
+        self.profile = profile or QdrantProfile()
+        self.search_params = self.profile.search_params()
+        self.use_async = use_async
+        # gRPC multiplexes every request over one HTTP/2 channel per pooled connection
+        self.client_options = {"prefer_grpc": prefer_grpc, "grpc_port": grpc_port}
+        if pool_size > 0:
+            self.client_options["pool_size"] = pool_size
+        # collection name -> vector size and distance, so writes skip the existence round trip
+        self.schemas = {}
         self.client = None
-        self.logger = Logger(__name__)
+        self.async_client = None
+        self.logger = logging.getLogger(__name__)
 
     def connect(self):
-        self.client = QdrantClient(url=self.data_base_url)
+        # the blocking client stays for startup, scrolling and scripts, requests go through the async one
+        self.client = QdrantClient(url=self.data_base_url, **self.client_options)
+        if self.use_async:
+            self.async_client = AsyncQdrantClient(url=self.data_base_url, **self.client_options)
+        self.load_schemas()
 
     def disconnect(self):
         self.client = None
+        self.async_client = None
+        self.schemas = {}
+
+    def load_schemas(self):
+        # checked once at startup, afterwards only a delete or a "not found" error invalidates an entry
+        self.schemas = {}
+        for collection_name in self.list_collections():
+            info = self.get_collection(collection_name)
+            if info is not None:
+                self.cache_schema(collection_name, info)
+        self.logger.info(f"Cached the schema of {len(self.schemas)} collections")
+
+    def cache_schema(self, collection_name: str, info):
+        vectors = info.config.params.vectors
+        self.schemas[collection_name] = {"size": vectors.size, "distance": vectors.distance}
+
+    def schema_matches(self, collection_name: str, embedding_size: int):
+        schema = self.schemas[collection_name]
+        if schema["size"] != embedding_size or schema["distance"] != self.distance_method:
+            self.logger.error(f"Collection {collection_name} holds {schema['size']} dim {schema['distance']} vectors, "
+                              f"expected {embedding_size} dim {self.distance_method}")
+            return False
+        return True
+
+    def is_not_found(self, error: Exception):
+        # REST answers 404, gRPC NOT_FOUND and the local mode raises a ValueError
+        if getattr(error, "status_code", None) == 404:
+            return True
+        code = getattr(error, "code", None)
+        if callable(code) and getattr(code(), "name", None) == "NOT_FOUND":
+            return True
+        return "not found" in str(error).lower()
+
+    def run_on_collection(self, collection_name: str, operation):
+        if not self.is_collection_exists(collection_name):
+            self.logger.error("Collection does not exist")
+            return None
+
+        try:
+            return operation()
+        except Exception as e:
+            if not self.is_not_found(e):
+                raise
+            # deleted behind our back, maybe already recreated by another worker
+            self.schemas.pop(collection_name, None)
+            if not self.is_collection_exists(collection_name):
+                self.logger.error("Collection does not exist")
+                return None
+            return operation()
+
+    async def run_on_collection_async(self, collection_name: str, operation):
+        if not await self.is_collection_exists_async(collection_name):
+            self.logger.error("Collection does not exist")
+            return None
+
+        try:
+            return await operation()
+        except Exception as e:
+            if not self.is_not_found(e):
+                raise
+            self.schemas.pop(collection_name, None)
+            if not await self.is_collection_exists_async(collection_name):
+                self.logger.error("Collection does not exist")
+                return None
+            return await operation()
+
+    async def disconnect_async(self):
+        if self.async_client is not None:
+            await self.async_client.close()
+        self.disconnect()
 
     def get_collection(self, collection_name: str):
         try:
@@ -31,56 +118,166 @@ class Qdrant(VectorDBInterface):
             self.logger.info("No such collection exists")
             return None
 
+    def list_collections(self):
+        return [collection.name for collection in self.client.get_collections().collections]
+
     def is_collection_exists(self, collection_name: str):
-        return self.client.collection_exists(collection_name=collection_name)
+        if collection_name in self.schemas:
+            return True
+
+        if not self.client.collection_exists(collection_name=collection_name):
+            return False
+        info = self.get_collection(collection_name)
+        if info is not None:
+            self.cache_schema(collection_name, info)
+        return True
 
     def create_collection(self, collection_name: str, embedding_size: int):
         if self.is_collection_exists(collection_name):
             self.logger.info(f"Collection {collection_name} already exists")
-            return True
+            return True if self.schema_matches(collection_name, embedding_size) else None
 
         self.client.create_collection(
             collection_name=collection_name,
-            vectors_config=models.VectorParams(
-                size=embedding_size,
-                distance=self.distance_method
-            )
+            vectors_config=self.profile.vectors_config(embedding_size, self.distance_method),
+            hnsw_config=self.profile.hnsw_config(),
+            quantization_config=self.profile.quantization_config(),
+            on_disk_payload=self.profile.on_disk_payload or None
         )
+        self.schemas[collection_name] = {"size": embedding_size, "distance": self.distance_method}
+        self.logger.info(f"Created {collection_name} with the {self.profile.name} profile")
         return True
 
     def delete_collection(self, collection_name: str):
         if self.is_collection_exists(collection_name):
+            self.schemas.pop(collection_name, None)
             return self.client.delete_collection(collection_name=collection_name)
 
         self.logger.info("No such collection exists to delete")
         return False
 
+    def make_points(self, vectors: list, meta_datas: list = None, record_ids: list = None):
+        if meta_datas is None:
+            meta_datas = [None] * len(vectors)
+
+        if record_ids is None:
+            record_ids = [str(uuid.uuid4()) for _ in range(len(vectors))]
+
+        return [
+            models.PointStruct(
+                id=str(record_id),
+                payload={"metadata": meta_data or {}},
+                vector=vector.tolist() if hasattr(vector, "tolist") else vector
+            )
+            for vector, meta_data, record_id in zip(vectors, meta_datas, record_ids)
+        ]
+
+    def make_results(self, points: list):
+        if not points:
+            self.logger.info("No vector match found")
+            return None
+
+        # Each point here is a ScoredPoint
+        return [
+            RetrievedVectorDBdata(
+                score=point.score,
+                meta_data=point.payload.get("metadata")  # payload is a dict
+            )
+            for point in points
+        ]
+
     def insert_one_record(self, collection_name: str, vector: list,
                           meta_data: dict = None, record_id: int = None):
+        points = self.make_points([vector], [meta_data], None if record_id is None else [record_id])
 
-        if not self.is_collection_exists(collection_name):
-            self.logger.error("Collection does not exist")
+        def upload():
+            # wait for the point to be indexed so it is searchable once this returns
+            self.client.upload_points(
+                collection_name=collection_name,
+                points=points,
+                wait=True
+            )
+            return True
+
+        try:
+            return self.run_on_collection(collection_name, upload)
+        except Exception as e:
+            self.logger.error(f"Error while inserting record: {e}")
             return None
 
-        if record_id is None:
-            record_id = str(uuid.uuid4())  # fallback
+    def insert_many_records(self, collection_name: str, vectors: list,
+                            meta_datas: list = None, record_ids: list = None,
+                            batch_size: int = 64, parallel: int = 1):
+        points = self.make_points(vectors, meta_datas, record_ids)
 
-        point = models.PointStruct(
-            id=str(record_id),                   # FIXED
-            payload={"metadata": meta_data or {}},
-            vector=vector
-        )
+        def upload():
+            # upload_points splits the points into batch_size requests and spreads them over parallel workers
+            self.client.upload_points(
+                collection_name=collection_name,
+                points=points,
+                batch_size=batch_size,
+                parallel=parallel,
+                wait=True
+            )
+            return True
 
         try:
-            self.client.upload_points(
+            return self.run_on_collection(collection_name, upload)
+        except Exception as e:
+            self.logger.error(f"Error while inserting records: {e}")
+            return None
+
+    def delete_records(self, collection_name: str, record_ids: list):
+
+        def delete():
+            self.client.delete(
                 collection_name=collection_name,
-                points=[point]
+                points_selector=models.PointIdsList(points=[str(record_id) for record_id in record_ids]),
+                wait=True
             )
+            return True
+
+        try:
+            return self.run_on_collection(collection_name, delete)
         except Exception as e:
-            self.logger.error(f"Error while inserting record: {e}")
+            self.logger.error(f"Error while deleting records: {e}")
             return None
 
-        return True
+    def retrieve_vectors(self, collection_name: str, record_ids: list):
+        try:
+            points = self.client.retrieve(
+                collection_name=collection_name,
+                ids=[str(record_id) for record_id in record_ids],
+                with_payload=False,
+                with_vectors=True
+            )
+        except Exception as e:
+            self.forget_if_not_found(collection_name, e)
+            self.logger.error(f"Error while retrieving records: {e}")
+            return None
+
+        return {str(point.id): point.vector for point in points}
+
+    def forget_if_not_found(self, collection_name: str, error: Exception):
+        # reads have nothing to retry, but the next write must not trust the cache
+        if self.is_not_found(error):
+            self.schemas.pop(collection_name, None)
+
+    def scroll_records(self, collection_name: str, batch_size: int = 1024):
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            for point in points:
+                yield str(point.id), point.vector, point.payload.get("metadata")
+
+            if offset is None:
+                break
 
     def search_by_vector(self, collection_name: str, vector: list, limit: int = 1):
         try:
@@ -88,27 +285,157 @@ class Qdrant(VectorDBInterface):
             response = self.client.query_points(
                 collection_name=collection_name,
                 query=vector,
-                limit=limit
+                limit=limit,
+                search_params=self.search_params
             )
         except Exception as e:
+            self.forget_if_not_found(collection_name, e)
             self.logger.error(f"Search error: {e}")
             return None
 
-        points =  response.points
-        if not points:
-            self.logger.info("No vector match found")
+        return self.make_results(response.points)
+
+    async def get_collection_async(self, collection_name: str):
+        if self.async_client is None:
+            return await super().get_collection_async(collection_name)
+        try:
+            return await self.async_client.get_collection(collection_name=collection_name)
+        except Exception:
+            self.logger.info("No such collection exists")
             return None
 
-        
-        # Each point here is a ScoredPoint
-        results = [
-            RetrievedVectorDBdata(
-                score=point.score,
-                meta_data=point.payload.get("metadata")  # payload is a dict
+    async def list_collections_async(self):
+        if self.async_client is None:
+            return await super().list_collections_async()
+        return [collection.name for collection in (await self.async_client.get_collections()).collections]
+
+    async def is_collection_exists_async(self, collection_name: str):
+        if collection_name in self.schemas:
+            return True
+        if self.async_client is None:
+            return await super().is_collection_exists_async(collection_name)
+
+        if not await self.async_client.collection_exists(collection_name=collection_name):
+            return False
+        info = await self.get_collection_async(collection_name)
+        if info is not None:
+            self.cache_schema(collection_name, info)
+        return True
+
+    async def create_collection_async(self, collection_name: str, embedding_size: int):
+        if self.async_client is None:
+            return await super().create_collection_async(collection_name, embedding_size)
+
+        if await self.is_collection_exists_async(collection_name):
+            self.logger.info(f"Collection {collection_name} already exists")
+            return True if self.schema_matches(collection_name, embedding_size) else None
+
+        await self.async_client.create_collection(
+            collection_name=collection_name,
+            vectors_config=self.profile.vectors_config(embedding_size, self.distance_method),
+            hnsw_config=self.profile.hnsw_config(),
+            quantization_config=self.profile.quantization_config(),
+            on_disk_payload=self.profile.on_disk_payload or None
+        )
+        self.schemas[collection_name] = {"size": embedding_size, "distance": self.distance_method}
+        self.logger.info(f"Created {collection_name} with the {self.profile.name} profile")
+        return True
+
+    async def delete_collection_async(self, collection_name: str):
+        if self.async_client is None:
+            return await super().delete_collection_async(collection_name)
+
+        if await self.is_collection_exists_async(collection_name):
+            self.schemas.pop(collection_name, None)
+            return await self.async_client.delete_collection(collection_name=collection_name)
+
+        self.logger.info("No such collection exists to delete")
+        return False
+
+    async def insert_one_record_async(self, collection_name: str, vector: list,
+                                      meta_data: dict = None, record_id: int = None):
+        return await self.insert_many_records_async(collection_name=collection_name,
+                                                    vectors=[vector],
+                                                    meta_datas=[meta_data],
+                                                    record_ids=None if record_id is None else [record_id])
+
+    async def insert_many_records_async(self, collection_name: str, vectors: list,
+                                        meta_datas: list = None, record_ids: list = None,
+                                        batch_size: int = 64, parallel: int = 1):
+        if self.async_client is None:
+            return await super().insert_many_records_async(collection_name, vectors, meta_datas,
+                                                           record_ids, batch_size, parallel)
+
+        points = self.make_points(vectors, meta_datas, record_ids)
+        # batches go out concurrently on the pooled connections, at most parallel at a time
+        semaphore = asyncio.Semaphore(max(parallel, 1))
+
+        async def upsert(batch: list):
+            async with semaphore:
+                await self.async_client.upsert(collection_name=collection_name, points=batch, wait=True)
+
+        async def upload():
+            await asyncio.gather(*[upsert(points[i:i + batch_size]) for i in range(0, len(points), batch_size)])
+            return True
+
+        try:
+            return await self.run_on_collection_async(collection_name, upload)
+        except Exception as e:
+            self.logger.error(f"Error while inserting records: {e}")
+            return None
+
+    async def delete_records_async(self, collection_name: str, record_ids: list):
+        if self.async_client is None:
+            return await super().delete_records_async(collection_name, record_ids)
+
+        async def delete():
+            await self.async_client.delete(
+                collection_name=collection_name,
+                points_selector=models.PointIdsList(points=[str(record_id) for record_id in record_ids]),
+                wait=True
             )
-            for point in points
-        ]
+            return True
+
+        try:
+            return await self.run_on_collection_async(collection_name, delete)
+        except Exception as e:
+            self.logger.error(f"Error while deleting records: {e}")
+            return None
+
+    async def retrieve_vectors_async(self, collection_name: str, record_ids: list):
+        if self.async_client is None:
+            return await super().retrieve_vectors_async(collection_name, record_ids)
+
+        try:
+            points = await self.async_client.retrieve(
+                collection_name=collection_name,
+                ids=[str(record_id) for record_id in record_ids],
+                with_payload=False,
+                with_vectors=True
+            )
+        except Exception as e:
+            self.forget_if_not_found(collection_name, e)
+            self.logger.error(f"Error while retrieving records: {e}")
+            return None
+
+        return {str(point.id): point.vector for point in points}
+
+    async def search_by_vector_async(self, collection_name: str, vector: list, limit: int = 1):
+        if self.async_client is None:
+            return await super().search_by_vector_async(collection_name, vector, limit)
+
+        try:
+            response = await self.async_client.query_points(
+                collection_name=collection_name,
+                query=vector,
+                limit=limit,
+                search_params=self.search_params
+            )
+        except Exception as e:
+            self.forget_if_not_found(collection_name, e)
+            self.logger.error(f"Search error: {e}")
+            return None
 
-        return results
+        return self.make_results(response.points)
 
 
@@ -5,6 +5,8 @@ import threading
 import requests
 import queue
 import time
+import json
+import os
 
 # ==============================
 # API ENDPOINTS
@@ -12,7 +14,9 @@ import time
 BASE_URL = "http://localhost:5000/api/v1"
 REGISTER_ENDPOINT = f"{BASE_URL}/client/register_client"
 PROCESS_ENDPOINT_TEMPLATE = f"{BASE_URL}/client/proccess_client_image/{{client_id}}"
+ENROLL_ENDPOINT = f"{BASE_URL}/client/enroll"
 AUTH_ENDPOINT = f"{BASE_URL}/authenticate/authenticate"
+STREAM_ENDPOINT = "ws://localhost:5000/api/v1/authenticate/stream"
 
 # ==============================
 # GLOBAL SHARED OBJECTS
@@ -22,6 +26,11 @@ frame_lock = threading.Lock()
 last_frame = None
 ui_queue = queue.Queue()
 AUTH_INTERVAL = 5  # seconds between automatic authentications
+STREAM_MODE = os.getenv("UI_STREAM_MODE", "0") == "1"  # authenticate over one WebSocket instead of polling
+STREAM_FPS = 5  # frames per second sent in streaming mode
+ENROLL_IMAGES = 3  # frames captured per registration, the server keeps a vector for each
+ENROLL_CAPTURE_INTERVAL = 0.3  # seconds between registration frames so the pose can vary
+SITE_ID = os.getenv("UI_SITE_ID", "")  # the building this kiosk stands in, empty for the shared gallery
 
 # ==============================
 # CAMERA THREAD
@@ -75,26 +84,29 @@ def run_api_thread(target, *args):
 # REGISTER CLIENT
 # ==============================
 def register_client(client_name, client_id):
-    frame_bytes = get_frame_bytes()
-    if frame_bytes is None:
-        ui_queue.put(("error", "No camera frame available"))
-        return
+    frames = []
+    for index in range(ENROLL_IMAGES):
+        if index:
+            time.sleep(ENROLL_CAPTURE_INTERVAL)
+        frame_bytes = get_frame_bytes()
+        if frame_bytes is None:
+            ui_queue.put(("error", "No camera frame available"))
+            return
+        frames.append(frame_bytes)
 
     try:
-        files = {"image1": ("image.jpg", frame_bytes, "image/jpeg")}
+        files = [("image1", ("image.jpg", frames[0], "image/jpeg"))]
+        files += [("images", (f"image{index}.jpg", frame_bytes, "image/jpeg"))
+                  for index, frame_bytes in enumerate(frames[1:], start=2)]
         data = {"client_name": client_name, "client_id": client_id}
+        if SITE_ID:
+            data["site_ids"] = SITE_ID
 
-        resp = requests.post(REGISTER_ENDPOINT, files=files, data=data, timeout=15)
+        # single call: the server embeds the frames and stores client, vectors and images together
+        resp = requests.post(ENROLL_ENDPOINT, files=files, data=data, timeout=15)
 
         if resp.status_code == 200:
-            # After successful register → call process endpoint
-            process_endpoint = PROCESS_ENDPOINT_TEMPLATE.format(client_id=client_id)
-            resp2 = requests.post(process_endpoint, files=files, timeout=15)
-
-            if resp2.status_code == 200:
-                ui_queue.put(("info", "Registration + Processing completed successfully!"))
-            else:
-                ui_queue.put(("error", f"Registered but processing failed: {resp2.text}"))
+            ui_queue.put(("info", "Registration + Processing completed successfully!"))
         else:
             ui_queue.put(("error", f"Registration failed: {resp.text}"))
 
@@ -114,6 +126,8 @@ def authenticate_client(client_id):
     try:
         files = {"image1": ("image.jpg", frame_bytes, "image/jpeg")}
         data = {"client_id": client_id}
+        if SITE_ID:
+            data["site_id"] = SITE_ID
 
         resp = requests.post(AUTH_ENDPOINT, files=files, data=data, timeout=15)
 
@@ -126,6 +140,40 @@ def authenticate_client(client_id):
         ui_queue.put(("error", f"Exception: {e}"))
 
 
+# ==============================
+# STREAMING AUTHENTICATION
+# ==============================
+def stream_authentication(device_id="kiosk"):
+    # imported here so the polling mode works without the websockets package
+    from websockets.sync.client import connect
+
+    while True:
+        try:
+            with connect(f"{STREAM_ENDPOINT}?device_id={device_id}" + (f"&site_id={SITE_ID}" if SITE_ID else "")) as ws:
+                receiver = threading.Thread(target=receive_decisions, args=(ws,), daemon=True)
+                receiver.start()
+
+                # the server keeps only the newest frame, so sending never waits on inference
+                while receiver.is_alive():
+                    frame_bytes = get_frame_bytes()
+                    if frame_bytes is not None:
+                        ws.send(frame_bytes)
+                    time.sleep(1 / STREAM_FPS)
+
+        except Exception as e:
+            ui_queue.put(("error", f"Stream exception: {e}"))
+            time.sleep(AUTH_INTERVAL)
+
+
+def receive_decisions(ws):
+    try:
+        for message in ws:
+            decision = json.loads(message)
+            ui_queue.put(("info", f"Stream decision: {decision}"))
+    except Exception as e:
+        ui_queue.put(("error", f"Stream closed: {e}"))
+
+
 # ==============================
 # TKINTER APP
 # ==============================
@@ -182,7 +230,10 @@ class App:
         threading.Thread(target=camera_loop, daemon=True).start()
 
         # Start regular authentication
-        self.schedule_authentication()
+        if STREAM_MODE:
+            threading.Thread(target=stream_authentication, daemon=True).start()
+        else:
+            self.schedule_authentication()
 
         # Update UI loop
         self.update_ui()